@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Async Biometric Uploader
+asyncio version of BiometricAPIProcessor: one event loop keeps hundreds or
+thousands of uploads in flight over a single aiohttp connection pool, while
+file discovery and base64 encoding run in a small thread pool.
+
+Requires aiohttp, declared as the 'async' extra (pip install ".[async]").
+"""
+
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from csv_api_sender import BiometricAPIProcessor
+from retry_policy import parse_retry_after
+from upload_transport import JsonFileBody, MultipartFileBody
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    aiohttp = None
+    AIOHTTP_AVAILABLE = False
+
+# How to install aiohttp, for messages shown when it is missing
+AIOHTTP_INSTALL_HINT = "the 'async' extra: pip install \".[async]\""
+
+logger = logging.getLogger(__name__)
+
+# Default number of uploads in flight
+DEFAULT_ASYNC_CONCURRENCY = 100
+
+
+class UploadSlots:
+    """
+    Semaphore whose size can change while it is in use.
+
+    The limit is read on every acquire, so uploads in flight follow an
+    AIMDController as it grows and shrinks.
+    """
+
+    def __init__(self, limit: Callable[[], int]):
+        """
+        Initialize the slots.
+
+        Args:
+            limit: Function returning the current number of slots
+        """
+        self.limit = limit
+        self.in_use = 0
+        self.waiters = deque()
+
+    async def acquire(self):
+        """Wait for a free slot and take it."""
+        while self.in_use >= self.limit():
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            await waiter
+        self.in_use += 1
+
+    def release(self):
+        """Give a slot back and wake up waiters that now fit under the limit."""
+        self.in_use -= 1
+        free = self.limit() - self.in_use
+        while free > 0 and self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+class AsyncBiometricAPIProcessor(BiometricAPIProcessor):
+    """
+    Upload drivers from an asyncio event loop.
+
+    Reading, grouping, file discovery, the manifest and the results report are
+    inherited from BiometricAPIProcessor; only the upload loop and the HTTP
+    client change. process_drivers (and so process_csv) runs its own event
+    loop, and process_drivers_async can be awaited from an existing one, e.g.
+    the GUI's worker thread.
+    """
+
+    def __init__(self, *args, io_workers: int = 8, **kwargs):
+        """
+        Initialize the processor.
+
+        Args:
+            *args, **kwargs: Passed to BiometricAPIProcessor
+            io_workers: Threads used for file discovery, reading and base64 encoding (default: 8)
+
+        Raises:
+            RuntimeError: If aiohttp is not installed
+            ValueError: If the transport is 'batch', which only the threaded uploader supports
+        """
+        if not AIOHTTP_AVAILABLE:
+            raise RuntimeError(f"The async uploader requires aiohttp ({AIOHTTP_INSTALL_HINT})")
+
+        super().__init__(*args, **kwargs)
+        if self.transport == 'batch':
+            self.close()
+            raise ValueError("The batch transport is not supported by the async uploader")
+        self.io_workers = max(1, io_workers)
+        self.executor = None
+        self.client = None
+        self.requests_sent = 0
+        self.connections_opened = 0
+
+    async def open_client(self):
+        """Open the aiohttp session and the file I/O thread pool."""
+        if self.client is None:
+            trace = aiohttp.TraceConfig()
+            trace.on_request_start.append(self._on_request_start)
+            trace.on_connection_create_end.append(self._on_connection_create_end)
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self.client = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=30),
+                trace_configs=[trace]
+            )
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix='upload-io')
+
+    async def _on_request_start(self, session, context, params):
+        self.requests_sent += 1
+
+    async def _on_connection_create_end(self, session, context, params):
+        self.connections_opened += 1
+
+    async def close_client(self):
+        """Close the aiohttp session and the file I/O thread pool."""
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    async def upload_driver_async(self, numero_carta: str, rows: List[Dict],
+                                  prefetched: Optional[Future] = None) -> Dict:
+        """
+        Build the payload for one driver in the I/O thread pool and send it.
+
+        Args:
+            numero_carta: Driver's license number
+            rows: CSV rows for this driver (empty list in manual mode)
+            prefetched: Optional future of the payload built by the prefetching reader stage
+
+        Returns:
+            Result dictionary, as returned by upload_driver
+        """
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        timings = {}
+        prepared = None
+        if prefetched:
+            prepared = await asyncio.wrap_future(prefetched)
+            timings['prefetch_wait'] = time.perf_counter() - started
+        if prepared is None:
+            prepared = await loop.run_in_executor(self.executor, self._prepare_upload, numero_carta, rows)
+        timings.update(prepared['timings'])
+        if prepared['status'] != 'ready':
+            return self._record_timings(prepared, timings, started)
+
+        if self.rate_limiter:
+            delay = self.rate_limiter.reserve(self._request_size(prepared))
+            if delay:
+                await asyncio.sleep(delay)
+                timings['throttle'] = delay
+
+        sent = time.monotonic()
+        send_started = time.perf_counter()
+        self.metrics.increment('requests_in_flight')
+        try:
+            url = f"{self.api_base_url}/biometric-data/{numero_carta}"
+            if 'payload' in prepared:
+                body = self.serialize_payload(prepared['payload'])
+                timings['serialize'] = time.perf_counter() - send_started
+                send_started = time.perf_counter()
+                result = await self._post_async(url, self.json_headers(), data=body)
+            else:
+                if self.transport == 'multipart':
+                    body = MultipartFileBody(prepared['files'], prepared['digests'])
+                else:
+                    body = JsonFileBody(prepared['files'], prepared['digests'])
+                headers = {**self.headers, 'Content-Type': body.content_type, 'Content-Length': str(len(body))}
+                read_errors = []
+                result = await self._post_async(url, headers, data=self._iter_body(body, read_errors))
+                if read_errors:
+                    result = {
+                        'status': 'error',
+                        'error': f'Error reading biometric file: {read_errors[0]}'
+                    }
+        finally:
+            self.metrics.increment('requests_in_flight', -1)
+
+        timings['send'] = time.perf_counter() - send_started
+        self.record_bytes_sent(result, len(body))
+        if self.concurrency_controller:
+            self.concurrency_controller.record(result, sent, time.monotonic() - sent)
+
+        result = await loop.run_in_executor(self.executor, self._finish_upload, prepared, result)
+        return self._record_timings(result, timings, started)
+
+    async def _iter_body(self, body: Iterable[bytes], read_errors: List[OSError]):
+        """
+        Feed a streamed request body to aiohttp, reading it in the I/O thread pool.
+
+        Args:
+            body: JsonFileBody or MultipartFileBody
+            read_errors: List receiving the OSError if a file cannot be read
+        """
+        loop = asyncio.get_running_loop()
+        chunks = iter(body)
+        while True:
+            try:
+                chunk = await loop.run_in_executor(self.executor, next, chunks, None)
+            except OSError as e:
+                read_errors.append(e)
+                raise
+            if chunk is None:
+                return
+            yield chunk
+
+    async def _post_async(self, url: str, headers: Dict[str, str], **kwargs) -> Dict:
+        """
+        POST to the API with aiohttp and interpret the response.
+
+        Args:
+            url: Request URL
+            headers: Request headers
+            **kwargs: Body arguments passed to aiohttp (json= or data=)
+
+        Returns:
+            API response dictionary with status and details
+        """
+        try:
+            async with self.client.post(url, headers=headers, **kwargs) as response:
+                text = await response.text()
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                try:
+                    response_data = json.loads(text) if text else {}
+                except ValueError:
+                    return {
+                        'status': 'error',
+                        'status_code': response.status,
+                        'error': 'Invalid JSON response from API',
+                        'retry_after': retry_after
+                    }
+                return self.interpret_response(response.status, response_data, retry_after)
+
+        except asyncio.TimeoutError:
+            return {
+                'status': 'error',
+                'error': 'Request timeout (30s exceeded)',
+                'transient': True
+            }
+        except aiohttp.ClientConnectionError:
+            return {
+                'status': 'error',
+                'error': 'Connection error - unable to reach API',
+                'transient': True
+            }
+        except aiohttp.ClientError as e:
+            return {
+                'status': 'error',
+                'error': str(e)
+            }
+        except OSError as e:
+            return {
+                'status': 'error',
+                'error': f'Error reading biometric file: {e}'
+            }
+
+    async def process_drivers_async(self, drivers: Iterable[Tuple[str, List[Dict]]], total: Optional[int],
+                                    results: Dict, concurrency: int = DEFAULT_ASYNC_CONCURRENCY,
+                                    on_result: Optional[Callable[[int, str, List[Dict], Dict], None]] = None) -> int:
+        """
+        Upload drivers with at most concurrency requests in flight.
+
+        A slot is taken before each driver is read from drivers, so a streamed
+        CSV is only consumed as fast as uploads complete. Reading the next
+        driver (CSV parsing, prefetch queue) and prechecking it (journal
+        lookup) run in the I/O thread pool, so in-flight uploads are not
+        stalled while the event loop waits for input. Results are handled on
+        the event loop thread as uploads finish. A driver waiting for a retry
+        gives its slot back during the backoff (the event loop's timer queue
+        is the delayed queue), so it does not hold up the other drivers. With
+        a concurrency controller the number of slots follows its limit. With a
+        circuit breaker, no request is sent while it is open; drivers reached
+        after it gave up are reported with status 'not_attempted'. Only the
+        final outcome of each driver counts towards opening it, and while it
+        is half-open only the probe.
+
+        Args:
+            drivers: Iterable of (numero_carta, rows) pairs
+            total: Total number of drivers (for status lines), or None if unknown
+            results: Results summary to update (ignored when on_result is given)
+            concurrency: Maximum number of uploads in flight (default: 100)
+            on_result: Optional callback (idx, numero_carta, rows, result) called
+                       instead of record_result, for drivers that were prechecked
+                       or uploaded
+
+        Returns:
+            Number of drivers processed
+        """
+        concurrency = max(1, concurrency)
+        controller = self.concurrency_controller
+        slots = UploadSlots(lambda: controller.limit if controller else concurrency)
+        breaker = self.circuit_breaker
+        not_attempted = {'status': 'not_attempted',
+                         'error': 'Not attempted: API unreachable (circuit breaker open)'}
+        tasks = set()
+        if total is None:
+            total = '?'
+        else:
+            self.metrics.set_gauge('drivers_expected', total)
+        idx = 0
+
+        def report(idx, numero_carta, rows, result):
+            self.publish_result(result)
+            if on_result:
+                on_result(idx, numero_carta, rows, result)
+            else:
+                self.record_result(results, idx, total, numero_carta, rows, result)
+
+        async def breaker_admits():
+            # Wait until the breaker lets a request through; False once it gave up
+            while breaker and not breaker.allow_request():
+                if breaker.gave_up:
+                    return False
+                wait_time = breaker.wait_time()
+                await asyncio.sleep(wait_time if wait_time is not None else 0.05)
+            return True
+
+        async def upload(idx, numero_carta, rows, prefetched):
+            attempt = 1
+            try:
+                while True:
+                    started = time.monotonic()
+                    try:
+                        result = await self.upload_driver_async(numero_carta, rows, prefetched)
+                    except Exception as e:
+                        logger.error(f"Unexpected error uploading {numero_carta}: {e}")
+                        result = {'status': 'error', 'error': str(e)}
+                    prefetched = None
+
+                    retry = self.retry_policy.should_retry(result, attempt)
+                    # Only the final outcome counts, so one driver's retries cannot
+                    # open the breaker; while half-open the probe counts either way
+                    if breaker and (not retry or breaker.state == 'half_open'):
+                        if breaker.record(result, started):
+                            self.record_breaker_trip(result)
+
+                    if not retry or (breaker and breaker.gave_up):
+                        break
+
+                    delay = self.retry_policy.delay(attempt, result.get('retry_after'))
+                    self.record_retry(idx, total, numero_carta, result, attempt, delay)
+                    slots.release()
+                    self.metrics.increment('retry_queue')
+                    try:
+                        await asyncio.sleep(delay)
+                    finally:
+                        self.metrics.increment('retry_queue', -1)
+                        await slots.acquire()
+                    if not await breaker_admits():
+                        break
+                    attempt += 1
+            finally:
+                slots.release()
+
+            if result['status'] not in ('no_data', 'unchanged'):
+                result['attempts'] = attempt
+            # This task is discarded from tasks once it returns
+            self.metrics.set_gauge('drivers_pending', len(tasks) - 1)
+            report(idx, numero_carta, rows, result)
+
+        loop = asyncio.get_running_loop()
+        pending = self.iter_prefetched(drivers)
+
+        def read_next():
+            # Next driver and its precheck, off the event loop thread
+            item = next(pending, None)
+            if item is None:
+                return None
+            (numero_carta, rows), prefetched = item
+            return numero_carta, rows, prefetched, self.precheck_driver(numero_carta)
+
+        await self.open_client()
+        try:
+            while True:
+                await slots.acquire()
+                item = await loop.run_in_executor(self.executor, read_next)
+                if item is None:
+                    slots.release()
+                    break
+                idx += 1
+                numero_carta, rows, prefetched, precheck = item
+
+                if precheck:
+                    slots.release()
+                    report(idx, numero_carta, rows, precheck)
+                    continue
+
+                if breaker and breaker.gave_up:
+                    slots.release()
+                    report(idx, numero_carta, rows, dict(not_attempted))
+                    continue
+
+                if not await breaker_admits():
+                    slots.release()
+                    report(idx, numero_carta, rows, dict(not_attempted))
+                    continue
+
+                task = asyncio.create_task(upload(idx, numero_carta, rows, prefetched))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                self.metrics.set_gauge('drivers_pending', len(tasks))
+
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            # Stops the prefetch readers if the loop ended early
+            await loop.run_in_executor(self.executor, pending.close)
+            await self.close_client()
+
+        if not on_result:
+            results['details'].sort(key=lambda detail: detail['driver'])
+        return idx
+
+    def process_drivers(self, drivers: Iterable[Tuple[str, List[Dict]]], total: Optional[int],
+                        results: Dict, concurrency: int = DEFAULT_ASYNC_CONCURRENCY,
+                        on_result: Optional[Callable[[int, str, List[Dict], Dict], None]] = None) -> int:
+        """
+        Run process_drivers_async in a new event loop (used by process_csv and the GUI).
+
+        Args:
+            drivers: Iterable of (numero_carta, rows) pairs
+            total: Total number of drivers (for status lines), or None if unknown
+            results: Results summary to update (ignored when on_result is given)
+            concurrency: Maximum number of uploads in flight (default: 100)
+            on_result: Optional callback (idx, numero_carta, rows, result) called
+                       instead of record_result
+
+        Returns:
+            Number of drivers processed
+        """
+        return asyncio.run(self.process_drivers_async(drivers, total, results, concurrency, on_result))
+
+    def get_connection_stats(self) -> Dict[str, int]:
+        """
+        Get connection reuse statistics for the aiohttp connection pool.
+
+        Returns:
+            Dictionary with number of requests sent, connections opened
+            and requests served over an already open connection
+        """
+        return {
+            'requests': self.requests_sent,
+            'connections_opened': self.connections_opened,
+            'connections_reused': max(0, self.requests_sent - self.connections_opened),
+            'pool_size': self.pool_size
+        }
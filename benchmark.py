@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Upload Benchmark
+Generates a synthetic biometric tree and CSV, starts a local mock
+api-condutores server and runs process_csv once per scenario (layout x
+upload mode x transport), reporting drivers/s, MB/s, peak RSS and the
+per-stage latency percentiles. Results can be saved and compared against
+an earlier run to catch regressions.
+
+Usage:
+    python benchmark.py --drivers 500 --image-size 64K --modes sync:1,sync:8,async:64
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import logging
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from csv_api_sender import BiometricAPIProcessor
+from create_sample_files import generate_tree
+from flow_control import parse_size
+from mock_api_server import MockAPIServer
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Directory layouts understood by find_biometric_files
+LAYOUTS = ('hierarchical', 'flat')
+
+# Stages shown in the results table
+REPORTED_STAGES = ('discover', 'encode', 'send')
+
+
+def generate_dataset(root: str, drivers: int, image_size: Optional[int], layout: str = 'hierarchical') -> str:
+    """
+    Write a synthetic biometric tree in one layout and the matching CSV.
+
+    Every driver gets the four biometric files (face, signature, two
+    fingerprints), without duplicates or missing fields, so scenarios only
+    differ in what is being measured.
+
+    Args:
+        root: Directory to create the tree in ({root}/{layout})
+        drivers: Number of drivers
+        image_size: Size of each biometric file in bytes, or None for realistic sizes
+        layout: 'hierarchical' ({root}/{layout}/{numero_carta}/FOTO_...) or 'flat'
+
+    Returns:
+        Path of the generated CSV file
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout '{layout}' (expected one of {', '.join(LAYOUTS)})")
+
+    summary = generate_tree(os.path.join(root, layout), drivers, os.path.join(root, f"{layout}.csv"),
+                            flat_ratio=1.0 if layout == 'flat' else 0.0, duplicate_rate=0.0,
+                            missing_rate=0.0, file_size=image_size, first_license=20000000)
+    return summary['csv_path']
+
+
+def parse_mode(mode: str) -> Tuple[bool, int]:
+    """
+    Parse an upload mode such as 'sync:8' or 'async:64'.
+
+    Args:
+        mode: 'sync' or 'async', optionally followed by ':concurrency'
+
+    Returns:
+        Tuple (use_async, concurrency)
+
+    Raises:
+        ValueError: If the mode is not valid
+    """
+    kind, _, concurrency = mode.strip().partition(':')
+    if kind not in ('sync', 'async'):
+        raise ValueError(f"Unknown mode '{mode}' (expected sync[:N] or async[:N])")
+    concurrency = int(concurrency) if concurrency else (64 if kind == 'async' else 1)
+    if concurrency < 1:
+        raise ValueError(f"Invalid concurrency in mode '{mode}'")
+    return kind == 'async', concurrency
+
+
+def peak_rss() -> Optional[int]:
+    """
+    Peak resident set size of the current process.
+
+    Returns:
+        Bytes, or None if it cannot be measured on this platform
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+    if PSUTIL_AVAILABLE:
+        memory = psutil.Process().memory_info()
+        return getattr(memory, 'peak_wset', memory.rss)
+    return None
+
+
+def run_scenario(scenario: Dict) -> Dict:
+    """
+    Upload one generated CSV with process_csv and measure it.
+
+    Runs in a fresh worker process, so the peak RSS belongs to this scenario alone.
+
+    Args:
+        scenario: Scenario settings (see build_scenarios)
+
+    Returns:
+        Measurements of the run
+    """
+    # Keep the per-driver console output and file discovery logging out of the measurement
+    logging.getLogger().setLevel(logging.WARNING)
+
+    from retry_policy import RetryPolicy
+
+    processor_class = BiometricAPIProcessor
+    if scenario['use_async']:
+        from async_processor import AsyncBiometricAPIProcessor
+        processor_class = AsyncBiometricAPIProcessor
+
+    concurrency = scenario['concurrency']
+    processor = processor_class(scenario['api_url'], biometric_dir=scenario['biometric_dir'],
+                                pool_size=max(10, concurrency), transport=scenario['transport'],
+                                retry_policy=RetryPolicy(max_attempts=scenario['max_attempts'],
+                                                         base_delay=scenario['retry_backoff']),
+                                prefetch=scenario['prefetch'], batch_size=scenario['batch_size'])
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            started = time.perf_counter()
+            results = processor.process_csv(scenario['csv_file'], concurrency=concurrency,
+                                            stream=scenario['stream'])
+            elapsed = time.perf_counter() - started
+    finally:
+        processor.close()
+
+    sent = processor.metrics.values.get('request_bytes_total', 0)
+    rss = peak_rss()
+    return {
+        'name': scenario['name'],
+        'drivers': results['total_drivers'],
+        'success': results['success'],
+        'failed': results['failed'],
+        'retries': int(processor.metrics.values.get('retries_total', 0)),
+        'seconds': round(elapsed, 3),
+        'drivers_per_second': round(results['total_drivers'] / elapsed, 2) if elapsed else 0.0,
+        'mb_per_second': round(sent / elapsed / 1024 ** 2, 2) if elapsed else 0.0,
+        'bytes_sent': int(sent),
+        'peak_rss_mb': round(rss / 1024 ** 2, 1) if rss is not None else None,
+        'stages': results['stage_latency']['stages'],
+        'batch_seconds': results['stage_latency']['batch_seconds']
+    }
+
+
+def build_scenarios(args, datasets: Dict[str, Tuple[str, str]], api_url: str) -> List[Dict]:
+    """
+    Build the scenario matrix: every layout x mode x transport (the batch
+    transport only with sync modes).
+
+    Args:
+        args: Parsed command line arguments
+        datasets: Layout -> (CSV path, biometric directory)
+        api_url: Base URL of the mock server
+
+    Returns:
+        List of scenario settings for run_scenario
+    """
+    scenarios = []
+    for layout, (csv_file, biometric_dir) in datasets.items():
+        for mode in args.modes:
+            use_async, concurrency = parse_mode(mode)
+            for transport in args.transports:
+                if use_async and transport == 'batch':
+                    continue
+                scenarios.append({
+                    'name': f"{layout}/{'async' if use_async else 'sync'}:{concurrency}/{transport}",
+                    'csv_file': csv_file,
+                    'biometric_dir': biometric_dir,
+                    'api_url': api_url,
+                    'use_async': use_async,
+                    'concurrency': concurrency,
+                    'transport': transport,
+                    'prefetch': args.prefetch,
+                    'batch_size': args.batch_size,
+                    'stream': args.stream,
+                    'max_attempts': args.max_attempts,
+                    'retry_backoff': args.retry_backoff
+                })
+    return scenarios
+
+
+def run_best_of(scenario: Dict, repeat: int) -> Dict:
+    """
+    Run a scenario repeat times, each in a new process, and keep the fastest run.
+
+    Args:
+        scenario: Scenario settings
+        repeat: Number of runs
+
+    Returns:
+        Measurements of the run with the highest drivers/s
+    """
+    context = multiprocessing.get_context('spawn')
+    best = None
+    for _ in range(max(1, repeat)):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(run_scenario, scenario).result()
+        if best is None or result['drivers_per_second'] > best['drivers_per_second']:
+            best = result
+    return best
+
+
+def format_table(runs: List[Dict]) -> str:
+    """
+    Format the measurements as a console table.
+
+    Args:
+        runs: Measurements returned by run_scenario
+
+    Returns:
+        Table text
+    """
+    out = io.StringIO()
+    width = max([len('Scenario')] + [len(run['name']) for run in runs])
+    stage_header = ''.join(f" {stage + ' p50/p95/p99 ms':>26}" for stage in REPORTED_STAGES)
+    out.write(f"{'Scenario':{width}} {'drivers':>7} {'failed':>6} {'seconds':>8} {'drivers/s':>9} "
+              f"{'MB/s':>7} {'peak RSS':>8}{stage_header}\n")
+    out.write("-" * (width + 52 + 27 * len(REPORTED_STAGES)) + "\n")
+    for run in runs:
+        rss = f"{run['peak_rss_mb']:.0f} MB" if run['peak_rss_mb'] is not None else 'n/a'
+        line = (f"{run['name']:{width}} {run['drivers']:7} {run['failed']:6} {run['seconds']:8.2f} "
+                f"{run['drivers_per_second']:9.1f} {run['mb_per_second']:7.2f} {rss:>8}")
+        for stage in REPORTED_STAGES:
+            stats = run['stages'].get(stage)
+            cell = f"{stats['p50_ms']:.2f}/{stats['p95_ms']:.2f}/{stats['p99_ms']:.2f}" if stats else '-'
+            line += f" {cell:>26}"
+        out.write(line + "\n")
+    return out.getvalue()
+
+
+def compare_runs(runs: List[Dict], baseline: List[Dict], tolerance: float) -> List[str]:
+    """
+    Compare measurements with a baseline saved by an earlier --output.
+
+    Args:
+        runs: Current measurements
+        baseline: Baseline measurements
+        tolerance: Allowed relative slowdown (or memory growth), e.g. 0.10 for 10%
+
+    Returns:
+        Description of each regression (empty if none)
+    """
+    previous = {run['name']: run for run in baseline}
+    regressions = []
+    for run in runs:
+        before = previous.get(run['name'])
+        if not before:
+            continue
+        if run['drivers_per_second'] < before['drivers_per_second'] * (1 - tolerance):
+            regressions.append(f"{run['name']}: {run['drivers_per_second']:.1f} drivers/s "
+                               f"(baseline {before['drivers_per_second']:.1f})")
+        if (run['peak_rss_mb'] is not None and before.get('peak_rss_mb') is not None
+                and run['peak_rss_mb'] > before['peak_rss_mb'] * (1 + tolerance)):
+            regressions.append(f"{run['name']}: peak RSS {run['peak_rss_mb']:.0f} MB "
+                               f"(baseline {before['peak_rss_mb']:.0f} MB)")
+    return regressions
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description='Benchmark CSV uploads against a local mock api-condutores server',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Compare sequential, threaded and asyncio uploads of 500 drivers with 64 KB images
+  python benchmark.py --drivers 500 --image-size 64K --modes sync:1,sync:8,async:64
+
+  # One request per driver vs 50 drivers per request to the bulk endpoint
+  python benchmark.py --image-size 8K --modes sync:1,sync:8 --transports json,batch
+
+  # Realistic API: 80 ms per upload, 1%% of uploads fail with 503
+  python benchmark.py --latency 0.08 --error-rate 0.01 --layouts flat
+
+  # Save a baseline, then fail (exit 1) if a later run is more than 10%% slower
+  python benchmark.py --output baseline.json
+  python benchmark.py --baseline baseline.json --tolerance 0.10
+        """
+    )
+    parser.add_argument('--drivers', type=int, default=200, help='Number of drivers (default: 200)')
+    parser.add_argument('--image-size', default='64K', metavar='BYTES',
+                        help="Size of each biometric file, suffixes K, M, or 'realistic' for the "
+                             "size distribution of create_sample_files.py (default: 64K)")
+    parser.add_argument('--layouts', default=','.join(LAYOUTS),
+                        help='Comma-separated directory layouts: hierarchical, flat (default: both)')
+    parser.add_argument('--modes', default='sync:1,sync:8',
+                        help='Comma-separated upload modes sync[:N] / async[:N] (default: sync:1,sync:8)')
+    parser.add_argument('--transports', default='json',
+                        help='Comma-separated transports: json, json-stream, multipart, batch '
+                             '(default: json; batch is skipped in async modes)')
+    parser.add_argument('--batch-size', type=int, default=50, metavar='N',
+                        help='Drivers per request with the batch transport (default: 50)')
+    parser.add_argument('--prefetch', type=int, default=0, metavar='K',
+                        help='Drivers read ahead by the reader stage, like csv_api_sender.py --prefetch '
+                             '(default: 0, no read-ahead)')
+    parser.add_argument('--stream', action='store_true', help='Stream the CSV instead of loading it first')
+    parser.add_argument('--latency', type=float, default=0.01, metavar='SECONDS',
+                        help='Mock server latency per upload (default: 0.01)')
+    parser.add_argument('--jitter', type=float, default=0.0, metavar='SECONDS',
+                        help='Extra random mock latency of up to SECONDS (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0, metavar='RATE',
+                        help='Share of uploads the mock server fails with 503 (default: 0)')
+    parser.add_argument('--max-attempts', type=int, default=3, metavar='N',
+                        help='Attempts per driver (default: 3)')
+    parser.add_argument('--retry-backoff', type=float, default=0.1, metavar='SECONDS',
+                        help='Initial retry backoff (default: 0.1)')
+    parser.add_argument('--repeat', type=int, default=1, metavar='N',
+                        help='Run each scenario N times and keep the fastest run (default: 1)')
+    parser.add_argument('--data-dir', metavar='PATH',
+                        help='Generate the dataset here and keep it (default: temporary directory)')
+    parser.add_argument('--output', '-o', metavar='FILE', help='Save the measurements to a JSON file')
+    parser.add_argument('--baseline', metavar='FILE',
+                        help='Compare with measurements saved by --output; exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Allowed slowdown or peak RSS growth against --baseline (default: 0.10)')
+
+    args = parser.parse_args()
+
+    image_size = None
+    if args.image_size != 'realistic':
+        try:
+            image_size = parse_size(args.image_size)
+        except ValueError:
+            parser.error(f'Invalid --image-size: {args.image_size}')
+    layouts = [layout.strip() for layout in args.layouts.split(',') if layout.strip()]
+    for layout in layouts:
+        if layout not in LAYOUTS:
+            parser.error(f"Unknown layout '{layout}' (expected one of {', '.join(LAYOUTS)})")
+    args.modes = [mode for mode in args.modes.split(',') if mode.strip()]
+    for mode in args.modes:
+        try:
+            parse_mode(mode)
+        except ValueError as e:
+            parser.error(str(e))
+    args.transports = [transport.strip() for transport in args.transports.split(',') if transport.strip()]
+    for transport in args.transports:
+        if transport not in BiometricAPIProcessor.TRANSPORTS:
+            parser.error(f"Unknown transport '{transport}' "
+                         f"(expected one of {', '.join(BiometricAPIProcessor.TRANSPORTS)})")
+    if args.drivers < 1:
+        parser.error('--drivers must be at least 1')
+    if args.batch_size < 1:
+        parser.error('--batch-size must be at least 1')
+    if not 0.0 <= args.error_rate <= 1.0:
+        parser.error('--error-rate must be between 0 and 1')
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['runs']
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='biometric_benchmark_')
+    try:
+        datasets = {}
+        for layout in layouts:
+            started = time.perf_counter()
+            csv_file = generate_dataset(data_dir, args.drivers, image_size, layout)
+            datasets[layout] = (csv_file, os.path.join(data_dir, layout))
+            logger.info(f"Generated {args.drivers} drivers ({layout}, {args.image_size} files) "
+                        f"in {time.perf_counter() - started:.1f}s")
+
+        with MockAPIServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                           seed=0) as server:
+            runs = []
+            for scenario in build_scenarios(args, datasets, server.url):
+                logger.info(f"Running {scenario['name']}")
+                runs.append(run_best_of(scenario, args.repeat))
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    print()
+    print(format_table(runs))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'settings': {'drivers': args.drivers, 'image_size': image_size,
+                                    'latency': args.latency, 'error_rate': args.error_rate},
+                       'runs': runs}, f, indent=2)
+        print(f"Measurements saved to: {args.output}")
+
+    if baseline is not None:
+        regressions = compare_runs(runs, baseline, args.tolerance)
+        if regressions:
+            print(f"Regressions against {args.baseline} (tolerance {args.tolerance:.0%}):")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
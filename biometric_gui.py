@@ -14,6 +14,13 @@ import webbrowser
 from pathlib import Path
 from datetime import datetime
 from csv_api_sender import BiometricAPIProcessor
+from csv_chunks import CSV_FILETYPES
+from async_processor import AIOHTTP_AVAILABLE, AIOHTTP_INSTALL_HINT, AsyncBiometricAPIProcessor
+from biometric_index import DEFAULT_CACHE_PATH
+from upload_state import DEFAULT_MANIFEST_PATH
+from retry_policy import RetryPolicy
+from flow_control import AIMDController, CircuitBreaker, RateLimiter
+from metrics import MetricsExporter
 from report_viewer import generate_html_report
 
 
@@ -35,8 +42,25 @@ class BiometricUploaderGUI:
         self.biometric_dir = tk.StringVar(value=config.get('biometric_dir', r"C:\Biometric"))
         self.api_url = tk.StringVar(value=config.get('api_url', "http:192.168.0.7:4000"))
         self.auth_token = tk.StringVar()
+        self.resume_upload = tk.BooleanVar(value=False)
         self.input_mode = tk.StringVar(value=config.get('input_mode', 'csv'))
         self.manual_numbers_list = config.get('manual_numbers', [])
+        self.use_discovery_cache = config.get('discovery_cache', False)
+        self.use_upload_manifest = config.get('skip_unchanged', False)
+        self.journal_uploads = config.get('journal_uploads', False)
+        self.concurrency = self.config_number(config, 'concurrency', 1, minimum=1)
+        self.max_attempts = self.config_number(config, 'max_attempts', 3, minimum=1)
+        self.max_requests_per_second = self.config_number(config, 'max_requests_per_second', None, float)
+        self.max_bytes_per_second = self.config_number(config, 'max_bytes_per_second', None, float)
+        self.adaptive_concurrency = config.get('adaptive_concurrency', False)
+        self.aimd_initial = self.config_number(config, 'aimd_initial', None, minimum=1)
+        self.aimd_decrease_factor = self.config_number(config, 'aimd_decrease_factor', 0.5, float)
+        self.aimd_latency_tolerance = self.config_number(config, 'aimd_latency_tolerance', 2.0, float)
+        self.breaker_threshold = self.config_number(config, 'breaker_threshold', 10)
+        self.breaker_mode = config.get('breaker_mode', 'fail-fast')
+        self.prefetch = self.config_number(config, 'prefetch', 0, minimum=0)
+        self.metrics_port = self.config_number(config, 'metrics_port', None)
+        self.metrics_textfile = config.get('metrics_textfile')
         self.is_processing = False
         self.message_queue = queue.Queue()
 
@@ -49,6 +73,34 @@ class BiometricUploaderGUI:
         # Start queue checker
         self.check_queue()
 
+    @staticmethod
+    def config_number(config, key, default, cast=int, minimum=None):
+        """
+        Read a numeric setting from the loaded config.json.
+
+        Args:
+            config: Loaded configuration
+            key: Setting name
+            default: Value used when the setting is missing, null or malformed
+            cast: Number type (default: int)
+            minimum: Optional lowest allowed value
+
+        Returns:
+            The setting as cast, or default
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+
+        value = config.get(key)
+        if value is None:
+            return default
+        try:
+            value = cast(value)
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid {key} in config.json: {value!r}, using {default!r}")
+            return default
+        return max(minimum, value) if minimum is not None else value
+
     def load_config(self):
         """Load configuration from config.json in project directory."""
         import logging
@@ -61,6 +113,22 @@ class BiometricUploaderGUI:
             'last_csv_path': '',
             'input_mode': 'csv',
             'manual_numbers': [],
+            'discovery_cache': False,
+            'skip_unchanged': False,
+            'journal_uploads': False,
+            'concurrency': 1,
+            'max_attempts': 3,
+            'max_requests_per_second': None,
+            'max_bytes_per_second': None,
+            'adaptive_concurrency': False,
+            'aimd_initial': None,
+            'aimd_decrease_factor': 0.5,
+            'aimd_latency_tolerance': 2.0,
+            'breaker_threshold': 10,
+            'breaker_mode': 'fail-fast',
+            'prefetch': 0,
+            'metrics_port': None,
+            'metrics_textfile': None,
             'version': '1.0'
         }
 
@@ -100,6 +168,22 @@ class BiometricUploaderGUI:
             'last_csv_path': self.csv_file_path.get(),
             'input_mode': self.input_mode.get(),
             'manual_numbers': self.manual_numbers_list,
+            'discovery_cache': self.use_discovery_cache,
+            'skip_unchanged': self.use_upload_manifest,
+            'journal_uploads': self.journal_uploads,
+            'concurrency': self.concurrency,
+            'max_attempts': self.max_attempts,
+            'max_requests_per_second': self.max_requests_per_second,
+            'max_bytes_per_second': self.max_bytes_per_second,
+            'adaptive_concurrency': self.adaptive_concurrency,
+            'aimd_initial': self.aimd_initial,
+            'aimd_decrease_factor': self.aimd_decrease_factor,
+            'aimd_latency_tolerance': self.aimd_latency_tolerance,
+            'breaker_threshold': self.breaker_threshold,
+            'breaker_mode': self.breaker_mode,
+            'prefetch': self.prefetch,
+            'metrics_port': self.metrics_port,
+            'metrics_textfile': self.metrics_textfile,
             'version': '1.0'
         }
 
@@ -369,6 +453,13 @@ class BiometricUploaderGUI:
             style="Subtitle.TLabel"
         ).grid(row=3, column=1, sticky=tk.W, padx=(10, 0))
 
+        # Resume interrupted upload
+        ttk.Checkbutton(
+            config_frame,
+            text="Resume previous upload (skip drivers already uploaded)",
+            variable=self.resume_upload
+        ).grid(row=4, column=1, sticky=tk.W, pady=(5, 0), padx=(10, 0))
+
         # Progress Section
         progress_frame = ttk.LabelFrame(main_frame, text="Progress", padding="15")
         progress_frame.grid(row=5, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 15))
@@ -454,7 +545,7 @@ class BiometricUploaderGUI:
         """Open file dialog to select CSV file."""
         filename = filedialog.askopenfilename(
             title="Select CSV File",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+            filetypes=CSV_FILETYPES
         )
         if filename:
             self.csv_file_path.set(filename)
@@ -675,6 +766,8 @@ class BiometricUploaderGUI:
 
     def upload_worker(self):
         """Worker thread for upload process."""
+        processor = None
+        exporter = None
         try:
             # Prepare headers
             headers = {'Content-Type': 'application/json'}
@@ -683,7 +776,64 @@ class BiometricUploaderGUI:
 
             # Create processor
             biometric_dir = self.biometric_dir.get() if self.biometric_dir.get() else None
-            processor = BiometricAPIProcessor(self.api_url.get(), headers, biometric_dir)
+            discovery_cache = DEFAULT_CACHE_PATH if self.use_discovery_cache else None
+            manifest = DEFAULT_MANIFEST_PATH if self.use_upload_manifest else None
+
+            # Upload concurrently from an asyncio event loop when configured
+            # (config.json "concurrency" > 1) and aiohttp is installed
+            use_async = self.concurrency > 1 and AIOHTTP_AVAILABLE
+            processor_class = AsyncBiometricAPIProcessor if use_async else BiometricAPIProcessor
+            if use_async:
+                self.message_queue.put({
+                    'type': 'status',
+                    'text': f"⚙ Uploading with the asyncio uploader, up to {self.concurrency} "
+                            f"requests in flight (config.json \"concurrency\")",
+                    'tag': 'info'
+                })
+            elif self.concurrency > 1:
+                self.message_queue.put({
+                    'type': 'status',
+                    'text': f"⚠ Warning: config.json \"concurrency\" is {self.concurrency} but aiohttp "
+                            f"is not installed ({AIOHTTP_INSTALL_HINT}); uploading with "
+                            f"{self.concurrency} threads instead",
+                    'tag': 'warning'
+                })
+
+            # Optional throttling from config.json
+            rate_limiter = None
+            if self.max_requests_per_second or self.max_bytes_per_second:
+                rate_limiter = RateLimiter(self.max_requests_per_second, self.max_bytes_per_second)
+            controller = None
+            if self.adaptive_concurrency:
+                controller = AIMDController(self.concurrency, initial=self.aimd_initial,
+                                            decrease_factor=self.aimd_decrease_factor,
+                                            latency_tolerance=self.aimd_latency_tolerance)
+
+            # Stop sending once the API looks unreachable (config.json "breaker_threshold", 0 disables)
+            breaker = None
+            if self.breaker_threshold > 0:
+                breaker = CircuitBreaker(self.breaker_threshold, self.breaker_mode)
+
+            processor = processor_class(self.api_url.get(), headers, biometric_dir,
+                                        pool_size=max(10, self.concurrency),
+                                        discovery_cache=discovery_cache, manifest=manifest,
+                                        retry_policy=RetryPolicy(max_attempts=self.max_attempts),
+                                        rate_limiter=rate_limiter, concurrency_controller=controller,
+                                        circuit_breaker=breaker, prefetch=self.prefetch)
+
+            # Optional live Prometheus metrics (config.json "metrics_port" / "metrics_textfile")
+            if self.metrics_port is not None or self.metrics_textfile:
+                exporter = MetricsExporter(processor.metrics, port=self.metrics_port,
+                                           textfile=self.metrics_textfile)
+                try:
+                    exporter.start()
+                except OSError as e:
+                    exporter = None
+                    self.message_queue.put({
+                        'type': 'status',
+                        'text': f"⚠ Warning: cannot serve metrics on port {self.metrics_port}: {e}",
+                        'tag': 'warning'
+                    })
 
             # Get license numbers based on input mode
             mode = self.input_mode.get()
@@ -696,12 +846,14 @@ class BiometricUploaderGUI:
                     'tag': 'info'
                 })
 
-                records = processor.read_csv(self.csv_file_path.get())
-                grouped_records = processor.group_by_license(records)
+                grouped_records, row_count = processor.read_license_groups(self.csv_file_path.get())
+
+                if grouped_records:
+                    processor.build_file_index()
 
                 self.message_queue.put({
                     'type': 'status',
-                    'text': f"✓ Found {len(records)} CSV rows → {len(grouped_records)} unique drivers\n",
+                    'text': f"✓ Found {row_count} CSV rows → {len(grouped_records)} unique drivers\n",
                     'tag': 'success'
                 })
             else:
@@ -714,7 +866,7 @@ class BiometricUploaderGUI:
 
                 # Create grouped_records dict (empty list for each number - no CSV data needed)
                 grouped_records = {numero: [] for numero in self.manual_numbers_list}
-                records = []  # No CSV records in manual mode
+                row_count = 0  # No CSV records in manual mode
 
                 self.message_queue.put({
                     'type': 'status',
@@ -722,6 +874,16 @@ class BiometricUploaderGUI:
                     'tag': 'success'
                 })
 
+            # Checkpoint journal so an interrupted upload can be resumed, only when
+            # resuming or when config.json sets "journal_uploads"
+            journal = None
+            if self.resume_upload.get() or self.journal_uploads:
+                if mode == 'csv':
+                    journal_path = f"{self.csv_file_path.get()}.journal"
+                else:
+                    journal_path = os.path.join(os.path.dirname(__file__), 'manual_upload.journal')
+                journal = processor.open_journal(journal_path, resume=self.resume_upload.get())
+
             self.message_queue.put({
                 'type': 'status',
                 'text': "=" * 80,
@@ -730,40 +892,62 @@ class BiometricUploaderGUI:
 
             # Process each driver
             results = {
-                'total_csv_rows': len(records) if mode == 'csv' else 0,
+                'total_csv_rows': row_count,
                 'total_drivers': len(grouped_records),
                 'success': 0,
                 'failed': 0,
                 'skipped': 0,
+                'not_attempted': 0,
                 'details': []
             }
 
-            for idx, (numero_carta, rows) in enumerate(grouped_records.items(), 1):
-                progress = (idx / len(grouped_records)) * 100
+            completed = [0]
+
+            def handle_result(idx, numero_carta, rows, result):
+                completed[0] += 1
+                progress = (completed[0] / len(grouped_records)) * 100
                 self.message_queue.put({'type': 'progress', 'value': progress})
 
-                if not numero_carta:
+                if result['status'] == 'missing_license':
                     msg = f"[{idx}/{len(grouped_records)}] ✗ SKIPPED: Missing license number"
                     self.message_queue.put({'type': 'status', 'text': msg, 'tag': 'error'})
                     results['skipped'] += 1
-                    continue
+                    return
 
-                # Build payload based on mode
-                if mode == 'manual':
-                    # Manual mode: Build payload directly from license number (no CSV rows)
-                    payload = processor.build_payload_from_license_number(numero_carta)
-                else:
-                    # CSV mode: Build payload from CSV rows
-                    payload = processor.build_payload_from_rows(rows)
+                if result['status'] == 'not_attempted':
+                    if not results['not_attempted']:
+                        msg = "✗ API unreachable - remaining drivers not attempted (resume later)"
+                        self.message_queue.put({'type': 'status', 'text': msg, 'tag': 'error'})
+                    results['not_attempted'] += 1
+                    results['details'].append({
+                        'numero_carta': numero_carta,
+                        'status': 'not_attempted',
+                        'error': result.get('error', 'Not attempted')
+                    })
+                    if journal:
+                        journal.record(numero_carta, 'not_attempted', result.get('error'))
+                    return
+
+                if result['status'] == 'resumed':
+                    msg = f"[{idx}/{len(grouped_records)}] ⊘ SKIPPED {numero_carta}: Already uploaded (resumed)"
+                    self.message_queue.put({'type': 'status', 'text': msg, 'tag': 'warning'})
+                    results['skipped'] += 1
+                    return
 
-                if not payload:
-                    msg = f"[{idx}/{len(grouped_records)}] ⊘ SKIPPED {numero_carta}: No biometric data found"
+                if result['status'] in ('no_data', 'unchanged'):
+                    if result['status'] == 'unchanged':
+                        reason = "Biometrics unchanged since last upload"
+                    else:
+                        reason = "No biometric data found"
+                    msg = f"[{idx}/{len(grouped_records)}] ⊘ SKIPPED {numero_carta}: {reason}"
                     self.message_queue.put({'type': 'status', 'text': msg, 'tag': 'warning'})
                     results['skipped'] += 1
-                    continue
+                    if journal:
+                        journal.record(numero_carta, 'skipped', reason)
+                    return
 
-                # Send to API
-                result = processor.send_to_api(numero_carta, payload)
+                if journal:
+                    journal.record(numero_carta, result['status'], result.get('error'))
 
                 if result['status'] == 'success':
                     results['success'] += 1
@@ -780,7 +964,8 @@ class BiometricUploaderGUI:
                         'numero_carta': numero_carta,
                         'status': 'success',
                         'files_created': files_created,
-                        'files_updated': files_updated
+                        'files_updated': files_updated,
+                        'timings_ms': processor.format_timings(result.get('timings', {}))
                     })
 
                 elif result['status'] == 'skipped':
@@ -797,12 +982,19 @@ class BiometricUploaderGUI:
                     results['details'].append({
                         'numero_carta': numero_carta,
                         'status': 'failed',
-                        'error': error
+                        'error': error,
+                        'timings_ms': processor.format_timings(result.get('timings', {}))
                     })
 
                 # Update summary
                 self.message_queue.put({'type': 'summary', 'results': results})
 
+            # Build payloads and send to API (manual mode has no CSV rows, so
+            # payloads are built from the license number alone). Failed attempts
+            # are retried in the background according to the retry policy.
+            processor.process_drivers(grouped_records.items(), len(grouped_records), results,
+                                      self.concurrency, on_result=handle_result)
+
             # Final summary
             self.message_queue.put({'type': 'status', 'text': "\n" + "=" * 80, 'tag': 'header'})
             self.message_queue.put({'type': 'status', 'text': "UPLOAD COMPLETE", 'tag': 'header'})
@@ -815,6 +1007,10 @@ class BiometricUploaderGUI:
                     'tag': 'warning'
                 })
 
+            for line in processor.metrics.format_report(histograms=False):
+                self.message_queue.put({'type': 'status', 'text': line, 'tag': 'info'})
+            results['stage_latency'] = processor.metrics.summary()
+
             self.message_queue.put({'type': 'progress', 'value': 100})
             self.message_queue.put({'type': 'complete', 'results': results})
 
@@ -825,6 +1021,12 @@ class BiometricUploaderGUI:
                 'tag': 'error'
             })
             self.message_queue.put({'type': 'complete', 'results': {}})
+        finally:
+            if exporter:
+                exporter.stop()
+            if processor:
+                processor.close_journal()
+                processor.close()
 
     def save_report(self):
         """Save detailed report to JSON and HTML files."""
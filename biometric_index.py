@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Biometric Directory Index
+One-pass index of the biometric directory used by BiometricAPIProcessor to
+resolve file patterns without a stat/glob call per driver, with an optional
+persistent SQLite cache so unchanged directories are not listed again.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Default location of the discovery cache (next to config.json)
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'discovery_cache.sqlite')
+
+# Directories modified this recently are not trusted on the next run: a file
+# added within the filesystem's mtime granularity (2s on FAT/SMB) would not
+# change the directory mtime again.
+RACY_MTIME_SECONDS = 2
+
+# Wildcard patterns used by find_biometric_files, as (prefix, suffix) around
+# "{numero_carta}_*". Only names in these families need wildcard keys.
+WILDCARD_FAMILIES = (
+    ('FOTO_', '.jpg'),
+    ('ASSINATURA_', '.png'),
+    ('IMPRESSAO_DIGITAL_1_', '.bmp'),
+    ('IMPRESSAO_DIGITAL_2_', '.bmp'),
+)
+_NORMALIZED_FAMILIES = tuple((os.path.normcase(prefix), os.path.normcase(suffix))
+                             for prefix, suffix in WILDCARD_FAMILIES)
+
+
+class DirectoryListing:
+    """Names of one directory, keyed for exact and wildcard pattern lookups."""
+
+    __slots__ = ('path', 'names', 'wildcards')
+
+    def __init__(self, path: str, names: Iterable[str] = ()):
+        """
+        Initialize the listing.
+
+        Args:
+            path: Directory path
+            names: Entry names in directory listing order
+        """
+        self.path = path
+        self.names = {}
+        self.wildcards = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str):
+        """
+        Add a directory entry to the listing.
+
+        Args:
+            name: Entry name as returned by os.scandir
+        """
+        key = os.path.normcase(name)
+        self.names.setdefault(key, name)
+
+        for prefix, suffix in _NORMALIZED_FAMILIES:
+            if not (key.startswith(prefix) and key.endswith(suffix)):
+                continue
+
+            # "{prefix}{numero_carta}_*{suffix}" - any underscore after the prefix
+            # may end the license number, so register every possible head.
+            # setdefault keeps the first entry in listing order, like glob()[0].
+            pos = key.find('_', len(prefix))
+            while pos != -1 and pos + 1 + len(suffix) <= len(key):
+                self.wildcards.setdefault((key[:pos + 1], suffix), name)
+                pos = key.find('_', pos + 1)
+
+    def match(self, pattern: str) -> Optional[str]:
+        """
+        Resolve a find_biometric_files pattern against this listing.
+
+        Args:
+            pattern: File name, optionally with a single '*' wildcard
+
+        Returns:
+            Matching file path (as os.path.exists/glob would report it) or None
+        """
+        if '*' in pattern:
+            head, tail = pattern.split('*', 1)
+            name = self.wildcards.get((os.path.normcase(head), os.path.normcase(tail)))
+            return os.path.join(self.path, name) if name else None
+
+        if os.path.normcase(pattern) in self.names:
+            return os.path.join(self.path, pattern)
+        return None
+
+
+class BiometricFileIndex:
+    """
+    Index of {biometric_dir} and its per-license subdirectories.
+    Built with one os.scandir pass over the base directory and each subdirectory.
+    """
+
+    def __init__(self, biometric_dir: str):
+        """
+        Initialize an empty index.
+
+        Args:
+            biometric_dir: Base directory containing biometric files
+        """
+        self.biometric_dir = biometric_dir
+        self.root = DirectoryListing(biometric_dir)
+        self.subdirs: Dict[str, Optional[DirectoryListing]] = {}
+        self.rescanned = 0
+
+    def build(self, cache: Optional['DiscoveryCache'] = None) -> 'BiometricFileIndex':
+        """
+        Scan the biometric directory and its subdirectories.
+
+        With a discovery cache, directories whose mtime is unchanged since the
+        previous run are loaded from the cache instead of being listed again.
+
+        Args:
+            cache: Optional persistent discovery cache
+
+        Returns:
+            The index itself
+
+        Raises:
+            OSError: If the base directory cannot be listed
+        """
+        cached = cache.load(self.biometric_dir) if cache else {}
+        self.rescanned = 0
+
+        subdir_names = []
+        for name, is_dir in self._list_directory('', cached, cache):
+            self.root.add(name)
+            if is_dir:
+                subdir_names.append(name)
+
+        for name in subdir_names:
+            try:
+                entries = self._list_directory(name, cached, cache)
+            except OSError as e:
+                logger.warning(f"Could not index {os.path.join(self.biometric_dir, name)}: {e}")
+                self.subdirs[os.path.normcase(name)] = None
+                continue
+
+            listing = DirectoryListing(os.path.join(self.biometric_dir, name))
+            for entry_name, _ in entries:
+                listing.add(entry_name)
+            self.subdirs[os.path.normcase(name)] = listing
+
+        if cache:
+            cache.prune(self.biometric_dir, [''] + subdir_names)
+            cache.commit()
+            logger.info(f"Discovery cache: {self.rescanned} of {len(subdir_names) + 1} "
+                        f"directories rescanned")
+
+        logger.info(f"Indexed {len(self.root.names)} entries and {len(self.subdirs)} "
+                    f"subdirectories in {self.biometric_dir}")
+        return self
+
+    def _list_directory(self, name: str, cached: Dict, cache: Optional['DiscoveryCache']) -> List[Tuple]:
+        """
+        List the base directory ('') or one license subdirectory.
+
+        Args:
+            name: Subdirectory name relative to biometric_dir
+            cached: Listings loaded from the discovery cache
+            cache: Discovery cache to update, or None
+
+        Returns:
+            List of (name, is_dir) tuples in listing order
+
+        Raises:
+            OSError: If the directory cannot be listed
+        """
+        path = os.path.join(self.biometric_dir, name) if name else self.biometric_dir
+
+        if cache is None:
+            with os.scandir(path) as entries:
+                return [(entry.name, _is_dir(entry)) for entry in entries]
+
+        dir_mtime_ns = os.stat(path).st_mtime_ns
+        hit = cached.get(name)
+        if hit and hit[0] == dir_mtime_ns:
+            return hit[1]
+
+        # File sizes and mtimes are not cached: rewriting a file in place does
+        # not change its directory's mtime, so they could be stale
+        with os.scandir(path) as entries:
+            listing = [(entry.name, _is_dir(entry)) for entry in entries]
+
+        if time.time() - dir_mtime_ns / 1e9 < RACY_MTIME_SECONDS:
+            dir_mtime_ns = None
+        cache.store(self.biometric_dir, name, dir_mtime_ns, listing)
+        self.rescanned += 1
+        return listing
+
+    def lookup_dir(self, numero_carta: str) -> Tuple[bool, Optional[DirectoryListing]]:
+        """
+        Look up the hierarchical directory for a license number.
+
+        Args:
+            numero_carta: Driver's license number
+
+        Returns:
+            Tuple (exists, listing). listing is an empty DirectoryListing when the
+            path exists but is not a directory, and None when it exists but could
+            not be indexed (callers should fall back to the filesystem).
+        """
+        key = os.path.normcase(numero_carta)
+        carta_dir = os.path.join(self.biometric_dir, numero_carta)
+
+        if key not in self.root.names:
+            return False, DirectoryListing(carta_dir)
+        if key not in self.subdirs:
+            return True, DirectoryListing(carta_dir)
+
+        listing = self.subdirs[key]
+        if listing is None:
+            return True, None
+        if listing.path != carta_dir:
+            # Same directory reached through a different letter case (Windows)
+            listing = _rebased(listing, carta_dir)
+        return True, listing
+
+
+def _rebased(listing: DirectoryListing, path: str) -> DirectoryListing:
+    """
+    Return a view of a listing that reports paths under another spelling
+    of the same directory.
+
+    Args:
+        listing: Existing directory listing
+        path: Directory path to report
+
+    Returns:
+        DirectoryListing sharing the lookup tables of listing
+    """
+    view = DirectoryListing(path)
+    view.names = listing.names
+    view.wildcards = listing.wildcards
+    return view
+
+
+def _is_dir(entry: os.DirEntry) -> bool:
+    """Return entry.is_dir(), treating unreadable entries as files."""
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
+
+
+class DiscoveryCache:
+    """
+    Persistent SQLite cache of biometric directory listings.
+    A cached listing is reused while its directory mtime is unchanged.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            db_path: Path to the SQLite file (default: discovery_cache.sqlite next to config.json)
+        """
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS directories (
+                root TEXT NOT NULL,
+                name TEXT NOT NULL,
+                mtime_ns INTEGER,
+                PRIMARY KEY (root, name)
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                root TEXT NOT NULL,
+                directory TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                is_dir INTEGER NOT NULL,
+                PRIMARY KEY (root, directory, position)
+            );
+        ''')
+
+    @staticmethod
+    def _root_key(biometric_dir: str) -> str:
+        """Normalize the biometric directory so equivalent spellings share a cache."""
+        return os.path.normcase(os.path.abspath(biometric_dir))
+
+    def load(self, biometric_dir: str) -> Dict[str, Tuple[Optional[int], List[Tuple]]]:
+        """
+        Load all cached listings under a biometric directory.
+
+        Args:
+            biometric_dir: Base directory containing biometric files
+
+        Returns:
+            Dictionary mapping subdirectory name ('' for the base directory)
+            to (mtime_ns, [(name, is_dir), ...])
+        """
+        root = self._root_key(biometric_dir)
+        cached = {
+            name: (mtime_ns, [])
+            for name, mtime_ns in self.conn.execute(
+                'SELECT name, mtime_ns FROM directories WHERE root = ?', (root,))
+        }
+        rows = self.conn.execute(
+            'SELECT directory, name, is_dir FROM entries '
+            'WHERE root = ? ORDER BY directory, position', (root,))
+        for directory, name, is_dir in rows:
+            if directory in cached:
+                cached[directory][1].append((name, bool(is_dir)))
+        return cached
+
+    def store(self, biometric_dir: str, name: str, mtime_ns: Optional[int], listing: List[Tuple]):
+        """
+        Replace the cached listing of one directory.
+
+        Args:
+            biometric_dir: Base directory containing biometric files
+            name: Subdirectory name ('' for the base directory)
+            mtime_ns: Directory mtime, or None to force a rescan next run
+            listing: List of (name, is_dir) tuples
+        """
+        root = self._root_key(biometric_dir)
+        self.conn.execute('DELETE FROM entries WHERE root = ? AND directory = ?', (root, name))
+        self.conn.execute('INSERT OR REPLACE INTO directories (root, name, mtime_ns) VALUES (?, ?, ?)',
+                          (root, name, mtime_ns))
+        self.conn.executemany(
+            'INSERT INTO entries (root, directory, position, name, is_dir) VALUES (?, ?, ?, ?, ?)',
+            [(root, name, position, entry_name, int(is_dir))
+             for position, (entry_name, is_dir) in enumerate(listing)])
+
+    def prune(self, biometric_dir: str, present: Iterable[str]):
+        """
+        Drop cached listings of directories that no longer exist.
+
+        Args:
+            biometric_dir: Base directory containing biometric files
+            present: Subdirectory names found in this run ('' for the base directory)
+        """
+        root = self._root_key(biometric_dir)
+        present = set(present)
+        stale = [name for (name,) in self.conn.execute(
+            'SELECT name FROM directories WHERE root = ?', (root,)) if name not in present]
+        for name in stale:
+            self.conn.execute('DELETE FROM directories WHERE root = ? AND name = ?', (root, name))
+            self.conn.execute('DELETE FROM entries WHERE root = ? AND directory = ?', (root, name))
+
+    def commit(self):
+        """Write pending changes to disk."""
+        self.conn.commit()
+
+    def close(self):
+        """Close the cache database."""
+        self.conn.close()
@@ -3,10 +3,18 @@
 
 import PyInstaller.__main__
 import os
+import sys
+
+from async_processor import AIOHTTP_AVAILABLE, AIOHTTP_INSTALL_HINT
 
 # Get the current directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
+# Without aiohttp in the bundle the GUI silently falls back to threaded uploads
+if not AIOHTTP_AVAILABLE:
+    sys.exit(f"aiohttp is not installed; install it before building ({AIOHTTP_INSTALL_HINT}, "
+             f"or pip install -r requirements.txt)")
+
 # PyInstaller arguments
 PyInstaller.__main__.run([
     'biometric_gui.py',
@@ -15,6 +23,7 @@ PyInstaller.__main__.run([
     '--windowed',
     '--icon=NONE',
     '--add-data=csv_api_sender.py:.',
+    '--hidden-import=aiohttp',
     '--clean',
     '--noconfirm',
     f'--distpath={os.path.join(current_dir, "dist")}',
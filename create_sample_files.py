@@ -1,10 +1,36 @@
 #!/usr/bin/env python3
-"""Create sample biometric files for testing."""
+"""
+Create sample biometric files for testing.
+
+Writes N synthetic drivers in a mix of the hierarchical
+({output_dir}/{numero_carta}/FOTO_...) and flat ({output_dir}/FOTO_...)
+layouts, with realistic file sizes, older timestamped duplicates and
+missing fields, plus a matching CSV in the sample_data.csv format. Drivers
+are written by a pool of worker processes, so trees of a million files can
+be generated for benchmarks.
+
+Usage:
+    python create_sample_files.py --drivers 1000 --output-dir /data/biometric
+"""
 
 import base64
 import os
+import csv
+import math
+import time
+import random
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
 
-# Sample base64 data
+# Sample base64 data (valid 1x1 images, used as the header of every generated file)
 SAMPLE_DATA = {
     "fileFace": "/9j/4AAQSkZJRgABAQEAYABgAAD/2wBDAAIBAQIBAQICAgICAgICAwUDAwMDAwYEBAMFBwYHBwcGBwcICQsJCAgKCAcHCg0KCgsMDAwMBwkODw0MDgsMDAz/wAARCAABAAEDASIAAhEBAxEB/8QAHwAAAQUBAQEBAQEAAAAAAAAAAAECAwQFBgcICQoL/8QAtRAAAgEDAwIEAwUFBAQAAAF9AQIDAAQRBRIhMUEGE1FhByJxFDKBkaEII0KxwRVS0fAkM2JyggkKFhcYGRolJicoKSo0NTY3ODk6Q0RFRkdISUpTVFVWV1hZWmNkZWZnaGlqc3R1dnd4eXqDhIWGh4iJipKTlJWWl5iZmqKjpKWmp6ipqrKztLW2t7i5usLDxMXGx8jJytLT1NXW19jZ2uHi4+Tl5ufo6erx8vP09fb3+Pn6/8QAHwEAAwEBAQEBAQEBAQAAAAAAAAECAwQFBgcICQoL/8QAtREAAgECBAQDBAcFBAQAAQJ3AAECAxEEBSExBhJBUQdhcRMiMoEIFEKRobHBCSMzUvAVYnLRChYkNOEl8RcYGRomJygpKjU2Nzg5OkNERUZHSElKU1RVVldYWVpjZGVmZ2hpanN0dXZ3eHl6goOEhYaHiImKkpOUlbaWl5iZmqKjpKWmp6ipqrKztLW2t7i5usLDxMXGx8jJytLT1NXW19jZ2uLj5OXm5+jp6vLz9PX29/j5+v/aAAwDAQACEQMRAD8A/v4ooooA//2Q==",
     "fileSign": "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII=",
@@ -12,30 +38,278 @@ SAMPLE_DATA = {
     "filesFinger2": "Qk06AAAAAAAAADYAAAAoAAAAAQAAAAEAAAABABgAAAAAAAQAAAAAAAAAAAAAAAAAAAAAAAAA"
 }
 
-# Create sample files
-output_dir = "/opt/dev-container/PycharmProjects/firefighter/sample_biometric_data"
-os.makedirs(output_dir, exist_ok=True)
+HEADERS = {api_field: base64.b64decode(data) for api_field, data in SAMPLE_DATA.items()}
+
+# Per API field: (Tipo_Biometria code, file name pattern, median size in bytes, log-normal sigma).
+# Sizes follow the production exports: JPEG photos vary a lot, PNG signatures
+# are small, fingerprint BMPs have fixed dimensions and barely vary.
+FIELD_SPECS = {
+    'fileFace': ('1', 'FOTO_{numero_carta}_{timestamp}.jpg', 35_000, 0.35),
+    'fileSign': ('2', 'ASSINATURA_{numero_carta}_{timestamp}.png', 6_000, 0.5),
+    'filesFinger1': ('3', 'IMPRESSAO_DIGITAL_1_{numero_carta}_{timestamp}.bmp', 93_000, 0.05),
+    'filesFinger2': ('4', 'IMPRESSAO_DIGITAL_2_{numero_carta}_{timestamp}.bmp', 93_000, 0.05)
+}
+
+# CSV header of sample_data.csv
+CSV_COLUMNS = ['ID', 'Numero_Carta', 'Nome_Ficheiro', 'Caminho_Completo', 'Is_Active', 'Tipo_Biometria']
+
+# Timestamp of the sample files; generated timestamps spread over the year before it
+BASE_TIMESTAMP = 1694521263
+
+# Random bytes shared by all files written by one worker (slices of it fill the files)
+FILLER_SIZE = 4 * 1024 * 1024
+
+_fillers = {}
+
+
+def _get_filler(seed: int) -> bytes:
+    """Random filler bytes for a seed, created once per worker process."""
+    if seed not in _fillers:
+        _fillers[seed] = random.Random(seed).randbytes(FILLER_SIZE)
+    return _fillers[seed]
+
+
+def draw_file_size(rng: random.Random, api_field: str, scale: float = 1.0) -> int:
+    """
+    Draw a realistic file size for a biometric field.
+
+    Args:
+        rng: Random generator of the driver
+        api_field: API field name
+        scale: Multiplier applied to the size (default: 1.0)
+
+    Returns:
+        Size in bytes (never smaller than the image header)
+    """
+    _, _, median, sigma = FIELD_SPECS[api_field]
+    size = int(rng.lognormvariate(math.log(median), sigma) * scale)
+    return max(size, len(HEADERS[api_field]))
+
+
+def write_file(file_path: str, header: bytes, size: int, rng: random.Random, tag: bytes, filler: bytes):
+    """
+    Write one synthetic image: a valid header, a unique tag, then filler bytes.
+
+    Args:
+        file_path: Path to write
+        header: Image header (the 1x1 sample image)
+        size: Total file size in bytes
+        rng: Random generator choosing the filler offset
+        tag: Bytes making the content unique (license number and field)
+        filler: Random bytes the rest of the file is copied from
+    """
+    with open(file_path, 'wb') as f:
+        f.write(header[:size])
+        remaining = size - min(size, len(header))
+        if remaining:
+            tag = tag[:remaining]
+            f.write(tag)
+            remaining -= len(tag)
+        while remaining:
+            offset = rng.randrange(FILLER_SIZE - min(remaining, FILLER_SIZE) + 1)
+            chunk = filler[offset:offset + min(remaining, FILLER_SIZE)]
+            f.write(chunk)
+            remaining -= len(chunk)
+
+
+def generate_driver(index: int, settings: Dict) -> Tuple[List[List], int]:
+    """
+    Write the biometric files of one driver.
+
+    The driver's layout, duplicates, missing fields and sizes only depend on
+    the seed and index, so the output does not depend on the number of workers.
+
+    Args:
+        index: Driver number (0-based)
+        settings: Generator settings (see generate_tree)
+
+    Returns:
+        Tuple (CSV rows without ID for the files written, bytes written)
+    """
+    rng = random.Random(settings['seed'] * 1_000_003 + index)
+    numero_carta = str(settings['first_license'] + index)
+    output_dir = settings['output_dir']
+
+    flat = rng.random() < settings['flat_ratio']
+    directory = output_dir if flat else os.path.join(output_dir, numero_carta)
+    if not flat:
+        os.makedirs(directory, exist_ok=True)
+
+    fields = list(FIELD_SPECS)
+    if rng.random() < settings['missing_rate']:
+        # Drop one to three fields (never all of them)
+        for api_field in rng.sample(fields, rng.randint(1, 3)):
+            fields.remove(api_field)
+
+    timestamp = BASE_TIMESTAMP - rng.randrange(365 * 86400)
+    versions = [(timestamp, 1)]
+    if rng.random() < settings['duplicate_rate']:
+        # An older photo of the same driver, as left behind by re-enrolments
+        versions.append((timestamp - rng.randrange(1, 5 * 365 * 86400), 0))
+
+    filler = _get_filler(settings['seed'])
+    rows = []
+    written = 0
+    for api_field in fields:
+        tipo, pattern, _, _ = FIELD_SPECS[api_field]
+        header = HEADERS[api_field]
+        for version_timestamp, is_active in (versions if api_field == 'fileFace' else versions[:1]):
+            file_name = pattern.format(numero_carta=numero_carta, timestamp=version_timestamp)
+            file_path = os.path.join(directory, file_name)
+            size = settings['file_size'] or draw_file_size(rng, api_field, settings['size_scale'])
+            write_file(file_path, header, size, rng, f"{numero_carta}:{api_field}:{version_timestamp}".encode(),
+                       filler)
+            rows.append([numero_carta, file_name, file_path, is_active, tipo])
+            written += size
+
+    return rows, written
+
+
+def generate_chunk(start: int, stop: int, settings: Dict) -> Tuple[List[List], int]:
+    """
+    Worker task: write drivers start..stop-1.
+
+    Args:
+        start: First driver number
+        stop: Driver number after the last one
+        settings: Generator settings
+
+    Returns:
+        Tuple (CSV rows of the chunk, bytes written)
+    """
+    rows = []
+    written = 0
+    for index in range(start, stop):
+        driver_rows, driver_bytes = generate_driver(index, settings)
+        rows.extend(driver_rows)
+        written += driver_bytes
+    return rows, written
+
+
+def _chunks(drivers: int, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    for start in range(0, drivers, chunk_size):
+        yield start, min(start + chunk_size, drivers)
+
+
+def generate_tree(output_dir: str, drivers: int, csv_path: Optional[str] = None, flat_ratio: float = 0.3,
+                  duplicate_rate: float = 0.05, missing_rate: float = 0.05, size_scale: float = 1.0,
+                  file_size: Optional[int] = None, first_license: int = 10000000, seed: int = 0,
+                  workers: Optional[int] = None, chunk_size: int = 500) -> Dict:
+    """
+    Generate a synthetic biometric tree and its CSV.
+
+    Args:
+        output_dir: Biometric directory to create
+        drivers: Number of drivers
+        csv_path: CSV file to write (default: {output_dir}.csv)
+        flat_ratio: Share of drivers stored in the flat layout (default: 0.3)
+        duplicate_rate: Share of drivers with an older FOTO_*_*.jpg duplicate (default: 0.05)
+        missing_rate: Share of drivers missing one to three fields (default: 0.05)
+        size_scale: Multiplier applied to the realistic file sizes (default: 1.0)
+        file_size: Fixed size of every file in bytes, instead of realistic sizes
+        first_license: License number of the first driver (default: 10000000)
+        seed: Random seed (default: 0)
+        workers: Worker processes (default: one per CPU)
+        chunk_size: Drivers per worker task (default: 500)
+
+    Returns:
+        Dictionary with the CSV path and the number of drivers, files and bytes written
+    """
+    output_dir = os.path.abspath(output_dir)
+    csv_path = csv_path or f"{output_dir.rstrip(os.sep)}.csv"
+    os.makedirs(output_dir, exist_ok=True)
+    settings = {
+        'output_dir': output_dir,
+        'flat_ratio': flat_ratio,
+        'duplicate_rate': duplicate_rate,
+        'missing_rate': missing_rate,
+        'size_scale': size_scale,
+        'file_size': file_size,
+        'first_license': first_license,
+        'seed': seed
+    }
+
+    files = 0
+    total_bytes = 0
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f, \
+            ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        chunks = list(_chunks(drivers, max(1, chunk_size)))
+        # map() returns the chunks in order, so IDs follow the license numbers
+        results = executor.map(generate_chunk, [start for start, _ in chunks], [stop for _, stop in chunks],
+                               [settings] * len(chunks))
+        for done, (rows, chunk_bytes) in enumerate(results, 1):
+            for row in rows:
+                files += 1
+                writer.writerow([files] + row)
+            total_bytes += chunk_bytes
+            if done % 20 == 0 or done == len(chunks):
+                logger.info(f"Generated {min(done * chunk_size, drivers)}/{drivers} drivers ({files} files)")
+
+    return {'csv_path': csv_path, 'drivers': drivers, 'files': files, 'bytes': total_bytes}
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description='Generate synthetic biometric files and a matching CSV for testing',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # 1000 drivers in ./synthetic_biometric_data, CSV in ./synthetic_biometric_data.csv
+  python create_sample_files.py --drivers 1000
+
+  # A million files (250000 drivers) with 8 worker processes, all hierarchical
+  python create_sample_files.py --drivers 250000 --output-dir /data/bio --flat-ratio 0 --workers 8
+        """
+    )
+    parser.add_argument('--drivers', type=int, default=100, help='Number of drivers (default: 100)')
+    parser.add_argument('--output-dir', default='synthetic_biometric_data',
+                        help='Biometric directory to create (default: synthetic_biometric_data)')
+    parser.add_argument('--csv', metavar='PATH', help='CSV file to write (default: <output-dir>.csv)')
+    parser.add_argument('--flat-ratio', type=float, default=0.3, metavar='RATE',
+                        help='Share of drivers in the flat layout (default: 0.3)')
+    parser.add_argument('--duplicate-rate', type=float, default=0.05, metavar='RATE',
+                        help='Share of drivers with an older timestamped FOTO duplicate (default: 0.05)')
+    parser.add_argument('--missing-rate', type=float, default=0.05, metavar='RATE',
+                        help='Share of drivers missing some biometric fields (default: 0.05)')
+    parser.add_argument('--size-scale', type=float, default=1.0,
+                        help='Multiplier applied to the realistic file sizes (default: 1.0)')
+    parser.add_argument('--file-size', metavar='BYTES',
+                        help='Give every file this size instead (suffixes K, M, e.g. 64K)')
+    parser.add_argument('--first-license', type=int, default=10000000,
+                        help='License number of the first driver (default: 10000000)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: one per CPU)')
 
-files_created = []
+    args = parser.parse_args()
 
-for field, base64_data in SAMPLE_DATA.items():
-    # Determine file extension
-    if field == "fileFace":
-        filename = "FOTO_10054321_1694521263.jpg"
-    elif field == "fileSign":
-        filename = "ASSINATURA_10054321_1694521263.png"
-    elif field == "filesFinger1":
-        filename = "IMPRESSAO_DIGITAL_1_10054321_1694521263.bmp"
-    elif field == "filesFinger2":
-        filename = "IMPRESSAO_DIGITAL_2_10054321_1694521263.bmp"
+    for name in ('flat_ratio', 'duplicate_rate', 'missing_rate'):
+        if not 0.0 <= getattr(args, name) <= 1.0:
+            parser.error(f"--{name.replace('_', '-')} must be between 0 and 1")
+    if args.drivers < 1:
+        parser.error('--drivers must be at least 1')
+    fixed_size = None
+    if args.file_size:
+        from flow_control import parse_size
+        try:
+            fixed_size = parse_size(args.file_size)
+        except ValueError:
+            parser.error(f'Invalid --file-size: {args.file_size}')
 
-    filepath = os.path.join(output_dir, filename)
+    started = time.perf_counter()
+    summary = generate_tree(args.output_dir, args.drivers, args.csv, flat_ratio=args.flat_ratio,
+                            duplicate_rate=args.duplicate_rate, missing_rate=args.missing_rate,
+                            size_scale=args.size_scale, file_size=fixed_size,
+                            first_license=args.first_license, seed=args.seed, workers=args.workers)
+    elapsed = time.perf_counter() - started
 
-    # Decode and write file
-    with open(filepath, 'wb') as f:
-        f.write(base64.b64decode(base64_data))
+    print(f"\nTotal files created: {summary['files']} for {summary['drivers']} drivers "
+          f"({summary['bytes'] / 1024 ** 2:.1f} MB) in {elapsed:.1f}s")
+    print(f"Biometric directory: {os.path.abspath(args.output_dir)}")
+    print(f"CSV file:            {summary['csv_path']}")
 
-    files_created.append(filepath)
-    print(f"Created: {filepath}")
 
-print(f"\nTotal files created: {len(files_created)}")
+if __name__ == '__main__':
+    main()
@@ -7,16 +7,33 @@ Supports: fileFace, fileSign, filesFinger1, filesFinger2
 
 import csv
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import argparse
 import sys
-import base64
+import hashlib
 import os
 import glob
-from typing import Dict, List, Optional
-from collections import defaultdict
+import time
+import heapq
+import itertools
+import sqlite3
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from collections import Counter, defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 import logging
 from datetime import datetime
+from biometric_index import DEFAULT_CACHE_PATH, BiometricFileIndex, DirectoryListing, DiscoveryCache
+from upload_state import DEFAULT_MANIFEST_PATH, CheckpointJournal, UploadManifest
+from upload_transport import JsonFileBody, MultipartFileBody, encode_file_base64
+from retry_policy import DEFAULT_RETRY_STATUSES, RetryPolicy, parse_retry_after
+from flow_control import AIMDController, CircuitBreaker, RateLimiter, parse_size
+from prefetch import PrefetchQueue
+from csv_chunks import (PARALLEL_MIN_SIZE, ChunkBoundaryError, iter_chunk_counts, iter_license_column,
+                        open_csv, plan_chunks)
+from external_grouping import (DEFAULT_MAX_MEMORY, DEFAULT_MAX_ROWS, CompactRow, LicenseGrouper, LicenseRows,
+                               SpilledGroups)
+from metrics import MetricsExporter, PipelineMetrics
 
 try:
     from colorama import Fore, Style, init
@@ -57,7 +74,25 @@ class BiometricAPIProcessor:
         'filesFinger2': ['filesFinger2', 'fingerprint2', 'finger2', 'fp2']
     }
 
-    def __init__(self, api_base_url: str, headers: Dict[str, str] = None, biometric_dir: str = r"C:\Biometric"):
+    # Request body formats accepted by send_to_api / send_files_to_api, plus
+    # 'batch': several drivers per request to the bulk endpoint (upload_batch)
+    TRANSPORTS = ('json', 'json-stream', 'multipart', 'batch')
+
+    # Bulk endpoint of the batch transport, relative to api_base_url
+    BATCH_ENDPOINT = 'biometric-data/batch'
+
+    # Rows counted per part when a CSV file is read serially
+    COUNT_SLICE_ROWS = 100_000
+
+    def __init__(self, api_base_url: str, headers: Dict[str, str] = None, biometric_dir: str = r"C:\Biometric",
+                 pool_size: int = 10, discovery_cache: Optional[str] = None, manifest: Optional[str] = None,
+                 transport: str = 'json', retry_policy: Optional[RetryPolicy] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 concurrency_controller: Optional[AIMDController] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None, prefetch: int = 0,
+                 reader_workers: int = 2, batch_size: int = 50, batch_bytes: int = 8 * 1024 * 1024,
+                 parse_workers: int = 1, group_max_rows: Optional[int] = DEFAULT_MAX_ROWS,
+                 group_max_memory: Optional[int] = DEFAULT_MAX_MEMORY, spill_dir: Optional[str] = None):
         """
         Initialize the processor.
 
@@ -65,11 +100,70 @@ class BiometricAPIProcessor:
             api_base_url: The base API URL (e.g., http://127.0.0.1:5000)
             headers: Optional HTTP headers for API requests
             biometric_dir: Base directory containing biometric files (default: C:\Biometric)
+            pool_size: Maximum number of keep-alive connections kept open to the API (default: 10)
+            discovery_cache: Optional path to a SQLite file caching biometric_dir listings
+                             between runs (see build_file_index)
+            manifest: Optional path to a SQLite upload manifest; files whose content was
+                      already accepted by this API are left out of payloads
+            transport: Request body format: 'json' (base64 fields, default),
+                       'json-stream' (same JSON document, base64-encoded from disk while
+                       sending), 'multipart' (raw files streamed from disk) or 'batch'
+                       (several drivers' JSON payloads per request to the bulk endpoint)
+            retry_policy: Retry policy for failed uploads (default: RetryPolicy(), 3 attempts)
+            rate_limiter: Optional limit on requests/s and bytes/s sent to the API
+            concurrency_controller: Optional AIMD controller adapting the number of
+                                    uploads in flight (at most its maximum)
+            circuit_breaker: Optional circuit breaker; once it gives up, the remaining
+                             drivers are recorded as 'not_attempted'
+            prefetch: Number of drivers whose payloads are built ahead by reader threads
+                      while earlier drivers upload (default: 0, no read-ahead)
+            reader_workers: Reader threads used for prefetching (default: 2)
+            batch_size: Maximum drivers per request with the batch transport (default: 50)
+            batch_bytes: Maximum request body size with the batch transport; a single
+                         larger driver is still sent on its own (default: 8 MiB)
+            parse_workers: Processes parsing large CSV files in chunks (default: 1, serial)
+            group_max_rows: CSV rows grouped in memory before grouping spills to disk
+                            (default: 10 million; None never spills on row count)
+            group_max_memory: Process memory in bytes past which grouping spills to disk
+                              (default: 2 GiB; None never spills on memory)
+            spill_dir: Directory for grouping spill files (default: the system temp directory)
         """
+        if transport not in self.TRANSPORTS:
+            raise ValueError(f"Unknown transport '{transport}' (expected one of {', '.join(self.TRANSPORTS)})")
+
         self.api_base_url = api_base_url.rstrip('/')
         self.headers = headers or {'Content-Type': 'application/json'}
         self.biometric_dir = biometric_dir or r"C:\Biometric"
         self.files_not_found = []
+        self.file_index = None
+        self.discovery_cache_path = discovery_cache
+        self.journal = None
+        self.manifest = UploadManifest(self.api_base_url, manifest) if manifest else None
+        self.transport = transport
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self.concurrency_controller = concurrency_controller
+        self.circuit_breaker = circuit_breaker
+        self.prefetch = max(0, prefetch)
+        self.reader_workers = max(1, reader_workers)
+        self.prefetch_stats = None
+        self.batch_size = max(1, batch_size)
+        self.batch_bytes = max(1, batch_bytes)
+        self.parse_workers = max(1, parse_workers)
+        self.group_max_rows = group_max_rows
+        self.group_max_memory = group_max_memory
+        self.spill_dir = spill_dir
+        self.spilled_groups = []
+        self.metrics = PipelineMetrics()
+
+        # One pooled session per processor: connections (and TLS sessions) are
+        # kept alive and reused for every driver instead of reconnecting per POST
+        self.pool_size = max(1, pool_size)
+        self.adapter = HTTPAdapter(pool_maxsize=self.pool_size)
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        self.session.headers['Connection'] = 'keep-alive'
 
     def read_csv(self, csv_file: str) -> List[Dict]:
         """
@@ -81,9 +175,25 @@ class BiometricAPIProcessor:
         Returns:
             List of dictionaries containing row data
         """
-        data = []
+        data = list(self.iter_csv(csv_file))
+        logger.info(f"Successfully read {len(data)} rows from {csv_file}")
+        return data
+
+    def iter_csv(self, csv_file: str) -> Iterator[Dict]:
+        """
+        Read CSV file lazily, yielding one dictionary per row.
+        Empty and malformed rows are skipped exactly as in read_csv.
+        gzip, bz2, xz and zstd compressed files are decompressed while
+        reading (see csv_chunks.open_csv).
+
+        Args:
+            csv_file: Path to CSV file
+
+        Yields:
+            Dictionaries containing row data
+        """
         try:
-            with open(csv_file, 'r', encoding='utf-8') as f:
+            with open_csv(csv_file) as f:
                 reader = csv.DictReader(f)
                 for line_num, row in enumerate(reader, start=2):  # start=2 because line 1 is header
                     # Skip malformed rows that aren't dictionaries
@@ -94,9 +204,7 @@ class BiometricAPIProcessor:
                     if not any(row.values()):
                         logger.debug(f"Skipping empty row at line {line_num}")
                         continue
-                    data.append(row)
-            logger.info(f"Successfully read {len(data)} rows from {csv_file}")
-            return data
+                    yield row
         except FileNotFoundError:
             logger.error(f"File not found: {csv_file}")
             sys.exit(1)
@@ -104,19 +212,182 @@ class BiometricAPIProcessor:
             logger.error(f"Error reading CSV file: {e}")
             sys.exit(1)
 
-    def file_to_base64(self, file_path: str) -> Optional[str]:
+    def iter_csv_licenses(self, csv_file: str) -> Iterator[str]:
+        """
+        Read only the Numero_Carta column of a CSV file, lazily.
+
+        The column is located once in the header and each row is parsed only
+        as far as needed (see csv_chunks.iter_license_column). Rows are
+        skipped exactly as iter_csv skips them, and compressed files are
+        decompressed while reading. License numbers are stripped.
+
+        Args:
+            csv_file: Path to CSV file (optionally .gz, .bz2, .xz or .zst)
+
+        Yields:
+            License number of each row read ('' if the row has none)
+        """
+        try:
+            with open_csv(csv_file) as f:
+                yield from iter_license_column(f)
+        except FileNotFoundError:
+            logger.error(f"File not found: {csv_file}")
+            sys.exit(1)
+        except Exception as e:
+            logger.error(f"Error reading CSV file: {e}")
+            sys.exit(1)
+
+    def iter_license_counts(self, csv_file: str, parallel: bool = True) -> Iterator[Counter]:
+        """
+        Count the CSV rows of each license number, one part of the file at a time.
+
+        With parallel and parse_workers > 1, files of PARALLEL_MIN_SIZE bytes
+        or more are split into chunks parsed in a process pool; smaller files,
+        and files whose quoting defeats the chunking, are read serially in
+        slices of COUNT_SLICE_ROWS rows. Merged in order, the counts are the
+        same either way.
+
+        Args:
+            csv_file: Path to CSV file
+            parallel: Allow parsing in a process pool (default: True)
+
+        Yields:
+            Counter of rows per license number ('' for rows without one) of
+            each part of the file, in order of first appearance
+
+        Raises:
+            ChunkBoundaryError: If quoting misplaced a chunk boundary after
+                                counts were yielded; count again with parallel=False
+        """
+        layout = None
+        if parallel and self.parse_workers > 1:
+            try:
+                if os.path.getsize(csv_file) >= PARALLEL_MIN_SIZE:
+                    layout = plan_chunks(csv_file, self.parse_workers)
+            except ChunkBoundaryError as e:
+                logger.warning(f"Parsing {csv_file} serially: {e}")
+            except Exception as e:
+                # The serial reader reports missing or unreadable files
+                logger.debug(f"Parallel parsing of {csv_file} failed: {e}")
+
+        if layout is not None:
+            yield from iter_chunk_counts(csv_file, *layout, workers=self.parse_workers)
+            return
+
+        licenses = self.iter_csv_licenses(csv_file)
+        while True:
+            counts = Counter(itertools.islice(licenses, self.COUNT_SLICE_ROWS))
+            if not counts:
+                return
+            yield counts
+
+    def license_grouper(self, expand: Optional[Callable] = None) -> LicenseGrouper:
+        """
+        Create a grouper spilling to disk past group_max_rows or group_max_memory.
+
+        Args:
+            expand: Optional function (license number, payload) -> rows
+
+        Returns:
+            LicenseGrouper configured from this processor
+        """
+        return LicenseGrouper(expand, max_rows=self.group_max_rows, max_memory=self.group_max_memory,
+                              spill_dir=self.spill_dir)
+
+    def _finish_grouping(self, grouper: LicenseGrouper) -> Dict[str, List[Dict]]:
+        groups = grouper.finish()
+        if isinstance(groups, SpilledGroups):
+            # Deleted by process_csv, or at the latest by close()
+            self.spilled_groups.append(groups)
+        return groups
+
+    def read_license_groups(self, csv_file: str) -> Tuple[Dict[str, List[Dict]], int]:
+        """
+        Read and group a CSV file keeping only the Numero_Carta column.
+
+        Projected equivalent of group_by_license(read_csv(csv_file)) for
+        uploads, which only use each driver's license number and row count:
+        each driver's rows are a LicenseRows sequence of {'Numero_Carta': ...}
+        rows, one per CSV row, built from the row count when read. The groups
+        are a LicenseGroups view over the counts: under 100 bytes per driver,
+        license number included, instead of a list and a dictionary. Past
+        group_max_rows rows or group_max_memory bytes, the counts spill to
+        disk and a SpilledGroups view of the same groups is returned.
+
+        Args:
+            csv_file: Path to CSV file
+
+        Returns:
+            Tuple (license numbers mapped to their projected rows in order of
+            first appearance, number of CSV rows read)
+        """
+        try:
+            groups, row_count = self._group_license_counts(self.iter_license_counts(csv_file))
+        except ChunkBoundaryError as e:
+            logger.warning(f"Parsing {csv_file} serially: {e}")
+            groups, row_count = self._group_license_counts(self.iter_license_counts(csv_file, parallel=False))
+        logger.info(f"Successfully read {row_count} rows from {csv_file}")
+        return groups, row_count
+
+    def _group_license_counts(self, parts: Iterable[Counter]) -> Tuple[Dict[str, List[Dict]], int]:
+        grouper = self.license_grouper(self.projected_rows)
+        row_count = 0
+        try:
+            for counts in parts:
+                row_count += sum(counts.values())
+                counts.pop('', None)
+                grouper.add_counts(counts)
+            return self._finish_grouping(grouper), row_count
+        finally:
+            grouper.close()
+
+    def iter_license_runs(self, licenses: Iterable[str]) -> Iterator[Tuple[str, List[Dict]]]:
+        """
+        Group a stream of license numbers by consecutive values.
+
+        Projected equivalent of iter_license_groups for iter_csv_licenses:
+        rows without a license number are skipped without ending a group.
+
+        Args:
+            licenses: Iterable of license numbers, one per CSV row
+
+        Yields:
+            Tuples of (license number, projected rows for that license)
+        """
+        for numero_carta, run in itertools.groupby(license for license in licenses if license):
+            yield numero_carta, self.projected_rows(numero_carta, sum(1 for _ in run))
+
+    @staticmethod
+    def projected_rows(numero_carta: str, count: int) -> LicenseRows:
+        """
+        Build the rows of a driver read with only the Numero_Carta column.
+
+        Args:
+            numero_carta: Driver's license number
+            count: Number of CSV rows of the driver
+
+        Returns:
+            Sequence of count {'Numero_Carta': numero_carta} rows, stored as
+            the license number and the count
+        """
+        return LicenseRows(numero_carta, count)
+
+    def file_to_base64(self, file_path: str, digest=None) -> Optional[str]:
         """
         Read file and convert to base64 string.
 
+        The file is memory-mapped and encoded in chunks (buffered chunked reads
+        where mmap is unavailable), so no full copy of the raw file is made.
+
         Args:
             file_path: Path to the file
+            digest: Optional hashlib object updated with the raw file content
 
         Returns:
             Base64 encoded string or None if file not found
         """
         try:
-            with open(file_path, 'rb') as f:
-                return base64.b64encode(f.read()).decode('utf-8')
+            return encode_file_base64(file_path, digest)
         except FileNotFoundError:
             self.files_not_found.append(file_path)
             logger.warning(f"File not found: {file_path}")
@@ -125,17 +396,62 @@ class BiometricAPIProcessor:
             logger.error(f"Error reading file {file_path}: {e}")
             return None
 
-    def group_by_license(self, records: List[Dict]) -> Dict[str, List[Dict]]:
+    def group_by_license(self, records: Iterable[Dict], compact: bool = False) -> Dict[str, List[Dict]]:
         """
         Group CSV records by Numero_Carta.
 
+        Past group_max_rows rows or group_max_memory bytes the groups spill
+        to disk, so records may be a lazy iterator (e.g. iter_csv) over a file
+        larger than memory.
+
         Args:
-            records: List of CSV records
+            records: List or iterable of CSV records
+            compact: Store each record as a CompactRow (its values in a tuple,
+                     the column names shared between records) instead of the
+                     dictionary itself; the rows still read like dictionaries,
+                     e.g. in build_payload_from_rows (default: False)
 
         Returns:
-            Dictionary mapping license numbers to their records
+            Dictionary mapping license numbers to their records, or a
+            SpilledGroups view of the same groups if grouping spilled to disk
+        """
+        grouper = self.license_grouper()
+        headers = {}
+        try:
+            for record in records:
+                # Extra safety: ensure record is a dictionary
+                if not isinstance(record, dict):
+                    logger.warning(f"Skipping non-dict record in grouping: {record}")
+                    continue
+
+                numero_carta = record.get('Numero_Carta', '').strip()
+                if numero_carta:
+                    if compact:
+                        columns = tuple(record)
+                        record = CompactRow(headers.setdefault(columns, columns), tuple(record.values()))
+                    grouper.add(numero_carta, record)
+
+            return self._finish_grouping(grouper)
+        finally:
+            grouper.close()
+
+    def iter_license_groups(self, records: Iterable[Dict]) -> Iterator[Tuple[str, List[Dict]]]:
+        """
+        Group a stream of CSV records by consecutive Numero_Carta values.
+
+        Each group is yielded as soon as a row with a different license number
+        arrives, so only one driver's rows are held in memory. For input sorted
+        by Numero_Carta the groups match group_by_license; unsorted input yields
+        one group per run of equal license numbers.
+
+        Args:
+            records: Iterable of CSV records (e.g. from iter_csv)
+
+        Yields:
+            Tuples of (license number, records for that license)
         """
-        grouped = defaultdict(list)
+        current = None
+        rows = []
 
         for record in records:
             # Extra safety: ensure record is a dictionary
@@ -144,10 +460,18 @@ class BiometricAPIProcessor:
                 continue
 
             numero_carta = record.get('Numero_Carta', '').strip()
-            if numero_carta:
-                grouped[numero_carta].append(record)
+            if not numero_carta:
+                continue
 
-        return dict(grouped)
+            if numero_carta != current:
+                if rows:
+                    yield current, rows
+                current = numero_carta
+                rows = []
+            rows.append(record)
+
+        if rows:
+            yield current, rows
 
     def find_biometric_files(self, numero_carta: str) -> Dict[str, str]:
         """
@@ -169,7 +493,15 @@ class BiometricAPIProcessor:
 
         # STRATEGY 1: Try hierarchical structure first (existing behavior)
         carta_dir = os.path.join(self.biometric_dir, numero_carta)
-        hierarchical_exists = os.path.exists(carta_dir)
+
+        # Resolve against the directory index when one was built, otherwise
+        # stat/glob the filesystem directly (listing=None)
+        if self.file_index is not None:
+            hierarchical_exists, carta_listing = self.file_index.lookup_dir(numero_carta)
+            root_listing = self.file_index.root
+        else:
+            hierarchical_exists = os.path.exists(carta_dir)
+            carta_listing = root_listing = None
 
         # Expected file patterns for hierarchical structure
         hierarchical_patterns = {
@@ -219,21 +551,10 @@ class BiometricAPIProcessor:
         if hierarchical_exists:
             for api_field, file_patterns in hierarchical_patterns.items():
                 for pattern in file_patterns:
-                    file_path = os.path.join(carta_dir, pattern)
-
-                    # Check if pattern contains wildcard
-                    if '*' in pattern:
-                        # Use glob to find matching files
-                        matches = glob.glob(file_path)
-                        if matches:
-                            # Use first match
-                            file_mapping[api_field] = matches[0]
-                            break
-                    else:
-                        # Direct file check
-                        if os.path.exists(file_path):
-                            file_mapping[api_field] = file_path
-                            break
+                    file_path = self._match_pattern(carta_dir, pattern, carta_listing)
+                    if file_path:
+                        file_mapping[api_field] = file_path
+                        break
 
         # FALLBACK: Try flat structure for any missing files
         for api_field in ['fileFace', 'fileSign', 'filesFinger1', 'filesFinger2']:
@@ -243,22 +564,11 @@ class BiometricAPIProcessor:
 
             # Try flat structure patterns
             for pattern in flat_patterns[api_field]:
-                file_path = os.path.join(self.biometric_dir, pattern)
-
-                # Check if pattern contains wildcard
-                if '*' in pattern:
-                    # Use glob to find matching files
-                    matches = glob.glob(file_path)
-                    if matches:
-                        file_mapping[api_field] = matches[0]
-                        logger.info(f"Found {api_field} in flat structure: {os.path.basename(matches[0])}")
-                        break
-                else:
-                    # Direct file check
-                    if os.path.exists(file_path):
-                        file_mapping[api_field] = file_path
-                        logger.info(f"Found {api_field} in flat structure: {pattern}")
-                        break
+                file_path = self._match_pattern(self.biometric_dir, pattern, root_listing)
+                if file_path:
+                    file_mapping[api_field] = file_path
+                    logger.info(f"Found {api_field} in flat structure: {os.path.basename(file_path)}")
+                    break
 
         # Log warning if no files found at all
         if not file_mapping:
@@ -269,6 +579,73 @@ class BiometricAPIProcessor:
 
         return file_mapping
 
+    def _match_pattern(self, directory: str, pattern: str,
+                       listing: Optional[DirectoryListing] = None) -> Optional[str]:
+        """
+        Resolve one biometric file pattern in a directory.
+
+        Args:
+            directory: Directory to search
+            pattern: File name, optionally containing a '*' wildcard
+            listing: Indexed listing of the directory, or None to query the filesystem
+
+        Returns:
+            Path of the first matching file or None
+        """
+        if listing is not None:
+            return listing.match(pattern)
+
+        file_path = os.path.join(directory, pattern)
+
+        # Check if pattern contains wildcard
+        if '*' in pattern:
+            # Use glob to find matching files (first match wins)
+            matches = glob.glob(file_path)
+            return matches[0] if matches else None
+
+        # Direct file check
+        return file_path if os.path.exists(file_path) else None
+
+    def build_file_index(self) -> Optional[BiometricFileIndex]:
+        """
+        Index biometric_dir with a single scandir pass so find_biometric_files
+        resolves patterns with dictionary lookups instead of stat/glob calls.
+
+        When the processor has a discovery cache, only directories whose mtime
+        changed since the previous run are listed again.
+
+        Returns:
+            The built index, or None if biometric_dir could not be listed
+            (find_biometric_files then keeps querying the filesystem)
+        """
+        if not self.biometric_dir:
+            return None
+
+        cache = None
+        try:
+            if self.discovery_cache_path:
+                cache = DiscoveryCache(self.discovery_cache_path)
+            self.file_index = BiometricFileIndex(self.biometric_dir).build(cache)
+        except sqlite3.Error as e:
+            logger.warning(f"Discovery cache unavailable ({self.discovery_cache_path}): {e}")
+            self.file_index = self._build_uncached_index()
+        except OSError as e:
+            logger.warning(f"Could not index biometric directory {self.biometric_dir}: {e}")
+            self.file_index = None
+        finally:
+            if cache:
+                cache.close()
+
+        return self.file_index
+
+    def _build_uncached_index(self) -> Optional[BiometricFileIndex]:
+        """Build the directory index without the discovery cache."""
+        try:
+            return BiometricFileIndex(self.biometric_dir).build()
+        except OSError as e:
+            logger.warning(f"Could not index biometric directory {self.biometric_dir}: {e}")
+            return None
+
     def build_payload_from_license_number(self, numero_carta: str) -> Dict:
         """
         Build API payload from just a license number (no CSV data required).
@@ -280,21 +657,117 @@ class BiometricAPIProcessor:
         Returns:
             Dictionary with API field names and base64 values
         """
-        payload = {}
-
         if not numero_carta:
-            return payload
+            return {}
+
+        return self._build_payload(numero_carta)[0]
+
+    def _select_files(self, numero_carta: str,
+                      timings: Optional[Dict[str, float]] = None) -> Tuple[Dict[str, Tuple[str, os.stat_result]], List[str], Dict]:
+        """
+        Find and stat the biometric files of one driver, leaving out files whose
+        size and mtime match the upload manifest.
+
+        Args:
+            numero_carta: Driver's license number
+            timings: Optional dictionary receiving the 'discover' duration in seconds
+
+        Returns:
+            Tuple (selected, unchanged, known): API field -> (path, stat result)
+            of the files to send, API fields left out as unchanged, and the
+            manifest entries of the driver
+        """
+        selected = {}
+        unchanged = []
+        started = time.perf_counter()
 
-        # Find biometric files for this license number
         file_mapping = self.find_biometric_files(numero_carta)
+        known = self.manifest.get(numero_carta) if self.manifest and file_mapping else {}
 
-        # Convert each file to base64 and add to payload
         for api_field, file_path in file_mapping.items():
-            base64_data = self.file_to_base64(file_path)
-            if base64_data:
-                payload[api_field] = base64_data
+            try:
+                st = os.stat(file_path)
+            except FileNotFoundError:
+                self.files_not_found.append(file_path)
+                logger.warning(f"File not found: {file_path}")
+                continue
+            except OSError as e:
+                logger.error(f"Error reading file {file_path}: {e}")
+                continue
 
-        return payload
+            # Empty files are never sent (their base64 is empty)
+            if st.st_size == 0:
+                continue
+
+            previous = known.get(api_field)
+            if previous and previous[1:] == (st.st_size, st.st_mtime_ns):
+                unchanged.append(api_field)
+                continue
+
+            selected[api_field] = (file_path, st)
+
+        if timings is not None:
+            timings['discover'] = time.perf_counter() - started
+        return selected, unchanged, known
+
+    def _build_payload(self, numero_carta: str,
+                       timings: Optional[Dict[str, float]] = None) -> Tuple[Dict, Dict, List[str]]:
+        """
+        Discover and encode the biometric files of one driver.
+
+        With an upload manifest, files whose size and mtime (or, failing that,
+        SHA-256) match the last upload accepted by the API are left out.
+
+        Args:
+            numero_carta: Driver's license number
+            timings: Optional dictionary receiving the 'discover' and 'encode'
+                     durations in seconds
+
+        Returns:
+            Tuple (payload, hashes, unchanged): base64 payload, manifest entries
+            (sha256, size, mtime_ns) of the encoded files, and the API fields
+            left out because they are unchanged
+        """
+        payload = {}
+        hashes = {}
+
+        if self.manifest is None:
+            # Find biometric files and convert each one to base64
+            started = time.perf_counter()
+            file_mapping = self.find_biometric_files(numero_carta)
+            encode_started = time.perf_counter()
+            for api_field, file_path in file_mapping.items():
+                base64_data = self.file_to_base64(file_path)
+                if base64_data:
+                    payload[api_field] = base64_data
+            if timings is not None:
+                timings['discover'] = encode_started - started
+                timings['encode'] = time.perf_counter() - encode_started
+            return payload, hashes, []
+
+        selected, unchanged, known = self._select_files(numero_carta, timings)
+        encode_started = time.perf_counter()
+
+        for api_field, (file_path, st) in selected.items():
+            digest = hashlib.sha256()
+            base64_data = self.file_to_base64(file_path, digest)
+            if not base64_data:
+                continue
+
+            entry = (digest.hexdigest(), st.st_size, st.st_mtime_ns)
+            previous = known.get(api_field)
+            if previous and previous[0] == entry[0]:
+                # Touched but identical content: refresh size/mtime so it is not rehashed
+                unchanged.append(api_field)
+                self.manifest.record(numero_carta, {api_field: entry})
+                continue
+
+            payload[api_field] = base64_data
+            hashes[api_field] = entry
+
+        if timings is not None:
+            timings['encode'] = time.perf_counter() - encode_started
+        return payload, hashes, unchanged
 
     def build_payload_from_rows(self, rows: List[Dict]) -> Dict:
         """
@@ -312,11 +785,7 @@ class BiometricAPIProcessor:
 
         # Always use auto-discovery from biometric_dir
         if numero_carta:
-            file_mapping = self.find_biometric_files(numero_carta)
-            for api_field, file_path in file_mapping.items():
-                base64_data = self.file_to_base64(file_path)
-                if base64_data:
-                    payload[api_field] = base64_data
+            payload = self._build_payload(numero_carta)[0]
 
         # # LEGACY BEHAVIOR - COMMENTED OUT
         # # Fallback: Use CSV data only if biometric_dir is NOT configured
@@ -367,93 +836,346 @@ class BiometricAPIProcessor:
 
         return None
 
-    def send_to_api(self, numero_carta: str, payload: Dict) -> Dict:
+    def send_to_api(self, numero_carta: str, payload: Dict,
+                    timings: Optional[Dict[str, float]] = None) -> Dict:
         """
         Send biometric data to API for a specific license number.
 
         Args:
             numero_carta: Driver's license number
             payload: Dictionary with biometric data (fileFace, fileSign, etc.)
+            timings: Optional dictionary receiving the 'serialize' and 'send'
+                     durations in seconds
+
+        Returns:
+            API response dictionary with status and details
+        """
+        url = f"{self.api_base_url}/biometric-data/{numero_carta}"
+
+        # Serialize here rather than with json= so the cost shows up as its own
+        # stage; the body is the same bytes requests would produce
+        started = time.perf_counter()
+        body = self.serialize_payload(payload)
+        sent = time.perf_counter()
+        result = self._post(url, headers=self.json_headers(), data=body)
+        if timings is not None:
+            timings['serialize'] = sent - started
+            timings['send'] = time.perf_counter() - sent
+        self.record_bytes_sent(result, len(body))
+        return result
+
+    @staticmethod
+    def serialize_payload(payload: Dict) -> bytes:
+        """
+        Serialize a payload to a JSON request body.
+
+        Args:
+            payload: Dictionary with biometric data
+
+        Returns:
+            UTF-8 encoded JSON document
+        """
+        return json.dumps(payload, allow_nan=False).encode('utf-8')
+
+    def json_headers(self) -> Dict[str, str]:
+        """
+        Get the request headers for a serialized JSON body.
+
+        Returns:
+            Processor headers, with Content-Type application/json unless one is configured
+        """
+        if any(name.lower() == 'content-type' for name in self.headers):
+            return self.headers
+        return {**self.headers, 'Content-Type': 'application/json'}
+
+    def send_files_to_api(self, numero_carta: str, files: Dict[str, Tuple[str, int]],
+                          digests: Optional[Dict[str, str]] = None,
+                          timings: Optional[Dict[str, float]] = None) -> Dict:
+        """
+        Send biometric files to the API with a request body streamed from disk.
+
+        With the 'multipart' transport the raw file bytes are sent as
+        multipart/form-data; with 'json-stream' the usual JSON document is
+        produced with each file base64-encoded chunk by chunk. Either way no
+        whole file or base64 string is held in memory.
+
+        Args:
+            numero_carta: Driver's license number
+            files: Dictionary mapping API field names to (file path, file size)
+            digests: Optional dictionary filled with the SHA-256 of each file sent
+            timings: Optional dictionary receiving the 'send' duration in seconds
+                     (which includes encoding, as the body is produced while sending)
 
         Returns:
             API response dictionary with status and details
         """
         url = f"{self.api_base_url}/biometric-data/{numero_carta}"
+        if self.transport == 'multipart':
+            body = MultipartFileBody(files, digests)
+        else:
+            body = JsonFileBody(files, digests)
+        headers = {**self.headers, 'Content-Type': body.content_type}
+        started = time.perf_counter()
+        result = self._post(url, headers=headers, data=body)
+        if timings is not None:
+            timings['send'] = time.perf_counter() - started
+        self.record_bytes_sent(result, len(body))
+        return result
+
+    def record_bytes_sent(self, result: Dict, size: int):
+        """
+        Count a request body in the metrics once the API has answered it.
+
+        Args:
+            result: API response dictionary of the request
+            size: Request body size in bytes
+        """
+        if result.get('status_code') is not None:
+            self.metrics.increment('request_bytes_total', size)
+
+    def _post(self, url: str, headers: Dict[str, str] = None,
+              interpret: Optional[Callable[[int, Dict, Optional[float]], Dict]] = None, **kwargs) -> Dict:
+        """
+        POST to the API and interpret the response.
 
+        Args:
+            url: Request URL
+            headers: Request headers (default: processor headers)
+            interpret: Function mapping (status code, JSON body, Retry-After) to the
+                       result dictionary (default: interpret_response)
+            **kwargs: Body arguments passed to requests (json= or data=)
+
+        Returns:
+            API response dictionary with status and details
+        """
         try:
-            response = requests.post(
+            response = self.session.post(
                 url,
-                headers=self.headers,
-                json=payload,
-                timeout=30
+                headers=headers or self.headers,
+                timeout=30,
+                **kwargs
             )
 
-            response_data = response.json() if response.text else {}
-
-            if response.status_code == 201:
-                # Success - HTTP 201 Created
-                return {
-                    'status': 'success',
-                    'status_code': response.status_code,
-                    'response': response_data
-                }
-            elif response.status_code == 400:
-                # Bad Request - No valid data provided
-                message = response_data.get('status', {}).get('message',
-                          response_data.get('message', 'No new biometric data provided'))
-                return {
-                    'status': 'skipped',
-                    'status_code': response.status_code,
-                    'error': message,
-                    'response': response_data
-                }
-            elif response.status_code == 404:
-                # Not Found - API endpoint doesn't exist
-                return {
-                    'status': 'config_error',
-                    'status_code': response.status_code,
-                    'error': 'API endpoint not found - check API URL configuration',
-                    'response': response_data
-                }
-            elif response.status_code == 500:
-                # Internal Server Error
-                message = response_data.get('message', 'Server error occurred')
-                return {
-                    'status': 'server_error',
-                    'status_code': response.status_code,
-                    'error': f'Server error: {message}',
-                    'response': response_data
-                }
-            else:
-                # Other HTTP errors
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            try:
+                response_data = response.json() if response.text else {}
+            except ValueError:
+                # e.g. an HTML error page from a proxy - keep the status code so
+                # the retry policy can still judge it
                 return {
                     'status': 'error',
                     'status_code': response.status_code,
-                    'error': response_data.get('message', f'HTTP {response.status_code} error'),
-                    'response': response_data
+                    'error': 'Invalid JSON response from API',
+                    'retry_after': retry_after
                 }
+            return (interpret or self.interpret_response)(response.status_code, response_data, retry_after)
 
         except requests.exceptions.Timeout:
             return {
                 'status': 'error',
-                'error': 'Request timeout (30s exceeded)'
+                'error': 'Request timeout (30s exceeded)',
+                'transient': True
             }
         except requests.exceptions.ConnectionError:
             return {
                 'status': 'error',
-                'error': 'Connection error - unable to reach API'
+                'error': 'Connection error - unable to reach API',
+                'transient': True
             }
         except requests.exceptions.RequestException as e:
             return {
                 'status': 'error',
                 'error': str(e)
             }
-        except json.JSONDecodeError:
+        except OSError as e:
+            # Biometric file could not be read while streaming the request body
             return {
                 'status': 'error',
-                'error': 'Invalid JSON response from API'
+                'error': f'Error reading biometric file: {e}'
             }
 
+    def interpret_response(self, status_code: int, response_data: Dict,
+                           retry_after: Optional[float] = None) -> Dict:
+        """
+        Map an API response to a result dictionary.
+
+        Args:
+            status_code: HTTP status code
+            response_data: Decoded JSON response body
+            retry_after: Seconds from the Retry-After header, if any
+
+        Returns:
+            API response dictionary with status and details
+        """
+        result = self._interpret_status(status_code, response_data)
+        if retry_after is not None:
+            result['retry_after'] = retry_after
+        return result
+
+    def interpret_batch_response(self, status_code: int, response_data: Dict,
+                                 retry_after: Optional[float] = None) -> Dict:
+        """
+        Map a bulk endpoint response to a request-level result dictionary.
+
+        Args:
+            status_code: HTTP status code
+            response_data: Decoded JSON response body
+            retry_after: Seconds from the Retry-After header, if any
+
+        Returns:
+            Status 'success' if the API answered with a list of per-driver
+            results (see split_batch_response), otherwise the result
+            interpret_response gives for the request as a whole
+        """
+        if 200 <= status_code < 300:
+            if isinstance(response_data, dict) and isinstance(response_data.get('results'), list):
+                return {'status': 'success', 'status_code': status_code, 'response': response_data}
+            return {
+                'status': 'error',
+                'status_code': status_code,
+                'error': 'Invalid batch response from API (no results list)',
+                'response': response_data
+            }
+        return self.interpret_response(status_code, response_data, retry_after)
+
+    def split_batch_response(self, request_result: Dict, numero_cartas: List[str]) -> List[Dict]:
+        """
+        Map the result of a bulk request back to one result per driver.
+
+        Each entry of the response's 'results' list is the response the
+        single-driver endpoint would give plus 'numero_carta' and
+        'status_code', and is interpreted the same way. If the request
+        failed as a whole, every driver gets a copy of its result.
+
+        Args:
+            request_result: Result from interpret_batch_response
+            numero_cartas: License numbers of the drivers in the request, in order
+
+        Returns:
+            Result dictionaries in the order of numero_cartas
+        """
+        if request_result['status'] != 'success':
+            return [dict(request_result) for _ in numero_cartas]
+
+        entries = defaultdict(deque)
+        for entry in request_result['response']['results']:
+            if isinstance(entry, dict):
+                entries[str(entry.get('numero_carta'))].append(entry)
+
+        results = []
+        for numero_carta in numero_cartas:
+            matching = entries.get(str(numero_carta))
+            if not matching:
+                results.append({'status': 'error', 'error': 'Driver missing from batch response'})
+                continue
+            entry = matching.popleft()
+            status_code = entry.get('status_code')
+            if not isinstance(status_code, int):
+                results.append({'status': 'error', 'error': 'Invalid batch response entry (no status_code)',
+                                'response': entry})
+                continue
+            results.append(self.interpret_response(status_code, entry))
+        return results
+
+    @staticmethod
+    def request_results(results: List[Dict]) -> List[Dict]:
+        """
+        Get one result per request behind a group of driver results, so a
+        failed bulk request counts once for the circuit breaker.
+
+        Args:
+            results: Driver results from upload_batch or upload_driver
+
+        Returns:
+            The request-level results of bulk requests and the results of
+            drivers that were not sent in one, in order
+        """
+        distinct = {}
+        for result in results:
+            request_result = result.get('batch_request', result)
+            distinct.setdefault(id(request_result), request_result)
+        return list(distinct.values())
+
+    def _interpret_status(self, status_code: int, response_data: Dict) -> Dict:
+        """Map an HTTP status code and JSON body to a result dictionary."""
+        if status_code == 201:
+            # Success - HTTP 201 Created
+            return {
+                'status': 'success',
+                'status_code': status_code,
+                'response': response_data
+            }
+        elif status_code == 400:
+            # Bad Request - No valid data provided
+            message = response_data.get('status', {}).get('message',
+                      response_data.get('message', 'No new biometric data provided'))
+            return {
+                'status': 'skipped',
+                'status_code': status_code,
+                'error': message,
+                'response': response_data
+            }
+        elif status_code == 404:
+            # Not Found - API endpoint doesn't exist
+            return {
+                'status': 'config_error',
+                'status_code': status_code,
+                'error': 'API endpoint not found - check API URL configuration',
+                'response': response_data
+            }
+        elif status_code == 500:
+            # Internal Server Error
+            message = response_data.get('message', 'Server error occurred')
+            return {
+                'status': 'server_error',
+                'status_code': status_code,
+                'error': f'Server error: {message}',
+                'response': response_data
+            }
+        else:
+            # Other HTTP errors
+            return {
+                'status': 'error',
+                'status_code': status_code,
+                'error': response_data.get('message', f'HTTP {status_code} error'),
+                'response': response_data
+            }
+
+    def get_connection_stats(self) -> Dict[str, int]:
+        """
+        Get connection reuse statistics for the pooled HTTP session.
+
+        Returns:
+            Dictionary with number of requests sent, connections opened
+            and requests served over an already open connection
+        """
+        requests_sent = 0
+        connections_opened = 0
+
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_sent += pool.num_requests
+            connections_opened += pool.num_connections
+
+        return {
+            'requests': requests_sent,
+            'connections_opened': connections_opened,
+            'connections_reused': max(0, requests_sent - connections_opened),
+            'pool_size': self.pool_size
+        }
+
+    def close(self):
+        """Close the pooled HTTP session and the upload manifest, and delete grouping spill files."""
+        self.session.close()
+        if self.manifest:
+            self.manifest.close()
+            self.manifest = None
+        while self.spilled_groups:
+            self.spilled_groups.pop().close()
+
     def print_status_line(self, row_num: int, total: int, numero_carta: str,
                          status: str, details: str = ""):
         """
@@ -463,7 +1185,7 @@ class BiometricAPIProcessor:
             row_num: Current row number
             total: Total number of rows
             numero_carta: License number
-            status: 'OK', 'FAILED', 'SKIPPED', etc.
+            status: 'OK', 'FAILED', 'SKIPPED', 'RETRY', etc.
             details: Additional details about the result
         """
         # Color-coded status symbols
@@ -475,173 +1197,915 @@ class BiometricAPIProcessor:
             status_symbol = f"{Fore.RED}{Style.BRIGHT}[CONFIG ERROR]{Style.RESET_ALL}"
         elif status == "SERVER_ERROR":
             status_symbol = f"{Fore.RED}[SERVER ERROR]{Style.RESET_ALL}"
+        elif status == "RETRY":
+            status_symbol = f"{Fore.YELLOW}[RETRY]{Style.RESET_ALL}"
         else:  # FAILED
             status_symbol = f"{Fore.RED}[FAILED]{Style.RESET_ALL}"
 
         timestamp = datetime.now().strftime("%H:%M:%S")
         print(f"{timestamp} | Row {row_num}/{total} | {numero_carta:15} | {status_symbol:10} | {details}")
 
-    def process_csv(self, csv_file: str) -> Dict:
+    def precheck_driver(self, numero_carta: Optional[str]) -> Optional[Dict]:
         """
-        Process CSV file and send each record to the API.
-        Groups records by Numero_Carta and sends all biometric data for each driver.
+        Check whether a driver should be uploaded at all.
 
         Args:
-            csv_file: Path to CSV file
+            numero_carta: Driver's license number
 
         Returns:
-            Processing results summary with detailed report
+            Result dictionary with status 'missing_license' or 'resumed' if the
+            driver must not be uploaded, None otherwise
+        """
+        if not numero_carta:
+            return {'status': 'missing_license', 'error': 'Missing license number'}
+
+        if self.journal and self.journal.is_completed(numero_carta):
+            return {'status': 'resumed', 'error': 'Already uploaded (resumed from journal)'}
+
+        return None
+
+    def upload_driver(self, numero_carta: str, rows: List[Dict],
+                      prefetched: Optional[Future] = None) -> Dict:
+        """
+        Build the payload for one driver and send it to the API.
+        Safe to call from worker threads.
+
+        Args:
+            numero_carta: Driver's license number
+            rows: CSV rows for this driver (empty list in manual mode)
+            prefetched: Optional future of the payload built by the prefetching
+                        reader stage (waited for instead of building it here)
+
+        Returns:
+            Result dictionary from send_to_api, or status 'no_data' if no
+            biometric files were found, or 'unchanged' if every file matches
+            the upload manifest. Either way 'timings' holds the duration of
+            each pipeline stage in seconds. With the batch transport the
+            driver is sent on its own to the bulk endpoint (see upload_batch).
+        """
+        if self.transport == 'batch':
+            return self.upload_batch([(numero_carta, rows, prefetched)])[0]
+
+        started = time.perf_counter()
+        timings = {}
+        prepared = None
+        if prefetched:
+            prepared = prefetched.result()
+            timings['prefetch_wait'] = time.perf_counter() - started
+        if prepared is None:
+            prepared = self._prepare_upload(numero_carta, rows)
+        timings.update(prepared['timings'])
+        if prepared['status'] != 'ready':
+            return self._record_timings(prepared, timings, started)
+
+        if self.rate_limiter:
+            delay = self.rate_limiter.reserve(self._request_size(prepared))
+            if delay:
+                time.sleep(delay)
+                timings['throttle'] = delay
+
+        sent = time.monotonic()
+        self.metrics.increment('requests_in_flight')
+        try:
+            result = self._send_prepared(prepared, timings)
+        finally:
+            self.metrics.increment('requests_in_flight', -1)
+        if self.concurrency_controller:
+            self.concurrency_controller.record(result, sent, time.monotonic() - sent)
+
+        return self._record_timings(self._finish_upload(prepared, result), timings, started)
+
+    def _record_timings(self, result: Dict, timings: Dict[str, float], started: float) -> Dict:
+        """
+        Attach the stage durations of one attempt to its result and add them
+        to the pipeline metrics.
+
+        Args:
+            result: Result dictionary of the attempt
+            timings: Dictionary mapping stage names to seconds
+            started: time.perf_counter() when the attempt started
+
+        Returns:
+            The result dictionary, with 'timings' set
+        """
+        timings['total'] = time.perf_counter() - started
+        result['timings'] = timings
+        self.metrics.record_timings(timings)
+        return result
+
+    def upload_batch(self, drivers: List[Tuple[str, List[Dict], Optional[Future]]]) -> List[Dict]:
+        """
+        Build the payloads of several drivers and send them to the bulk endpoint.
+        Safe to call from worker threads.
+
+        Drivers with something to send are packed in order into as few
+        requests as batch_bytes allows; a request is sent as soon as the
+        next payload would not fit. The body is {"drivers": [{"numero_carta":
+        ..., "fileFace": ..., ...}, ...]}.
+
+        Args:
+            drivers: List of (numero_carta, rows, prefetched) tuples, as the
+                     arguments of upload_driver
+
+        Returns:
+            One result dictionary per driver, in order, like upload_driver's.
+            Drivers that were sent also hold the result of their request as
+            a whole under 'batch_request'.
+        """
+        started = time.perf_counter()
+        results = [None] * len(drivers)
+        timings = [{} for _ in drivers]
+        packed = []
+        packed_size = 0
+
+        for position, (numero_carta, rows, prefetched) in enumerate(drivers):
+            prepared = None
+            if prefetched:
+                waited = time.perf_counter()
+                prepared = prefetched.result()
+                timings[position]['prefetch_wait'] = time.perf_counter() - waited
+            if prepared is None:
+                prepared = self._prepare_upload(numero_carta, rows)
+            timings[position].update(prepared['timings'])
+            if prepared['status'] != 'ready':
+                results[position] = prepared
+                continue
+
+            serialized = time.perf_counter()
+            part = self.serialize_payload({'numero_carta': prepared['numero_carta'], **prepared['payload']})
+            timings[position]['serialize'] = time.perf_counter() - serialized
+
+            if packed and packed_size + len(part) + 2 > self.batch_bytes:
+                self._send_batch(packed, results, timings)
+                packed, packed_size = [], 0
+            packed.append((position, prepared, part))
+            packed_size += len(part) + 2
+
+        if packed:
+            self._send_batch(packed, results, timings)
+
+        return [self._record_timings(result, timings[position], started)
+                for position, result in enumerate(results)]
+
+    def _send_batch(self, packed: List[Tuple[int, Dict, bytes]], results: List[Optional[Dict]],
+                    timings: List[Dict[str, float]]):
+        """
+        Send one bulk request and store the result of each driver in it
+        (the network stage of upload_batch).
+
+        Args:
+            packed: List of (position, prepared upload, serialized payload) tuples
+            results: upload_batch results, set at the position of each driver sent
+            timings: upload_batch stage durations, per position
+        """
+        body = b'{"drivers": [' + b', '.join(part for _, _, part in packed) + b']}'
+
+        if self.rate_limiter:
+            delay = self.rate_limiter.reserve(len(body))
+            if delay:
+                time.sleep(delay)
+                for position, _, _ in packed:
+                    timings[position]['throttle'] = delay
+
+        url = f"{self.api_base_url}/{self.BATCH_ENDPOINT}"
+        sent = time.monotonic()
+        started = time.perf_counter()
+        self.metrics.increment('requests_in_flight')
+        try:
+            request_result = self._post(url, headers=self.json_headers(), data=body,
+                                        interpret=self.interpret_batch_response)
+        finally:
+            self.metrics.increment('requests_in_flight', -1)
+        elapsed = time.perf_counter() - started
+        if self.concurrency_controller:
+            self.concurrency_controller.record(request_result, sent, time.monotonic() - sent)
+        self.record_bytes_sent(request_result, len(body))
+
+        driver_results = self.split_batch_response(request_result,
+                                                   [prepared['numero_carta'] for _, prepared, _ in packed])
+        for (position, prepared, _), result in zip(packed, driver_results):
+            timings[position]['send'] = elapsed
+            result['batch_request'] = request_result
+            results[position] = self._finish_upload(prepared, result)
+
+    def _prefetch_driver(self, numero_carta: Optional[str], rows: List[Dict]) -> Optional[Dict]:
+        """
+        Reader stage: build a driver's payload ahead of its upload.
+
+        Args:
+            numero_carta: Driver's license number
+            rows: CSV rows for this driver
+
+        Returns:
+            Dictionary from _prepare_upload, or None for drivers that will not be sent
+        """
+        if self.precheck_driver(numero_carta) or (self.circuit_breaker and self.circuit_breaker.gave_up):
+            return None
+        return self._prepare_upload(numero_carta, rows)
+
+    def iter_prefetched(self, drivers: Iterable[Tuple[str, List[Dict]]]) -> Iterator[Tuple[Tuple, Optional[Future]]]:
         """
-        records = self.read_csv(csv_file)
+        Pair each driver with the future of its prefetched payload.
 
-        # Group records by license number
-        grouped_records = self.group_by_license(records)
+        Args:
+            drivers: Iterable of (numero_carta, rows) pairs
+
+        Yields:
+            ((numero_carta, rows), future) pairs in input order; future is None
+            when prefetching is disabled
+        """
+        if not self.prefetch:
+            for driver in drivers:
+                yield driver, None
+            return
+
+        queue = PrefetchQueue(drivers, self._prefetch_driver, self.prefetch, self.reader_workers)
+        try:
+            for driver, future in queue:
+                self.metrics.set_gauge('prefetch_ready', queue.ready)
+                yield driver, future
+        finally:
+            self.prefetch_stats = queue.get_stats()
+
+    def _prepare_upload(self, numero_carta: str, rows: List[Dict]) -> Dict:
+        """
+        Find one driver's files and build what will be sent (the disk stage).
+
+        Args:
+            numero_carta: Driver's license number
+            rows: CSV rows for this driver (empty list in manual mode)
+
+        Returns:
+            Dictionary with status 'ready' and the payload (json and batch
+            transports) or the files to stream (other transports), or a final result with
+            status 'no_data' or 'unchanged'. 'timings' holds the 'discover'
+            (and, for the json and batch transports, 'encode') durations in seconds.
+        """
+        license_number = self.get_license_number(rows[0]) if rows else numero_carta
+        timings = {}
+
+        if self.transport in ('json', 'batch'):
+            if license_number:
+                payload, hashes, unchanged = self._build_payload(license_number, timings)
+            else:
+                payload, hashes, unchanged = {}, {}, []
+
+            if not payload:
+                return {'status': 'unchanged' if unchanged else 'no_data', 'files_unchanged': unchanged,
+                        'timings': timings}
+
+            return {'status': 'ready', 'numero_carta': numero_carta, 'payload': payload,
+                    'hashes': hashes, 'files_unchanged': unchanged, 'timings': timings}
+
+        if license_number:
+            selected, unchanged, _ = self._select_files(license_number, timings)
+        else:
+            selected, unchanged = {}, []
+
+        if not selected:
+            return {'status': 'unchanged' if unchanged else 'no_data', 'files_unchanged': unchanged,
+                    'timings': timings}
+
+        return {'status': 'ready', 'numero_carta': numero_carta,
+                'files': {api_field: (file_path, st.st_size) for api_field, (file_path, st) in selected.items()},
+                'stats': {api_field: st for api_field, (_, st) in selected.items()},
+                'digests': {}, 'files_unchanged': unchanged, 'timings': timings}
+
+    def _request_size(self, prepared: Dict) -> int:
+        """
+        Approximate request body size of a prepared driver, for bandwidth limiting.
+
+        Args:
+            prepared: Dictionary returned by _prepare_upload with status 'ready'
+
+        Returns:
+            Body size in bytes
+        """
+        if 'payload' in prepared:
+            return sum(len(value) for value in prepared['payload'].values())
+        size = sum(file_size for _, file_size in prepared['files'].values())
+        return size if self.transport == 'multipart' else size * 4 // 3
+
+    def _send_prepared(self, prepared: Dict, timings: Optional[Dict[str, float]] = None) -> Dict:
+        """
+        Send a driver prepared by _prepare_upload (the network stage).
+
+        Args:
+            prepared: Dictionary returned by _prepare_upload with status 'ready'
+            timings: Optional dictionary receiving the stage durations in seconds
+
+        Returns:
+            API response dictionary with status and details
+        """
+        if 'payload' in prepared:
+            return self.send_to_api(prepared['numero_carta'], prepared['payload'], timings)
+        return self.send_files_to_api(prepared['numero_carta'], prepared['files'], prepared['digests'],
+                                      timings)
+
+    def _finish_upload(self, prepared: Dict, result: Dict) -> Dict:
+        """
+        Complete the result of a sent driver and update the upload manifest.
+
+        Args:
+            prepared: Dictionary returned by _prepare_upload
+            result: API response dictionary from _send_prepared
+
+        Returns:
+            The result dictionary, with 'files_unchanged' set
+        """
+        result['files_unchanged'] = prepared['files_unchanged']
+
+        if result['status'] == 'success' and self.manifest:
+            if 'hashes' in prepared:
+                hashes = prepared['hashes']
+            else:
+                digests = prepared['digests']
+                hashes = {api_field: (digests[api_field], st.st_size, st.st_mtime_ns)
+                          for api_field, st in prepared['stats'].items() if api_field in digests}
+            self.manifest.record(prepared['numero_carta'], hashes)
+
+        return result
+
+    def record_result(self, results: Dict, idx: int, total: int, numero_carta: str,
+                      rows: List[Dict], result: Dict):
+        """
+        Print the status line for one driver and add it to the results summary.
+
+        Args:
+            results: Results summary being built by process_csv
+            idx: Driver position in the batch (1-based)
+            total: Total number of drivers in the batch
+            numero_carta: Driver's license number
+            rows: CSV rows for this driver
+            result: Result dictionary returned by upload_driver or precheck_driver
+        """
+        if result['status'] == 'missing_license':
+            self.print_status_line(idx, total, "N/A", "FAILED",
+                                 "Missing license number in CSV")
+            results['skipped'] += 1
+            results['details'].append({
+                'driver': idx,
+                'numero_carta': None,
+                'status': 'skipped',
+                'error': 'Missing license number',
+                'attempts': 0
+            })
+            return
+
+        if result['status'] == 'resumed':
+            self.print_status_line(idx, total, numero_carta, "SKIPPED",
+                                 "Already uploaded (resumed from journal)")
+            results['skipped'] += 1
+            results['details'].append({
+                'driver': idx,
+                'numero_carta': numero_carta,
+                'status': 'skipped',
+                'error': 'Already uploaded (resumed from journal)',
+                'csv_rows': len(rows),
+                'attempts': 0
+            })
+            return
+
+        if result['status'] == 'not_attempted':
+            # No status line: the circuit breaker already reported why the rest
+            # of the batch is not being sent
+            results['not_attempted'] += 1
+            results['details'].append({
+                'driver': idx,
+                'numero_carta': numero_carta,
+                'status': 'not_attempted',
+                'error': result.get('error', 'Not attempted'),
+                'csv_rows': len(rows)
+            })
+
+        elif result['status'] == 'unchanged':
+            self.print_status_line(idx, total, numero_carta, "SKIPPED",
+                                 "Biometrics unchanged since last upload")
+            results['skipped'] += 1
+            results['details'].append({
+                'driver': idx,
+                'numero_carta': numero_carta,
+                'status': 'skipped',
+                'error': 'Biometrics unchanged since last upload',
+                'files_unchanged': result.get('files_unchanged', []),
+                'csv_rows': len(rows)
+            })
+
+        elif result['status'] == 'no_data':
+            self.print_status_line(idx, total, numero_carta, "FAILED",
+                                 "No biometric data found or all files missing")
+            results['skipped'] += 1
+            results['details'].append({
+                'driver': idx,
+                'numero_carta': numero_carta,
+                'status': 'skipped',
+                'error': 'No biometric data available',
+                'csv_rows': len(rows)
+            })
+
+        elif result['status'] == 'success':
+            # HTTP 201 - Success
+            results['success'] += 1
+            api_status = result.get('response', {}).get('status', {})
+
+            files_created = api_status.get('files_created', [])
+            files_updated = api_status.get('files_updated', [])
+            files_missing = api_status.get('files_missing', [])
+
+            details_parts = []
+
+            if files_created:
+                details_parts.append(f"Created: {', '.join(files_created)}")
+
+            if files_updated:
+                details_parts.append(f"Replaced: {', '.join(files_updated)}")
+
+            if files_missing:
+                details_parts.append(f"{Fore.YELLOW}Warning: Missing {', '.join(files_missing)}{Style.RESET_ALL}")
+
+            files_unchanged = result.get('files_unchanged', [])
+            if files_unchanged:
+                details_parts.append(f"Unchanged: {', '.join(files_unchanged)}")
+
+            details = " | ".join(details_parts) if details_parts else "Data submitted"
+
+            self.print_status_line(idx, total, numero_carta, "OK", details)
+
+            results['details'].append({
+                'driver': idx,
+                'numero_carta': numero_carta,
+                'status': 'success',
+                'files_created': files_created,
+                'files_updated': files_updated,
+                'files_missing': files_missing,
+                'csv_rows': len(rows)
+            })
+            if files_unchanged:
+                results['details'][-1]['files_unchanged'] = files_unchanged
+
+        elif result['status'] == 'skipped':
+            # HTTP 400 - Bad Request (no valid data)
+            results['skipped'] += 1
+            error_msg = result.get('error', 'No new biometric data provided')
+
+            self.print_status_line(idx, total, numero_carta, "SKIPPED",
+                                 error_msg)
+
+            results['details'].append({
+                'driver': idx,
+                'numero_carta': numero_carta,
+                'status': 'skipped',
+                'error': error_msg,
+                'csv_rows': len(rows)
+            })
+
+        elif result['status'] == 'config_error':
+            # HTTP 404 - Not Found (wrong API URL)
+            results['failed'] += 1
+            error_msg = result.get('error', 'API endpoint not found')
+
+            self.print_status_line(idx, total, numero_carta, "CONFIG_ERROR",
+                                 error_msg)
+
+            results['details'].append({
+                'driver': idx,
+                'numero_carta': numero_carta,
+                'status': 'config_error',
+                'error': error_msg,
+                'csv_rows': len(rows)
+            })
+
+        elif result['status'] == 'server_error':
+            # HTTP 500 - Internal Server Error
+            results['failed'] += 1
+            error_msg = result.get('error', 'Server error occurred')
+
+            self.print_status_line(idx, total, numero_carta, "SERVER_ERROR",
+                                 f"{error_msg}. Contact administrator or retry later.")
+
+            results['details'].append({
+                'driver': idx,
+                'numero_carta': numero_carta,
+                'status': 'server_error',
+                'error': error_msg,
+                'csv_rows': len(rows)
+            })
+
+        else:
+            # Other errors
+            results['failed'] += 1
+            error_msg = result.get('error', 'Unknown error')
+
+            self.print_status_line(idx, total, numero_carta, "FAILED",
+                                 f"Error: {error_msg}")
+
+            results['details'].append({
+                'driver': idx,
+                'numero_carta': numero_carta,
+                'status': 'failed',
+                'error': error_msg,
+                'response': result.get('response', {}),
+                'csv_rows': len(rows)
+            })
+
+        detail = results['details'][-1]
+        detail['attempts'] = result.get('attempts', 0)
+        if result.get('timings'):
+            detail['timings_ms'] = self.format_timings(result['timings'])
+
+        if self.journal:
+            self.journal.record(numero_carta, detail['status'], detail.get('error'))
+
+    def publish_result(self, result: Dict):
+        """
+        Update the live metrics with the final result of one driver.
+
+        Args:
+            result: Result dictionary of the driver
+        """
+        self.metrics.record_outcome(result)
+        if self.concurrency_controller:
+            self.metrics.set_gauge('concurrency_limit', self.concurrency_controller.limit)
+        if self.circuit_breaker:
+            self.metrics.set_gauge('circuit_breaker_open', int(self.circuit_breaker.state != 'closed'))
+
+    @staticmethod
+    def format_timings(timings: Dict[str, float]) -> Dict[str, float]:
+        """
+        Convert stage durations for the JSON report.
+
+        Args:
+            timings: Dictionary mapping stage names to seconds
+
+        Returns:
+            Dictionary mapping stage names to milliseconds, rounded to 0.01 ms
+        """
+        return {stage: round(seconds * 1000, 2) for stage, seconds in timings.items()}
 
-        print("\n" + "="*100)
-        print(f"Starting processing of {len(records)} CSV rows → {len(grouped_records)} unique drivers")
+    def record_breaker_trip(self, result: Dict):
+        """
+        Report that the circuit breaker opened.
+
+        Args:
+            result: Result dictionary of the failure that opened it
+        """
+        breaker = self.circuit_breaker
+        if breaker.mode == 'fail-fast':
+            action = "remaining drivers will not be attempted"
+        else:
+            action = f"pausing, probing the API every {breaker.probe_interval:g}s"
+        print(f"{Fore.RED}{Style.BRIGHT}Circuit breaker open after {breaker.threshold} consecutive failed drivers "
+              f"({result.get('error', 'Unknown error')}) - {action}{Style.RESET_ALL}")
+        logger.error(f"Circuit breaker open: {result.get('error', 'Unknown error')}")
+
+    def record_retry(self, idx: int, total: int, numero_carta: str, result: Dict,
+                     attempt: int, delay: float):
+        """
+        Print the status line for a failed attempt that will be retried.
+
+        Args:
+            idx: Driver position in the batch (1-based)
+            total: Total number of drivers in the batch
+            numero_carta: Driver's license number
+            result: Result dictionary of the failed attempt
+            attempt: Number of the failed attempt (1-based)
+            delay: Seconds until the next attempt
+        """
+        self.metrics.increment('retries_total')
+        error_msg = result.get('error', 'Unknown error')
+        self.print_status_line(idx, total, numero_carta, "RETRY",
+                             f"Attempt {attempt}/{self.retry_policy.max_attempts} failed ({error_msg}), "
+                             f"retrying in {delay:.1f}s")
+
+    def open_journal(self, path: str, resume: bool = False) -> Optional[CheckpointJournal]:
+        """
+        Start journaling driver outcomes so an interrupted batch can be resumed.
+
+        Args:
+            path: Journal file path
+            resume: Keep the existing journal and skip drivers it marks as uploaded
+
+        Returns:
+            The opened journal, or None if it could not be opened
+        """
+        try:
+            self.journal = CheckpointJournal(path, resume=resume, api_base_url=self.api_base_url)
+        except OSError as e:
+            logger.error(f"Could not open journal {path}: {e}")
+            self.journal = None
+        return self.journal
+
+    def close_journal(self):
+        """Sync and close the checkpoint journal, if open."""
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+
+    def process_drivers(self, drivers: Iterable[Tuple[str, List[Dict]]], total: Optional[int],
+                        results: Dict, concurrency: int = 1,
+                        on_result: Optional[Callable[[int, str, List[Dict], Dict], None]] = None) -> int:
+        """
+        Upload drivers through a bounded pool of worker threads.
+
+        Each worker builds its driver's payload and sends it, so file reads and
+        base64 encoding for one driver overlap with requests in flight for others.
+        At most 2 x concurrency drivers are queued at any time. Status lines are
+        printed as uploads complete; results['details'] is sorted by driver
+        position afterwards so the report does not depend on completion order.
+
+        Failed attempts that the retry policy accepts are put on a delayed
+        queue (a heap ordered by due time) and resubmitted once their backoff
+        has elapsed, while the remaining drivers keep being uploaded. With a
+        concurrency controller, the number of drivers in flight follows its
+        limit instead of 2 x concurrency.
+
+        With a circuit breaker, no request is sent while it is open; drivers
+        reached after it gave up are reported with status 'not_attempted'.
+        Only the final outcome of each driver counts towards opening it (not
+        every retried attempt), and while it is half-open only the probe.
+
+        With prefetch > 0, a reader stage builds the payloads of the next
+        drivers in background threads, so a worker only waits for the disk
+        when the reader has fallen behind.
+
+        With the batch transport each worker uploads up to batch_size
+        consecutive drivers (or due retries) through upload_batch; the
+        limits above then count bulk requests rather than drivers, and the
+        circuit breaker sees each request once.
+
+        Args:
+            drivers: Iterable of (numero_carta, rows) pairs
+            total: Total number of drivers (for status lines), or None if unknown
+            results: Results summary to update (ignored when on_result is given)
+            concurrency: Maximum number of uploads in flight (default: 1)
+            on_result: Optional callback (idx, numero_carta, rows, result) called
+                       instead of record_result, for drivers that were prechecked
+                       or uploaded
+
+        Returns:
+            Number of drivers processed
+        """
+        concurrency = max(1, concurrency)
+        max_pending = concurrency * 2
+        batch_size = self.batch_size if self.transport == 'batch' else 1
+        controller = self.concurrency_controller
+        breaker = self.circuit_breaker
+        pending = {}
+        sent_at = {}
+        retries = []
+        retry_order = itertools.count()
+        if total is None:
+            total = '?'
+        idx = 0
+
+        if total != '?':
+            self.metrics.set_gauge('drivers_expected', total)
+
+        def report(idx, numero_carta, rows, result):
+            self.publish_result(result)
+            if on_result:
+                on_result(idx, numero_carta, rows, result)
+            else:
+                self.record_result(results, idx, total, numero_carta, rows, result)
+
+        def update_queue_gauges():
+            self.metrics.set_gauge('drivers_pending', len(pending))
+            self.metrics.set_gauge('retry_queue', len(retries))
+
+        def upload(entries):
+            if self.transport == 'batch':
+                return self.upload_batch([(numero_carta, rows, prefetched)
+                                          for _, numero_carta, rows, _, prefetched in entries])
+            _, numero_carta, rows, _, prefetched = entries[0]
+            return [self.upload_driver(numero_carta, rows, prefetched)]
+
+        def submit(entries):
+            # entries: (idx, numero_carta, rows, attempt, prefetched) sent together
+            future = executor.submit(upload, entries)
+            pending[future] = [entry[:4] for entry in entries]
+            sent_at[future] = time.monotonic()
+            update_queue_gauges()
+
+        def in_flight_limit():
+            return controller.limit if controller else max_pending
+
+        def submit_due_retries():
+            now = time.monotonic()
+            while retries and retries[0][0] <= now and len(pending) < in_flight_limit():
+                if breaker and not breaker.allow_request():
+                    break
+                entries = []
+                while retries and retries[0][0] <= now and len(entries) < batch_size:
+                    _, _, idx, numero_carta, rows, attempt, _ = heapq.heappop(retries)
+                    entries.append((idx, numero_carta, rows, attempt, None))
+                submit(entries)
+
+        def abandon_retries():
+            # The breaker gave up: queued retries keep the result of their last attempt
+            while retries:
+                _, _, idx, numero_carta, rows, attempt, result = heapq.heappop(retries)
+                result['attempts'] = attempt - 1
+                report(idx, numero_carta, rows, result)
+
+        def next_wake_in():
+            if breaker and breaker.state != 'closed':
+                return breaker.wait_time()
+            return max(0.0, retries[0][0] - time.monotonic()) if retries else None
+
+        def collect():
+            done, _ = wait(pending, timeout=next_wake_in(), return_when=FIRST_COMPLETED)
+            for future in done:
+                entries = pending.pop(future)
+                started = sent_at.pop(future)
+                try:
+                    outcomes = future.result()
+                except Exception as e:
+                    licenses = ', '.join(str(entry[1]) for entry in entries)
+                    logger.error(f"Unexpected error uploading {licenses}: {e}")
+                    outcomes = [{'status': 'error', 'error': str(e)} for _ in entries]
+
+                retried = [self.retry_policy.should_retry(result, attempt)
+                           for (_, _, _, attempt), result in zip(entries, outcomes)]
+                if breaker:
+                    # Only final outcomes count, so one driver's retries cannot open
+                    # the breaker; while half-open the probe counts either way
+                    counted = [result for result, retry in zip(outcomes, retried)
+                               if not retry or breaker.state == 'half_open']
+                    for request_result in self.request_results(counted):
+                        if breaker.record(request_result, started):
+                            self.record_breaker_trip(request_result)
+
+                for (idx, numero_carta, rows, attempt), result, retry in zip(entries, outcomes, retried):
+                    if retry and not (breaker and breaker.gave_up):
+                        delay = self.retry_policy.delay(attempt, result.get('retry_after'))
+                        self.record_retry(idx, total, numero_carta, result, attempt, delay)
+                        heapq.heappush(retries, (time.monotonic() + delay, next(retry_order),
+                                                 idx, numero_carta, rows, attempt + 1, result))
+                        continue
+
+                    if result['status'] not in ('no_data', 'unchanged'):
+                        result['attempts'] = attempt
+                    report(idx, numero_carta, rows, result)
+            submit_due_retries()
+            update_queue_gauges()
+
+        def breaker_admits():
+            # Wait (while collecting results) until the breaker lets a request
+            # through; False once it gave up
+            while breaker and not breaker.allow_request():
+                if breaker.gave_up:
+                    return False
+                if pending:
+                    collect()
+                else:
+                    time.sleep(next_wake_in() or 0.05)
+            return True
+
+        not_attempted = {'status': 'not_attempted',
+                         'error': 'Not attempted: API unreachable (circuit breaker open)'}
+
+        def dispatch(entries):
+            submit_due_retries()
+            while len(pending) >= in_flight_limit():
+                collect()
+
+            if not breaker_admits():
+                for idx, numero_carta, rows, _, _ in entries:
+                    report(idx, numero_carta, rows, dict(not_attempted))
+                return
+
+            submit(entries)
+
+        workers = max(concurrency, controller.maximum) if controller else concurrency
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='upload') as executor:
+            batch = []
+            for idx, ((numero_carta, rows), prefetched) in enumerate(self.iter_prefetched(drivers), 1):
+                precheck = self.precheck_driver(numero_carta)
+                if precheck:
+                    report(idx, numero_carta, rows, precheck)
+                    continue
+
+                if breaker and breaker.gave_up:
+                    report(idx, numero_carta, rows, dict(not_attempted))
+                    continue
+
+                batch.append((idx, numero_carta, rows, 1, prefetched))
+                if len(batch) >= batch_size:
+                    dispatch(batch)
+                    batch = []
+
+            if batch:
+                dispatch(batch)
+
+            while pending or retries:
+                if breaker and breaker.gave_up:
+                    abandon_retries()
+                if pending:
+                    collect()
+                elif retries:
+                    time.sleep(next_wake_in() or 0.05)
+                    submit_due_retries()
+
+        if not on_result:
+            results['details'].sort(key=lambda detail: detail['driver'])
+        return idx
+
+    def _print_table_header(self):
+        """Print the column header of the console status table."""
         print("="*100)
         print(f"{'Time':8} | {'Driver':11} | {'License Number':15} | {'Status':10} | Details")
         print("-"*100)
 
+    def process_csv(self, csv_file: str, concurrency: int = 1, index_files: bool = True,
+                    stream: bool = False, journal: Optional[str] = None, resume: bool = False) -> Dict:
+        """
+        Process CSV file and send each record to the API.
+        Groups records by Numero_Carta and sends all biometric data for each driver.
+        Only the Numero_Carta column is parsed (see read_license_groups).
+
+        In streaming mode rows are read lazily and each driver is uploaded as
+        soon as its group of consecutive rows is complete, so memory does not
+        grow with the size of the CSV. The input should be sorted by Numero_Carta.
+
+        Args:
+            csv_file: Path to CSV file
+            concurrency: Number of drivers uploaded in parallel (default: 1)
+            index_files: Index biometric_dir once before uploading (default: True)
+            stream: Stream rows instead of loading the whole CSV first (default: False)
+            journal: Optional checkpoint journal path recording each driver's outcome
+            resume: Skip drivers the journal already marks as uploaded (default: False)
+
+        Returns:
+            Processing results summary with detailed report
+        """
         results = {
-            'total_csv_rows': len(records),
-            'total_drivers': len(grouped_records),
+            'total_csv_rows': 0,
+            'total_drivers': 0,
             'success': 0,
             'failed': 0,
             'skipped': 0,
+            'not_attempted': 0,
             'details': []
         }
 
-        for idx, (numero_carta, rows) in enumerate(grouped_records.items(), 1):
-            if not numero_carta:
-                self.print_status_line(idx, len(grouped_records), "N/A", "FAILED",
-                                     "Missing license number in CSV")
-                results['skipped'] += 1
-                results['details'].append({
-                    'driver': idx,
-                    'numero_carta': None,
-                    'status': 'skipped',
-                    'error': 'Missing license number'
-                })
-                continue
-
-            # Build payload from all rows for this driver
-            payload = self.build_payload_from_rows(rows)
-
-            if not payload:
-                self.print_status_line(idx, len(grouped_records), numero_carta, "FAILED",
-                                     "No biometric data found or all files missing")
-                results['skipped'] += 1
-                results['details'].append({
-                    'driver': idx,
-                    'numero_carta': numero_carta,
-                    'status': 'skipped',
-                    'error': 'No biometric data available',
-                    'csv_rows': len(rows)
-                })
-                continue
-
-            # Send to API
-            result = self.send_to_api(numero_carta, payload)
-
-            if result['status'] == 'success':
-                # HTTP 201 - Success
-                results['success'] += 1
-                api_status = result.get('response', {}).get('status', {})
-
-                files_created = api_status.get('files_created', [])
-                files_updated = api_status.get('files_updated', [])
-                files_missing = api_status.get('files_missing', [])
-
-                details_parts = []
-
-                if files_created:
-                    details_parts.append(f"Created: {', '.join(files_created)}")
-
-                if files_updated:
-                    details_parts.append(f"Replaced: {', '.join(files_updated)}")
-
-                if files_missing:
-                    details_parts.append(f"{Fore.YELLOW}Warning: Missing {', '.join(files_missing)}{Style.RESET_ALL}")
-
-                details = " | ".join(details_parts) if details_parts else "Data submitted"
-
-                self.print_status_line(idx, len(grouped_records), numero_carta, "OK", details)
-
-                results['details'].append({
-                    'driver': idx,
-                    'numero_carta': numero_carta,
-                    'status': 'success',
-                    'files_created': files_created,
-                    'files_updated': files_updated,
-                    'files_missing': files_missing,
-                    'csv_rows': len(rows)
-                })
-
-            elif result['status'] == 'skipped':
-                # HTTP 400 - Bad Request (no valid data)
-                results['skipped'] += 1
-                error_msg = result.get('error', 'No new biometric data provided')
-
-                self.print_status_line(idx, len(grouped_records), numero_carta, "SKIPPED",
-                                     error_msg)
-
-                results['details'].append({
-                    'driver': idx,
-                    'numero_carta': numero_carta,
-                    'status': 'skipped',
-                    'error': error_msg,
-                    'csv_rows': len(rows)
-                })
-
-            elif result['status'] == 'config_error':
-                # HTTP 404 - Not Found (wrong API URL)
-                results['failed'] += 1
-                error_msg = result.get('error', 'API endpoint not found')
-
-                self.print_status_line(idx, len(grouped_records), numero_carta, "CONFIG_ERROR",
-                                     error_msg)
-
-                results['details'].append({
-                    'driver': idx,
-                    'numero_carta': numero_carta,
-                    'status': 'config_error',
-                    'error': error_msg,
-                    'csv_rows': len(rows)
-                })
-
-            elif result['status'] == 'server_error':
-                # HTTP 500 - Internal Server Error
-                results['failed'] += 1
-                error_msg = result.get('error', 'Server error occurred')
-
-                self.print_status_line(idx, len(grouped_records), numero_carta, "SERVER_ERROR",
-                                     f"{error_msg}. Contact administrator or retry later.")
-
-                results['details'].append({
-                    'driver': idx,
-                    'numero_carta': numero_carta,
-                    'status': 'server_error',
-                    'error': error_msg,
-                    'csv_rows': len(rows)
-                })
+        if journal:
+            self.open_journal(journal, resume=resume)
 
+        try:
+            if stream:
+                row_count = [0]
+                read_time = [0.0]
+
+                def counted(rows):
+                    # Time spent reading and parsing the CSV, between uploads
+                    rows = iter(rows)
+                    while True:
+                        started = time.perf_counter()
+                        row = next(rows, None)
+                        read_time[0] += time.perf_counter() - started
+                        if row is None:
+                            return
+                        row_count[0] += 1
+                        yield row
+
+                if index_files:
+                    started = time.perf_counter()
+                    self.build_file_index()
+                    self.metrics.record_batch('index', time.perf_counter() - started)
+
+                print("\n" + "="*100)
+                print(f"Streaming CSV rows from {csv_file} (grouped by consecutive Numero_Carta)")
+                self._print_table_header()
+
+                grouped_records = self.iter_license_runs(counted(self.iter_csv_licenses(csv_file)))
+                results['total_drivers'] = self.process_drivers(grouped_records, None, results, concurrency)
+                results['total_csv_rows'] = row_count[0]
+                self.metrics.record_batch('read_csv', read_time[0])
+                logger.info(f"Successfully streamed {row_count[0]} rows from {csv_file}")
             else:
-                # Other errors
-                results['failed'] += 1
-                error_msg = result.get('error', 'Unknown error')
-
-                self.print_status_line(idx, len(grouped_records), numero_carta, "FAILED",
-                                     f"Error: {error_msg}")
-
-                results['details'].append({
-                    'driver': idx,
-                    'numero_carta': numero_carta,
-                    'status': 'failed',
-                    'error': error_msg,
-                    'response': result.get('response', {}),
-                    'csv_rows': len(rows)
-                })
+                # Only the license column is read; uploads use nothing else
+                started = time.perf_counter()
+                grouped_records, row_count = self.read_license_groups(csv_file)
+                self.metrics.record_batch('read_csv', time.perf_counter() - started)
+
+                if index_files and grouped_records:
+                    started = time.perf_counter()
+                    self.build_file_index()
+                    self.metrics.record_batch('index', time.perf_counter() - started)
+
+                print("\n" + "="*100)
+                print(f"Starting processing of {row_count} CSV rows → {len(grouped_records)} unique drivers")
+                self._print_table_header()
+
+                results['total_csv_rows'] = row_count
+                results['total_drivers'] = len(grouped_records)
+                try:
+                    self.process_drivers(grouped_records.items(), len(grouped_records), results, concurrency)
+                finally:
+                    if isinstance(grouped_records, SpilledGroups):
+                        grouped_records.close()
+        finally:
+            self.close_journal()
 
         # Print summary
         print("-"*100)
@@ -652,10 +2116,26 @@ class BiometricAPIProcessor:
         print(f"Successful:            {results['success']}")
         print(f"Failed:                {results['failed']}")
         print(f"Skipped:               {results['skipped']}")
+        if results['not_attempted']:
+            print(f"{Fore.YELLOW}Not attempted:         {results['not_attempted']} "
+                  f"(API unreachable - rerun with --resume){Style.RESET_ALL}")
+        if self.concurrency_controller:
+            controller = self.concurrency_controller
+            print(f"Concurrency limit:     {controller.limit} (adaptive, max {controller.maximum}, "
+                  f"{controller.decreases} decrease(s))")
+        if self.prefetch_stats:
+            stats = self.prefetch_stats
+            print(f"Prefetch queue:        depth {stats['depth']}, {stats['avg_ready']:.1f} ready on average, "
+                  f"full {stats['full_ratio']:.0%} of the time, {stats['stalls']} reader stall(s)")
         if self.files_not_found:
             print(f"\n{Fore.YELLOW}Files not found:       {len(self.files_not_found)}{Style.RESET_ALL}")
+        report = self.metrics.format_report()
+        if report:
+            print("-"*100)
+            print("\n".join(report))
         print("="*100 + "\n")
 
+        results['stage_latency'] = self.metrics.summary()
         return results
 
 
@@ -668,6 +2148,9 @@ Example usage:
   %(prog)s data.csv http://127.0.0.1:5000
   %(prog)s data.csv http://127.0.0.1:5000 --output report.json
   %(prog)s data.csv http://127.0.0.1:5000 --header "Authorization: Bearer token123"
+  %(prog)s data.csv http://127.0.0.1:5000 --concurrency 8
+  %(prog)s data.csv http://127.0.0.1:5000 --async --concurrency 500
+  %(prog)s data.csv http://127.0.0.1:5000 --transport batch --batch-size 100
 
 CSV Format:
   Required: numero_carta (or license_number, license, carta, id)
@@ -677,7 +2160,8 @@ CSV Format:
     )
     parser.add_argument(
         'csv_file',
-        help='Path to CSV file with biometric data'
+        help='Path to CSV file with biometric data (may be gzip, bz2, xz or zstd compressed, '
+             'e.g. export.csv.gz)'
     )
     parser.add_argument(
         'api_base_url',
@@ -696,9 +2180,322 @@ CSV Format:
         '--output',
         help='Save detailed results to JSON file'
     )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        metavar='N',
+        help='Number of drivers uploaded in parallel (default: 1, or 100 with --async)'
+    )
+    parser.add_argument(
+        '--async',
+        dest='use_async',
+        action='store_true',
+        help='Upload from an asyncio event loop with aiohttp, for hundreds of requests in flight '
+             '(requires aiohttp, the "async" extra)'
+    )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Stream the CSV and upload each driver as soon as its rows are read, with bounded '
+             'memory (CSV should be sorted by Numero_Carta)'
+    )
+    parser.add_argument(
+        '--parse-workers',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Processes parsing CSV files of 64 MB or more in chunks (default: 1, serial; '
+             'not used with --stream)'
+    )
+    parser.add_argument(
+        '--group-max-rows',
+        type=int,
+        default=DEFAULT_MAX_ROWS,
+        metavar='N',
+        help='CSV rows grouped in memory before grouping spills to disk, for unsorted files '
+             'larger than memory (default: %(default)s; 0 never spills on row count)'
+    )
+    parser.add_argument(
+        '--group-max-memory',
+        default='2G',
+        metavar='BYTES',
+        help='Process memory past which grouping spills to disk, e.g. 512M; needs /proc or psutil '
+             'to measure it, ignored with a warning otherwise (default: %(default)s; 0 never spills on memory)'
+    )
+    parser.add_argument(
+        '--spill-dir',
+        metavar='PATH',
+        help='Directory for grouping spill files (default: the system temp directory)'
+    )
+    parser.add_argument(
+        '--journal',
+        metavar='PATH',
+        help='Checkpoint journal of completed drivers, appended to by every run '
+             '(default with --resume: <csv_file>.journal; none otherwise)'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Resume an interrupted run: skip drivers the journal marks as uploaded'
+    )
+    parser.add_argument(
+        '--skip-unchanged',
+        nargs='?',
+        const=DEFAULT_MANIFEST_PATH,
+        metavar='PATH',
+        help='Keep a manifest of uploaded file hashes and leave unchanged files out of uploads '
+             '(default path: upload_manifest.sqlite next to config.json)'
+    )
+    parser.add_argument(
+        '--transport',
+        choices=BiometricAPIProcessor.TRANSPORTS,
+        default='json',
+        help='Request body format: json = base64 fields (default, current api-condutores contract), '
+             'json-stream = same JSON body base64-encoded from disk while sending (constant memory), '
+             'multipart = raw files streamed from disk as multipart/form-data, '
+             'batch = several drivers per request to the bulk endpoint POST /biometric-data/batch'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=50,
+        metavar='N',
+        help='Drivers per request with --transport batch (default: 50)'
+    )
+    parser.add_argument(
+        '--batch-bytes',
+        default='8M',
+        metavar='BYTES',
+        help='Maximum request body size with --transport batch; larger drivers are sent alone '
+             '(suffixes K, M, default: 8M)'
+    )
+    parser.add_argument(
+        '--no-file-index',
+        action='store_true',
+        help='Look up biometric files per driver instead of indexing --biometric-dir once at startup'
+    )
+    parser.add_argument(
+        '--discovery-cache',
+        nargs='?',
+        const=DEFAULT_CACHE_PATH,
+        metavar='PATH',
+        help='Cache biometric directory listings between runs in a SQLite file and only rescan '
+             'directories that changed (default path: discovery_cache.sqlite next to config.json)'
+    )
+    parser.add_argument(
+        '--pool-size',
+        type=int,
+        metavar='N',
+        help='Maximum keep-alive connections to the API (default: 10, or --concurrency if higher)'
+    )
+    parser.add_argument(
+        '--max-attempts',
+        type=int,
+        default=3,
+        metavar='N',
+        help='Attempts per driver for timeouts, connection errors and retryable HTTP statuses '
+             '(default: 3, 1 disables retries)'
+    )
+    parser.add_argument(
+        '--retry-backoff',
+        type=float,
+        default=1.0,
+        metavar='SECONDS',
+        help='Initial backoff before a retry; doubles every attempt, randomized with jitter (default: 1.0)'
+    )
+    parser.add_argument(
+        '--retry-max-delay',
+        type=float,
+        default=30.0,
+        metavar='SECONDS',
+        help='Maximum backoff between attempts, unless the server sends a longer Retry-After (default: 30)'
+    )
+    parser.add_argument(
+        '--retry-status',
+        default=','.join(str(code) for code in DEFAULT_RETRY_STATUSES),
+        metavar='CODES',
+        help='Comma-separated HTTP status codes to retry (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--max-rps',
+        type=float,
+        metavar='N',
+        help='Send at most N requests per second'
+    )
+    parser.add_argument(
+        '--max-bandwidth',
+        metavar='BYTES',
+        help='Send at most this many request body bytes per second (suffixes K, M, G, e.g. 5M)'
+    )
+    parser.add_argument(
+        '--adaptive-concurrency',
+        action='store_true',
+        help='Adapt uploads in flight between 1 and --concurrency: grow while the API responds '
+             'quickly, halve on 5xx responses and timeouts (AIMD)'
+    )
+    parser.add_argument(
+        '--aimd-initial',
+        type=int,
+        metavar='N',
+        help='Uploads in flight the adaptive limit starts at (default: a quarter of --concurrency)'
+    )
+    parser.add_argument(
+        '--aimd-decrease-factor',
+        type=float,
+        default=0.5,
+        metavar='F',
+        help='Multiply the adaptive limit by F on 5xx responses and timeouts (default: 0.5)'
+    )
+    parser.add_argument(
+        '--aimd-latency-tolerance',
+        type=float,
+        default=2.0,
+        metavar='X',
+        help='Stop growing the adaptive limit while latency exceeds X times the best seen (default: 2.0)'
+    )
+    parser.add_argument(
+        '--breaker-threshold',
+        type=int,
+        default=10,
+        metavar='N',
+        help='Open the circuit breaker after N consecutive drivers failed with 404/timeout/connection '
+             'errors, retries included (default: 10, 0 disables)'
+    )
+    parser.add_argument(
+        '--breaker-mode',
+        choices=CircuitBreaker.MODES,
+        default='fail-fast',
+        help='When the breaker opens: fail-fast = record the remaining drivers as not attempted '
+             '(default), pause = wait and probe the API until it is back'
+    )
+    parser.add_argument(
+        '--breaker-probe-interval',
+        type=float,
+        default=30.0,
+        metavar='SECONDS',
+        help='Seconds between probe requests in pause mode (default: 30)'
+    )
+    parser.add_argument(
+        '--breaker-max-probes',
+        type=int,
+        metavar='N',
+        help='Give up after N failed probes in pause mode (default: keep probing)'
+    )
+    parser.add_argument(
+        '--prefetch',
+        type=int,
+        default=0,
+        metavar='K',
+        help='Build the payloads of the next K drivers in background reader threads while earlier '
+             'drivers upload (default: 0, no read-ahead)'
+    )
+    parser.add_argument(
+        '--readers',
+        type=int,
+        default=2,
+        metavar='N',
+        help='Reader threads used for prefetching (default: 2)'
+    )
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        metavar='PORT',
+        help='Serve live Prometheus metrics on http://HOST:PORT/metrics while processing'
+    )
+    parser.add_argument(
+        '--metrics-host',
+        default='127.0.0.1',
+        metavar='HOST',
+        help='Address the metrics endpoint binds to (default: 127.0.0.1)'
+    )
+    parser.add_argument(
+        '--metrics-textfile',
+        metavar='PATH',
+        help='Write Prometheus metrics to PATH (e.g. a node_exporter textfile collector .prom file), '
+             'updated every --metrics-interval seconds and at the end of the run'
+    )
+    parser.add_argument(
+        '--metrics-interval',
+        type=float,
+        default=10.0,
+        metavar='SECONDS',
+        help='Seconds between --metrics-textfile updates (default: 10)'
+    )
+    parser.add_argument(
+        '--connection-stats',
+        action='store_true',
+        help='Print HTTP connection reuse statistics after processing'
+    )
 
     args = parser.parse_args()
 
+    if args.concurrency is not None and args.concurrency < 1:
+        parser.error('--concurrency must be at least 1')
+
+    processor_class = BiometricAPIProcessor
+    if args.use_async:
+        from async_processor import (AIOHTTP_AVAILABLE, AIOHTTP_INSTALL_HINT, DEFAULT_ASYNC_CONCURRENCY,
+                                     AsyncBiometricAPIProcessor)
+        if not AIOHTTP_AVAILABLE:
+            parser.error(f'--async requires aiohttp ({AIOHTTP_INSTALL_HINT})')
+        processor_class = AsyncBiometricAPIProcessor
+        concurrency = args.concurrency or DEFAULT_ASYNC_CONCURRENCY
+    else:
+        concurrency = args.concurrency or 1
+    if args.use_async and args.transport == 'batch':
+        parser.error('--transport batch is not supported with --async')
+    if args.batch_size < 1:
+        parser.error('--batch-size must be at least 1')
+    try:
+        batch_bytes = parse_size(args.batch_bytes)
+    except ValueError:
+        parser.error(f'Invalid --batch-bytes: {args.batch_bytes}')
+    if batch_bytes <= 0:
+        parser.error('--batch-bytes must be positive')
+    if args.pool_size is not None and args.pool_size < 1:
+        parser.error('--pool-size must be at least 1')
+    if args.prefetch < 0:
+        parser.error('--prefetch must be 0 or more')
+    if args.parse_workers < 1:
+        parser.error('--parse-workers must be at least 1')
+    if args.group_max_rows < 0:
+        parser.error('--group-max-rows must be 0 or more')
+    try:
+        group_max_memory = parse_size(args.group_max_memory)
+    except ValueError:
+        parser.error(f'Invalid --group-max-memory: {args.group_max_memory}')
+    if group_max_memory < 0:
+        parser.error('--group-max-memory must be 0 or more')
+    if args.spill_dir and not os.path.isdir(args.spill_dir):
+        parser.error(f'--spill-dir is not a directory: {args.spill_dir}')
+    if args.readers < 1:
+        parser.error('--readers must be at least 1')
+    if args.max_attempts < 1:
+        parser.error('--max-attempts must be at least 1')
+    if args.metrics_port is not None and not 0 <= args.metrics_port <= 65535:
+        parser.error('--metrics-port must be between 0 and 65535')
+    try:
+        retry_statuses = [int(code) for code in args.retry_status.split(',') if code.strip()]
+    except ValueError:
+        parser.error(f'Invalid --retry-status: {args.retry_status}')
+    retry_policy = RetryPolicy(max_attempts=args.max_attempts, base_delay=args.retry_backoff,
+                               max_delay=args.retry_max_delay, retry_statuses=retry_statuses)
+    if args.max_rps is not None and args.max_rps <= 0:
+        parser.error('--max-rps must be positive')
+    try:
+        max_bandwidth = parse_size(args.max_bandwidth) if args.max_bandwidth else None
+    except ValueError:
+        parser.error(f'Invalid --max-bandwidth: {args.max_bandwidth}')
+    if max_bandwidth is not None and max_bandwidth <= 0:
+        parser.error('--max-bandwidth must be positive')
+    rate_limiter = RateLimiter(args.max_rps, max_bandwidth) if args.max_rps or max_bandwidth else None
+    if args.aimd_initial is not None and args.aimd_initial < 1:
+        parser.error('--aimd-initial must be at least 1')
+    if not 0 < args.aimd_decrease_factor < 1:
+        parser.error('--aimd-decrease-factor must be between 0 and 1')
+    if args.aimd_latency_tolerance < 1:
+        parser.error('--aimd-latency-tolerance must be at least 1')
+
     # Parse custom headers
     headers = {'Content-Type': 'application/json'}
     if args.header:
@@ -710,8 +2507,52 @@ CSV Format:
             headers[key.strip()] = value.strip()
 
     # Process CSV and send to API
-    processor = BiometricAPIProcessor(args.api_base_url, headers, args.biometric_dir)
-    results = processor.process_csv(args.csv_file)
+    controller = None
+    if args.adaptive_concurrency:
+        controller = AIMDController(concurrency, initial=args.aimd_initial,
+                                    decrease_factor=args.aimd_decrease_factor,
+                                    latency_tolerance=args.aimd_latency_tolerance)
+    breaker = None
+    if args.breaker_threshold > 0:
+        breaker = CircuitBreaker(args.breaker_threshold, args.breaker_mode, args.breaker_probe_interval,
+                                 args.breaker_max_probes)
+    pool_size = args.pool_size or max(10, concurrency)
+    processor = processor_class(args.api_base_url, headers, args.biometric_dir, pool_size=pool_size,
+                                discovery_cache=args.discovery_cache, manifest=args.skip_unchanged,
+                                transport=args.transport, retry_policy=retry_policy,
+                                rate_limiter=rate_limiter, concurrency_controller=controller,
+                                circuit_breaker=breaker, prefetch=args.prefetch,
+                                reader_workers=args.readers, batch_size=args.batch_size,
+                                batch_bytes=batch_bytes, parse_workers=args.parse_workers,
+                                group_max_rows=args.group_max_rows or None,
+                                group_max_memory=group_max_memory or None, spill_dir=args.spill_dir)
+    exporter = None
+    if args.metrics_port is not None or args.metrics_textfile:
+        exporter = MetricsExporter(processor.metrics, port=args.metrics_port, host=args.metrics_host,
+                                   textfile=args.metrics_textfile, interval=args.metrics_interval)
+        try:
+            exporter.start()
+        except OSError as e:
+            processor.close()
+            parser.error(f'Cannot serve metrics on {args.metrics_host}:{args.metrics_port}: {e}')
+    # Journal only on request; --resume alone uses the default path
+    journal = args.journal or (f"{args.csv_file}.journal" if args.resume else None)
+    try:
+        results = processor.process_csv(args.csv_file, concurrency=concurrency,
+                                        index_files=not args.no_file_index, stream=args.stream,
+                                        journal=journal,
+                                        resume=args.resume)
+
+        if args.connection_stats:
+            stats = processor.get_connection_stats()
+            print(f"HTTP requests sent:    {stats['requests']}")
+            print(f"Connections opened:    {stats['connections_opened']}")
+            print(f"Connections reused:    {stats['connections_reused']}")
+            print(f"Connection pool size:  {stats['pool_size']}")
+    finally:
+        if exporter:
+            exporter.stop()
+        processor.close()
 
     # Save results if requested
     if args.output:
@@ -720,7 +2561,7 @@ CSV Format:
         print(f"\nDetailed results saved to: {args.output}")
 
     # Exit with appropriate code
-    if results['failed'] > 0:
+    if results['failed'] > 0 or results['not_attempted'] > 0:
         sys.exit(1)
     else:
         sys.exit(0)
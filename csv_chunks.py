@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+CSV Chunks
+Reads the Numero_Carta column of CSV exports, serially or by parsing byte
+ranges of a large file in a process pool, with the same results either way.
+Compressed exports (gzip, bz2, xz, zstd) are decompressed while being read.
+"""
+
+import io
+import os
+import csv
+import bz2
+import gzip
+import lzma
+import logging
+import itertools
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, TextIO, Tuple
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    zstd = None
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = zstd is not None
+
+logger = logging.getLogger(__name__)
+
+# Column the uploads group rows by
+LICENSE_COLUMN = 'Numero_Carta'
+
+# Files smaller than this are not worth starting a process pool for
+PARALLEL_MIN_SIZE = 64 * 1024 * 1024
+
+# Bounds of the byte range parsed by one task
+MIN_CHUNK_SIZE = 4 * 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Bytes read at a time while locating chunk boundaries
+SCAN_BLOCK_SIZE = 8 * 1024 * 1024
+
+# Leading bytes of each supported compression format
+COMPRESSION_MAGIC = (
+    ('gzip', b'\x1f\x8b'),
+    ('bz2', b'BZh'),
+    ('xz', b'\xfd7zXZ\x00'),
+    ('zstd', b'\x28\xb5\x2f\xfd')
+)
+
+# File dialog patterns of the CSV files open_csv reads
+CSV_FILETYPES = [("CSV files", "*.csv"),
+                 ("Compressed CSV files", "*.csv.gz *.csv.bz2 *.csv.xz *.csv.zst"),
+                 ("All files", "*.*")]
+
+
+class ChunkBoundaryError(ValueError):
+    """A chunk boundary fell inside a record (a quoted field spans it)."""
+
+
+def detect_compression(csv_file: str) -> Optional[str]:
+    """
+    Identify the compression of a file from its first bytes (not its name).
+
+    Args:
+        csv_file: Path to the file
+
+    Returns:
+        'gzip', 'bz2', 'xz' or 'zstd', or None for an uncompressed file
+    """
+    with open(csv_file, 'rb') as f:
+        magic = f.read(6)
+    for compression, prefix in COMPRESSION_MAGIC:
+        if magic.startswith(prefix):
+            return compression
+    return None
+
+
+def open_csv(csv_file: str) -> TextIO:
+    """
+    Open a CSV file for reading as text, decompressing it on the fly.
+
+    Compressed files are decoded chunk by chunk as they are read, without a
+    temporary file, so memory use does not depend on the file size. Text is
+    decoded like open(csv_file, 'r', encoding='utf-8').
+
+    Args:
+        csv_file: Path to a CSV file, optionally gzip, bz2, xz or zstd compressed
+
+    Returns:
+        Text stream of the CSV content
+
+    Raises:
+        OSError: If the file cannot be opened
+        RuntimeError: If the file is zstd compressed and no zstd module is installed
+    """
+    compression = detect_compression(csv_file)
+    if compression == 'gzip':
+        return gzip.open(csv_file, 'rt', encoding='utf-8')
+    if compression == 'bz2':
+        return bz2.open(csv_file, 'rt', encoding='utf-8')
+    if compression == 'xz':
+        return lzma.open(csv_file, 'rt', encoding='utf-8')
+    if compression == 'zstd':
+        if zstd is not None:
+            return zstd.open(csv_file, 'rt', encoding='utf-8')
+        if zstandard is None:
+            raise RuntimeError("Reading zstd compressed CSV files requires zstandard "
+                               "(pip install zstandard) or Python 3.14")
+        # Exports written by pzstd or concatenated files hold several frames
+        reader = zstandard.ZstdDecompressor().stream_reader(open(csv_file, 'rb'), read_across_frames=True)
+        return io.TextIOWrapper(io.BufferedReader(reader), encoding='utf-8')
+    return open(csv_file, 'r', encoding='utf-8')
+
+
+def license_column(header: List[str]) -> Optional[int]:
+    """
+    Locate the license column in a header row.
+
+    Args:
+        header: Column names
+
+    Returns:
+        Index of Numero_Carta (the last one if duplicated, like DictReader),
+        or None if there is none
+    """
+    columns = [i for i, name in enumerate(header) if name == LICENSE_COLUMN]
+    return columns[-1] if columns else None
+
+
+def iter_license_column(f: TextIO, header: Optional[List[str]] = None,
+                        complete: bool = False) -> Iterator[str]:
+    """
+    Read the license number of each row of an open CSV file.
+
+    Lines without quotes are split only up to the license column; lines with
+    quotes go through csv.reader, which reads the continuation lines of
+    multi-line fields itself. Rows are skipped exactly as
+    BiometricAPIProcessor.iter_csv skips them. Without a Numero_Carta column
+    every row reads as '' (fields past the header are never a license). License numbers are stripped
+    but not interned: interned strings are never freed (Python 3.12+), so
+    streaming a large file would keep every license number in memory.
+
+    Args:
+        f: CSV file opened in text mode (universal newlines)
+        header: Column names if f starts after the header row; by default
+                the first record of f is read as the header
+        complete: Raise ChunkBoundaryError if the last record is cut off by
+                  the end of f (f is a chunk of a larger file)
+
+    Yields:
+        License number of each row read ('' if the row has none)
+
+    Raises:
+        ChunkBoundaryError: If complete is set and f ends inside a record
+    """
+    held = []
+    exhausted = []
+
+    def lines():
+        # Lines for csv.reader: the held line, then the next lines of the
+        # file if a quoted field continues on them
+        while True:
+            if held:
+                yield held.pop()
+            else:
+                line = next(f, None)
+                if line is None:
+                    exhausted.append(True)
+                    return
+                yield line
+
+    reader = csv.reader(lines())
+    if header is None:
+        header = next(reader, [])
+    width = len(header)
+    column = license_column(header)
+    if column is None:
+        logger.warning(f"CSV header has no {LICENSE_COLUMN} column")
+
+    for line in f:
+        if '"' in line:
+            held.append(line)
+            row = next(reader)
+            if exhausted and complete:
+                raise ChunkBoundaryError("Quoted field continues past the end of the chunk")
+        elif column is None:
+            row = line.rstrip('\n').split(',')
+        else:
+            fields = line.split(',', column + 1)
+            value = fields[column].strip() if len(fields) > column else ''
+            if value:
+                yield value
+                continue
+            row = line.rstrip('\n').split(',')
+
+        if column is not None and len(row) > column and row[column]:
+            yield row[column].strip()
+            continue
+        # Same test as iter_csv: DictReader puts extra fields in a list,
+        # which counts as a value even if they are empty
+        if len(row) <= width and not any(row):
+            logger.debug("Skipping empty CSV row")
+            continue
+        yield ''
+
+
+def find_chunk_boundaries(csv_file: str, chunk_size: int) -> List[int]:
+    """
+    Split a CSV file into byte ranges that start at record boundaries.
+
+    A newline ends a record when an even number of quotes precede it (every
+    quote of a quoted field, doubled quotes included, toggles the parity).
+    Each boundary is the first such newline at least chunk_size bytes after
+    the previous one. Quotes inside unquoted fields can mislead the count;
+    count_chunk_licenses detects the resulting cut records.
+
+    Args:
+        csv_file: Path to CSV file
+        chunk_size: Approximate bytes per chunk
+
+    Returns:
+        Byte offsets: the end of the header row (where the first chunk
+        starts), the start of each further chunk and the file size
+    """
+    boundaries = []
+    target = 0
+    parity = 0
+    offset = 0
+
+    with open(csv_file, 'rb') as f:
+        while True:
+            block = f.read(SCAN_BLOCK_SIZE)
+            if not block:
+                break
+            pos = 0
+            while pos < len(block):
+                if offset + pos < target:
+                    skip_to = min(len(block), target - offset)
+                    parity ^= block.count(b'"', pos, skip_to) & 1
+                    pos = skip_to
+                    continue
+                newline = block.find(b'\n', pos)
+                if newline < 0:
+                    parity ^= block.count(b'"', pos) & 1
+                    break
+                parity ^= block.count(b'"', pos, newline) & 1
+                pos = newline + 1
+                if not parity:
+                    boundaries.append(offset + pos)
+                    target = offset + pos + chunk_size
+            offset += len(block)
+
+    if boundaries and boundaries[-1] < offset:
+        boundaries.append(offset)
+    return boundaries
+
+
+def read_chunk(csv_file: str, start: int, end: int) -> TextIO:
+    """
+    Open a byte range of a CSV file as text.
+
+    Args:
+        csv_file: Path to CSV file
+        start: First byte (a record boundary)
+        end: Byte after the last one
+
+    Returns:
+        Text stream over the range, decoded like open(csv_file, 'r', encoding='utf-8')
+    """
+    with open(csv_file, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return io.TextIOWrapper(io.BytesIO(data), encoding='utf-8')
+
+
+def count_chunk_licenses(csv_file: str, start: int, end: int, header: List[str],
+                         last: bool) -> Counter:
+    """
+    Count the rows of each license number in one chunk (process pool task).
+
+    Args:
+        csv_file: Path to CSV file
+        start: First byte of the chunk
+        end: Byte after the chunk
+        header: Column names from the header row
+        last: Whether the chunk ends the file (it may then end inside a record)
+
+    Returns:
+        Counter of rows per license number ('' for rows without one), in
+        order of first appearance
+
+    Raises:
+        ChunkBoundaryError: If the chunk does not end at a record boundary
+    """
+    return Counter(iter_license_column(read_chunk(csv_file, start, end), header, complete=not last))
+
+
+def plan_chunks(csv_file: str, workers: Optional[int] = None,
+                chunk_size: Optional[int] = None) -> Optional[Tuple[List[str], List[Tuple[int, int]]]]:
+    """
+    Split a large CSV file into chunks for iter_chunk_counts.
+
+    Args:
+        csv_file: Path to CSV file
+        workers: Worker processes (default: one per CPU)
+        chunk_size: Approximate bytes per chunk (default: the file split in
+                    4 chunks per worker, between 4 and 64 MiB)
+
+    Returns:
+        Tuple (header row, (start, end) byte range of each chunk), or None
+        if the file is too small to split or compressed (compressed streams
+        cannot be split into byte ranges)
+
+    Raises:
+        ChunkBoundaryError: If the header row does not end at the first boundary
+    """
+    if detect_compression(csv_file):
+        return None
+
+    workers = workers or os.cpu_count() or 1
+    size = os.path.getsize(csv_file)
+    if chunk_size is None:
+        chunk_size = min(MAX_CHUNK_SIZE, max(MIN_CHUNK_SIZE, size // (workers * 4)))
+
+    boundaries = find_chunk_boundaries(csv_file, chunk_size)
+    if len(boundaries) < 3:
+        return None
+
+    header_rows = list(csv.reader(read_chunk(csv_file, 0, boundaries[0])))
+    if len(header_rows) != 1:
+        raise ChunkBoundaryError("Header row does not end at the first chunk boundary")
+    return header_rows[0], list(zip(boundaries, boundaries[1:]))
+
+
+def iter_chunk_counts(csv_file: str, header: List[str], chunks: List[Tuple[int, int]],
+                      workers: Optional[int] = None) -> Iterator[Counter]:
+    """
+    Count the rows of each license number of a large CSV file in a process pool.
+
+    Every chunk from plan_chunks is parsed by a worker process and its counts
+    are yielded in chunk order, so merging them in order gives the same
+    result (order of first appearance included) as
+    Counter(iter_license_column(f)) over the whole file. At most two chunks
+    per worker are parsed ahead of the consumer.
+
+    Args:
+        csv_file: Path to CSV file
+        header: Header row from plan_chunks
+        chunks: Byte ranges from plan_chunks
+        workers: Worker processes (default: one per CPU)
+
+    Yields:
+        Counter of rows per license number ('' for rows without one) of each chunk
+
+    Raises:
+        ChunkBoundaryError: If quotes inside unquoted fields misplaced a
+                            boundary; parse the file serially instead
+    """
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    logger.info(f"Parsing {csv_file} in {len(chunks)} chunks with {workers} processes")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        tasks = deque()
+        positions = iter(enumerate(chunks))
+        try:
+            while True:
+                for position, (start, end) in itertools.islice(positions, workers * 2 - len(tasks)):
+                    tasks.append(executor.submit(count_chunk_licenses, csv_file, start, end, header,
+                                                 position == len(chunks) - 1))
+                if not tasks:
+                    return
+                yield tasks.popleft().result()
+        except BaseException:
+            executor.shutdown(cancel_futures=True)
+            raise
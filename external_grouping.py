@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+External Grouping
+Groups CSV rows by license number with bounded memory. Groups are built in
+memory until a row count or memory threshold is passed; from then on they are
+hash-partitioned into spill files on disk and read back one partition at a
+time, in the same order as in-memory grouping. Compact row and group types
+keep in-memory groups small.
+"""
+
+import os
+import heapq
+import pickle
+import shutil
+import logging
+import tempfile
+from collections.abc import Mapping, Sequence
+from operator import itemgetter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Default thresholds past which grouping spills to disk
+DEFAULT_MAX_ROWS = 10_000_000
+DEFAULT_MAX_MEMORY = 2 * 1024 * 1024 * 1024
+
+# Spill files the groups are hash-partitioned into; grouping one partition
+# back in memory takes about 1/DEFAULT_PARTITIONS of the in-memory footprint
+DEFAULT_PARTITIONS = 64
+
+# Records buffered before being written to the spill files, and records per
+# pickled batch of a sorted run
+SPILL_BUFFER_RECORDS = 50_000
+RUN_BATCH_RECORDS = 10_000
+
+# Rows added between two checks of the process memory
+MEMORY_CHECK_INTERVAL = 100_000
+
+
+def current_rss() -> Optional[int]:
+    """
+    Resident set size of the current process.
+
+    Returns:
+        Bytes, or None if it cannot be measured (no /proc and no psutil)
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if PSUTIL_AVAILABLE:
+        return psutil.Process().memory_info().rss
+    return None
+
+
+class LicenseRows(Sequence):
+    """
+    Rows of a driver read with only the Numero_Carta column.
+
+    Holds the license number and the row count instead of a list: each row
+    is a {'Numero_Carta': numero_carta} dictionary built when indexed, so
+    rows[0], len(rows) and iteration behave like the list of projected rows.
+    """
+
+    __slots__ = ('numero_carta', 'length')
+
+    def __init__(self, numero_carta: str, length: int):
+        self.numero_carta = numero_carta
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.length))]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError('row index out of range')
+        return {'Numero_Carta': self.numero_carta}
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, LicenseRows):
+            return self.numero_carta == other.numero_carta and self.length == other.length
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"LicenseRows({self.numero_carta!r}, {self.length})"
+
+
+class CompactRow(Mapping):
+    """
+    Read-only CSV row: the values in a tuple, the column names in a tuple
+    shared by all rows with the same header.
+
+    Reads like the csv.DictReader dictionary it replaces (row['field'],
+    'field' in row, row.get(), row.values(), equality with a dict) in a
+    fraction of the memory.
+    """
+
+    __slots__ = ('columns', '_values')
+
+    def __init__(self, columns: Tuple, values: Tuple):
+        self.columns = columns
+        self._values = values
+
+    def __getitem__(self, key):
+        try:
+            return self._values[self.columns.index(key)]
+        except ValueError:
+            raise KeyError(key) from None
+
+    def __iter__(self) -> Iterator:
+        return iter(self.columns)
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def __repr__(self) -> str:
+        return f"CompactRow({dict(self)!r})"
+
+
+class LicenseGroups(Mapping):
+    """
+    Groups held as one payload per license number (e.g. its row count).
+
+    The rows of a group are built by expand when the group is read, so the
+    groups cost no more than the dictionary of payloads they wrap, whose
+    keys are the only copy of each license number.
+    """
+
+    def __init__(self, payloads: Dict, expand: Callable):
+        """
+        Initialize the view.
+
+        Args:
+            payloads: License numbers mapped to their payloads, in order of first appearance
+            expand: Function (license number, payload) -> rows
+        """
+        self.payloads = payloads
+        self.expand = expand
+
+    def __getitem__(self, numero_carta: str):
+        return self.expand(numero_carta, self.payloads[numero_carta])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.payloads)
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+    def __contains__(self, numero_carta) -> bool:
+        return numero_carta in self.payloads
+
+    def items(self) -> Iterator[Tuple[str, List]]:
+        """
+        Iterate over the groups, building each one's rows.
+
+        Yields:
+            Tuples of (license number, rows) in order of first appearance
+        """
+        expand = self.expand
+        for numero_carta, payload in self.payloads.items():
+            yield numero_carta, expand(numero_carta, payload)
+
+
+def _read_records(path: str) -> Iterator[Tuple]:
+    """Read back the records of a spill file, one pickled batch at a time."""
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                return
+            yield from batch
+
+
+class SpilledGroups:
+    """
+    Groups that LicenseGrouper spilled to disk.
+
+    Stands in for the dictionary that in-memory grouping returns, as far as
+    uploads use it: len(), truth value, iteration over the license numbers
+    and items(). items() merges the sorted runs lazily, one batch per run in
+    memory, yielding the groups in order of first appearance like the
+    dictionary would. close() deletes the spill files.
+    """
+
+    def __init__(self, directory: str, runs: List[str], count: int,
+                 expand: Optional[Callable] = None):
+        """
+        Initialize the view (LicenseGrouper.finish() creates it).
+
+        Args:
+            directory: Temporary directory holding the runs
+            runs: Paths of the runs, each sorted by first appearance
+            count: Number of groups
+            expand: Optional function (license number, payload) -> rows
+        """
+        self.directory = directory
+        self.runs = runs
+        self.count = count
+        self.expand = expand
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __bool__(self) -> bool:
+        return self.count > 0
+
+    def __iter__(self) -> Iterator[str]:
+        for numero_carta, _ in self.items():
+            yield numero_carta
+
+    def keys(self) -> Iterator[str]:
+        return iter(self)
+
+    def items(self) -> Iterator[Tuple[str, List]]:
+        """
+        Read the groups back from disk.
+
+        Yields:
+            Tuples of (license number, rows) in order of first appearance
+        """
+        if self.directory is None:
+            raise ValueError("Spilled groups are closed")
+        for _, numero_carta, payload in heapq.merge(*(_read_records(run) for run in self.runs),
+                                                    key=itemgetter(0)):
+            yield numero_carta, self.expand(numero_carta, payload) if self.expand else payload
+
+    def close(self):
+        """Delete the spill files."""
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+            self.runs = []
+
+    def __enter__(self) -> 'SpilledGroups':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class LicenseGrouper:
+    """
+    Group rows by license number, spilling to disk past a threshold.
+
+    Rows are added one at a time with add() (groups hold the rows) or as
+    per-license row counts with add_counts() (groups hold a count); a
+    grouper takes one or the other. Until max_rows rows were added, or the
+    process uses more than max_memory bytes, groups live in a dictionary.
+    Past either threshold, the groups so far and every later row are written
+    to hash partitions in a temporary directory, tagged with a sequence
+    number. finish() then groups each partition in memory, writes it back as
+    a run sorted by first appearance, and returns a SpilledGroups view that
+    merges the runs: the groups, their rows and their order are the same as
+    without spilling.
+    """
+
+    def __init__(self, expand: Optional[Callable] = None, max_rows: Optional[int] = DEFAULT_MAX_ROWS,
+                 max_memory: Optional[int] = DEFAULT_MAX_MEMORY, partitions: int = DEFAULT_PARTITIONS,
+                 spill_dir: Optional[str] = None):
+        """
+        Initialize the grouper.
+
+        Args:
+            expand: Optional function (license number, payload) -> rows applied
+                    to each group when it is returned (e.g. to turn counts into rows)
+            max_rows: Rows grouped in memory before spilling (None: no limit)
+            max_memory: Process resident memory in bytes past which grouping
+                        spills (None: no limit; ignored with a warning where it cannot
+                        be measured)
+            partitions: Number of spill files (default: 64)
+            spill_dir: Directory for the spill files (default: the system temp directory)
+        """
+        self.expand = expand
+        self.max_rows = max_rows or None
+        self.max_memory = max_memory or None
+        self.partitions = max(1, partitions)
+        self.spill_dir = spill_dir
+        self.rows = 0
+        self.directory = None
+        self._groups = {}
+        self._sequence = 0
+        self._files = []
+        self._buffers = []
+        self._buffered = 0
+        self._next_memory_check = MEMORY_CHECK_INTERVAL
+
+    @property
+    def spilled(self) -> bool:
+        """Whether grouping moved to disk."""
+        return self.directory is not None
+
+    def add(self, numero_carta: str, row: Dict):
+        """
+        Add one row to its license's group.
+
+        Args:
+            numero_carta: License number of the row
+            row: CSV row
+        """
+        self.rows += 1
+        if self.directory is not None:
+            self._write(numero_carta, [row])
+            return
+
+        rows = self._groups.get(numero_carta)
+        if rows is None:
+            self._groups[numero_carta] = [row]
+        else:
+            rows.append(row)
+        if self._over_threshold():
+            self._spill()
+
+    def add_counts(self, counts: Dict[str, int]):
+        """
+        Add row counts per license number, in order of first appearance.
+
+        Args:
+            counts: Rows per license number of the next part of the file
+                    (e.g. a Counter); it may be modified
+        """
+        self.rows += sum(counts.values())
+        if self.directory is not None:
+            for numero_carta, count in counts.items():
+                self._write(numero_carta, count)
+            return
+
+        # Add the counts of licenses already seen, then append the new ones in
+        # order (dict.update keeps the position of existing keys)
+        for numero_carta in counts.keys() & self._groups.keys():
+            counts[numero_carta] += self._groups[numero_carta]
+        dict.update(self._groups, counts)
+        if self._over_threshold():
+            self._spill()
+
+    def finish(self) -> Union[Dict[str, List], SpilledGroups]:
+        """
+        Complete the grouping.
+
+        Returns:
+            Dictionary of license numbers to their groups in order of first
+            appearance (a LicenseGroups view with expand), or a SpilledGroups
+            view of the same if grouping spilled
+        """
+        if self.directory is None:
+            groups, self._groups = self._groups, {}
+            if self.expand:
+                return LicenseGroups(groups, self.expand)
+            return groups
+
+        self._flush()
+        for f in self._files:
+            f.close()
+        self._files = []
+
+        runs = []
+        count = 0
+        for partition in range(self.partitions):
+            path = os.path.join(self.directory, f'partition_{partition}.pickle')
+            merged = {}
+            for sequence, numero_carta, payload in _read_records(path):
+                entry = merged.get(numero_carta)
+                if entry is None:
+                    merged[numero_carta] = [sequence, numero_carta, payload]
+                else:
+                    entry[2] += payload
+            os.remove(path)
+
+            entries = sorted(merged.values(), key=itemgetter(0))
+            del merged
+            run = os.path.join(self.directory, f'run_{partition}.pickle')
+            with open(run, 'wb') as f:
+                for start in range(0, len(entries), RUN_BATCH_RECORDS):
+                    pickle.dump(entries[start:start + RUN_BATCH_RECORDS], f, pickle.HIGHEST_PROTOCOL)
+            count += len(entries)
+            runs.append(run)
+
+        groups = SpilledGroups(self.directory, runs, count, self.expand)
+        self.directory = None
+        logger.info(f"Grouped {self.rows} rows into {count} groups on disk")
+        return groups
+
+    def close(self):
+        """Delete the spill files of an unfinished grouping."""
+        for f in self._files:
+            f.close()
+        self._files = []
+        self._groups = {}
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+    def _over_threshold(self) -> bool:
+        if self.max_rows is not None and self.rows > self.max_rows:
+            return True
+        if self.max_memory is not None and self.rows >= self._next_memory_check:
+            self._next_memory_check = self.rows + MEMORY_CHECK_INTERVAL
+            rss = current_rss()
+            if rss is None:
+                logger.warning(f"Cannot measure process memory (no /proc and psutil is not installed): "
+                               f"ignoring the grouping memory limit of {self.max_memory} bytes; "
+                               f"install psutil to enable it")
+                self.max_memory = None
+                return False
+            return rss > self.max_memory
+        return False
+
+    def _spill(self):
+        """Move the in-memory groups to the spill files; later rows go straight there."""
+        self.directory = tempfile.mkdtemp(prefix='biometric_groups_', dir=self.spill_dir)
+        logger.info(f"Grouping past {self.rows} rows ({len(self._groups)} licenses) in memory, "
+                    f"spilling to {self.directory}")
+        self._files = [open(os.path.join(self.directory, f'partition_{partition}.pickle'), 'wb')
+                       for partition in range(self.partitions)]
+        self._buffers = [[] for _ in range(self.partitions)]
+
+        groups, self._groups = self._groups, {}
+        for numero_carta, payload in groups.items():
+            self._write(numero_carta, payload)
+
+    def _write(self, numero_carta: str, payload):
+        # The sequence number orders groups by first appearance when read back
+        self._buffers[hash(numero_carta) % self.partitions].append((self._sequence, numero_carta, payload))
+        self._sequence += 1
+        self._buffered += 1
+        if self._buffered >= SPILL_BUFFER_RECORDS:
+            self._flush()
+
+    def _flush(self):
+        for partition, buffer in enumerate(self._buffers):
+            if buffer:
+                pickle.dump(buffer, self._files[partition], pickle.HIGHEST_PROTOCOL)
+                self._buffers[partition] = []
+        self._buffered = 0
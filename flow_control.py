@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Flow Control
+Client-side throttling for uploads to api-condutores: a token-bucket rate
+limiter (requests/s and bytes/s), an AIMD controller that adapts the
+number of requests in flight to how the API is coping, and a circuit
+breaker that stops a batch from hammering an API that is down.
+"""
+
+import time
+import threading
+from typing import Dict, Optional
+
+# Unit suffixes accepted by parse_size
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(value: str) -> int:
+    """
+    Parse a byte count with an optional K/M/G suffix (e.g. '512K', '5M').
+
+    Args:
+        value: Size string
+
+    Returns:
+        Number of bytes
+
+    Raises:
+        ValueError: If the value is not a valid size
+    """
+    text = value.strip().upper().rstrip('B')
+    unit = text[-1:] if text[-1:] in SIZE_UNITS else ''
+    number = text[:-1] if unit else text
+    return int(float(number) * SIZE_UNITS[unit])
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at rate tokens per second, holding at most burst tokens.
+
+    reserve() never blocks: it takes the tokens immediately (the balance may
+    go negative) and returns how long the caller has to wait before using
+    them. Waiting is left to the caller, so the same bucket serves worker
+    threads (time.sleep) and the event loop (asyncio.sleep), and callers are
+    served in the order they reserved.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity (default: one second worth of tokens)
+        """
+        self.rate = float(rate)
+        self.burst = float(burst) if burst else max(1.0, self.rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """
+        Take tokens from the bucket.
+
+        Args:
+            tokens: Number of tokens needed
+
+        Returns:
+            Seconds to wait before the tokens may be used (0 if available now)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= tokens
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RateLimiter:
+    """Limits requests per second and request body bytes per second."""
+
+    def __init__(self, requests_per_second: Optional[float] = None,
+                 bytes_per_second: Optional[float] = None):
+        """
+        Initialize the limiter.
+
+        Args:
+            requests_per_second: Maximum request rate (None: unlimited)
+            bytes_per_second: Maximum upload bandwidth in bytes (None: unlimited)
+        """
+        self.requests = TokenBucket(requests_per_second) if requests_per_second else None
+        self.bytes = TokenBucket(bytes_per_second) if bytes_per_second else None
+
+    def reserve(self, size: int) -> float:
+        """
+        Reserve capacity for one request.
+
+        Args:
+            size: Request body size in bytes
+
+        Returns:
+            Seconds to wait before sending the request
+        """
+        delay = 0.0
+        if self.requests:
+            delay = self.requests.reserve(1)
+        if self.bytes:
+            delay = max(delay, self.bytes.reserve(size))
+        return delay
+
+
+class AIMDController:
+    """
+    Additive-increase / multiplicative-decrease limit on requests in flight.
+
+    Every healthy response adds 1/limit to the limit (about +1 per round of
+    requests), as long as its latency stays within latency_tolerance times
+    the lowest latency seen. A 5xx status, timeout or connection error
+    multiplies the limit by decrease_factor; responses to requests started
+    before the last decrease are not counted again, so one burst of
+    failures halves the limit once. Safe to use from worker threads.
+    """
+
+    def __init__(self, maximum: int, minimum: int = 1, initial: Optional[int] = None,
+                 decrease_factor: float = 0.5, latency_tolerance: float = 2.0):
+        """
+        Initialize the controller.
+
+        Args:
+            maximum: Highest allowed limit (the configured concurrency)
+            minimum: Lowest allowed limit (default: 1)
+            initial: Starting limit (default: a quarter of maximum)
+            decrease_factor: Multiplier applied on failure (default: 0.5)
+            latency_tolerance: Latency above this multiple of the best latency
+                               seen stops the limit from growing (default: 2.0)
+        """
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        start = initial if initial is not None else self.maximum // 4
+        self._limit = float(max(self.minimum, min(self.maximum, start)))
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.best_latency = None
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        """Current number of requests allowed in flight."""
+        return int(self._limit)
+
+    @staticmethod
+    def is_overload(result: Dict) -> bool:
+        """
+        Check whether a result signals that the API is overloaded.
+
+        Args:
+            result: Result dictionary of one request
+
+        Returns:
+            True for 5xx statuses, timeouts and connection errors
+        """
+        status_code = result.get('status_code')
+        if status_code is not None:
+            return status_code >= 500
+        return result.get('transient', False)
+
+    def record(self, result: Dict, started: float, latency: float):
+        """
+        Adjust the limit after a request completed.
+
+        Args:
+            result: Result dictionary of the request
+            started: time.monotonic() when the request was sent
+            latency: Seconds the request took
+        """
+        with self._lock:
+            if self.is_overload(result):
+                if started >= self._last_decrease:
+                    self._limit = max(self.minimum, self._limit * self.decrease_factor)
+                    self._last_decrease = time.monotonic()
+                    self.decreases += 1
+                return
+
+            if self.best_latency is None or latency < self.best_latency:
+                self.best_latency = latency
+            if latency <= self.best_latency * self.latency_tolerance:
+                self._limit = min(self.maximum, self._limit + 1.0 / self._limit)
+
+
+class CircuitBreaker:
+    """
+    Stops sending to an API that is unreachable or misconfigured.
+
+    The breaker opens after threshold consecutive failures (404 config
+    errors, timeouts or connection errors). In 'fail-fast' mode it stays
+    open and no further request is allowed. In 'pause' mode it allows a
+    single probe request every probe_interval seconds (half-open): a
+    successful probe closes the breaker, a failed one keeps it open. After
+    max_probes failed probes it gives up like 'fail-fast'. Once open, only
+    the probe counts: results of requests started before it was handed out
+    are ignored. Safe to use from worker threads.
+    """
+
+    MODES = ('fail-fast', 'pause')
+
+    def __init__(self, threshold: int = 10, mode: str = 'fail-fast', probe_interval: float = 30.0,
+                 max_probes: Optional[int] = None):
+        """
+        Initialize a closed breaker.
+
+        Args:
+            threshold: Consecutive failures that open the breaker
+            mode: 'fail-fast' or 'pause' (see class docstring)
+            probe_interval: Seconds between half-open probes in 'pause' mode
+            max_probes: Failed probes before giving up (None: probe until the API is back)
+
+        Raises:
+            ValueError: If mode is unknown
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown circuit breaker mode '{mode}' (expected one of {', '.join(self.MODES)})")
+
+        self.threshold = max(1, threshold)
+        self.mode = mode
+        self.probe_interval = probe_interval
+        self.max_probes = max_probes
+        self.state = 'closed'
+        self.failures = 0
+        self.failed_probes = 0
+        self.trips = 0
+        self._next_probe = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def gave_up(self) -> bool:
+        """True once no request will ever be allowed again."""
+        if self.state == 'closed':
+            return False
+        if self.mode == 'fail-fast':
+            return True
+        return self.max_probes is not None and self.failed_probes >= self.max_probes
+
+    @staticmethod
+    def is_failure(result: Dict) -> bool:
+        """
+        Check whether a result means the API cannot be reached as configured.
+
+        Args:
+            result: Result dictionary of one request
+
+        Returns:
+            True for config errors (404), timeouts and connection errors
+        """
+        return result.get('status') == 'config_error' or (
+            result.get('status_code') is None and result.get('transient', False))
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a request may be sent now.
+
+        In the half-open state this hands out the single probe, so call it
+        only right before sending.
+
+        Returns:
+            True if the request may be sent
+        """
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.gave_up or self._probe_in_flight or time.monotonic() < self._next_probe:
+                return False
+            self.state = 'half_open'
+            self._probe_in_flight = True
+            self._probe_started = time.monotonic()
+            return True
+
+    def wait_time(self) -> Optional[float]:
+        """
+        Seconds until allow_request may succeed again.
+
+        Returns:
+            0 when closed, the time to the next probe when open, or None when
+            waiting for a probe in flight or after giving up
+        """
+        with self._lock:
+            if self.state == 'closed':
+                return 0.0
+            if self.gave_up or self._probe_in_flight:
+                return None
+            return max(0.0, self._next_probe - time.monotonic())
+
+    def record(self, result: Dict, started: Optional[float] = None) -> bool:
+        """
+        Update the breaker with the result of a request.
+
+        Args:
+            result: Result dictionary of the request (drivers for which no
+                    request was sent, status 'no_data' or 'unchanged', are ignored)
+            started: time.monotonic() when the request was sent; while the
+                     breaker is open, results of requests sent before the probe
+                     are ignored (None: always counted)
+
+        Returns:
+            True if this result opened the breaker
+        """
+        with self._lock:
+            if self.state != 'closed' and started is not None and (
+                    not self._probe_in_flight or started < self._probe_started):
+                # Sent before the breaker opened: not the probe
+                return False
+
+            if result.get('status') in ('no_data', 'unchanged'):
+                # No request was sent, so a probe slot handed out for it is free again
+                self._probe_in_flight = False
+                return False
+
+            if not self.is_failure(result):
+                self.state = 'closed'
+                self.failures = 0
+                self.failed_probes = 0
+                self._probe_in_flight = False
+                return False
+
+            if self.state == 'half_open':
+                self.failed_probes += 1
+                self.state = 'open'
+                self._probe_in_flight = False
+                self._next_probe = time.monotonic() + self.probe_interval
+                return False
+
+            self.failures += 1
+            if self.state == 'closed' and self.failures >= self.threshold:
+                self.state = 'open'
+                self.trips += 1
+                self._next_probe = time.monotonic() + self.probe_interval
+                return True
+            return False
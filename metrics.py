@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Upload Pipeline Metrics
+Per-stage latency histograms for the upload pipeline (file discovery,
+encoding, JSON serialization, the API round trip, ...). Recording a value
+is a bisect into fixed log-spaced buckets, so the timers are cheap enough
+to leave on for every driver of every batch.
+
+Counters and gauges (outcomes by status code, bytes sent, requests in
+flight, queue depths) are kept alongside, and MetricsExporter publishes
+everything in the Prometheus text format while a batch runs, from an
+embedded HTTP endpoint and/or a textfile for node_exporter.
+"""
+
+import os
+import time
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bucket bounds in seconds: 10 per decade from 10 us to 1000 s
+BUCKET_BOUNDS = [1e-5 * 10 ** (i / 10) for i in range(81)]
+
+# Order in which known per-driver stages are reported
+STAGE_ORDER = ('prefetch_wait', 'discover', 'encode', 'serialize', 'throttle', 'send', 'total')
+
+# Prefix of every exported metric name
+METRIC_PREFIX = 'biometric_upload_'
+
+# Exported counters and gauges: name -> (type, help)
+METRIC_HELP = {
+    'retries_total': ('counter', 'Failed attempts scheduled for a retry'),
+    'request_bytes_total': ('counter', 'Request body bytes sent to the API'),
+    'requests_in_flight': ('gauge', 'Requests sent and waiting for a response'),
+    'drivers_expected': ('gauge', 'Drivers in the batch (absent when streaming)'),
+    'drivers_pending': ('gauge', 'Drivers queued or uploading in the scheduler'),
+    'retry_queue': ('gauge', 'Drivers waiting for their retry backoff to elapse'),
+    'prefetch_ready': ('gauge', 'Payloads built ahead and ready for the sender'),
+    'concurrency_limit': ('gauge', 'Uploads allowed in flight by the adaptive controller'),
+    'circuit_breaker_open': ('gauge', '1 while the circuit breaker is open or half-open'),
+}
+
+# Histogram bounds exported to Prometheus: every fifth bucket (half a decade)
+EXPORTED_BOUNDS = BUCKET_BOUNDS[::5]
+
+# Outcome reported for each result status (matches the process_csv summary)
+OUTCOMES = {
+    'success': 'success',
+    'skipped': 'skipped',
+    'no_data': 'skipped',
+    'unchanged': 'skipped',
+    'resumed': 'skipped',
+    'missing_license': 'skipped',
+    'not_attempted': 'not_attempted',
+}
+
+
+class LatencyHistogram:
+    """Log-bucketed histogram of durations in seconds."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds: float):
+        """
+        Add one duration.
+
+        Args:
+            seconds: Duration in seconds
+        """
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Estimate a percentile by interpolating inside its bucket.
+
+        Args:
+            q: Percentile between 0 and 100
+
+        Returns:
+            Estimated duration in seconds, or None if the histogram is empty
+        """
+        if not self.count:
+            return None
+
+        rank = q / 100 * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if not bucket_count:
+                continue
+            if seen + bucket_count >= rank:
+                lower = BUCKET_BOUNDS[index - 1] if index > 0 else self.min
+                upper = BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max
+                fraction = (rank - seen) / bucket_count
+                # Buckets are log-spaced, so interpolate geometrically
+                value = lower * (upper / lower) ** fraction if lower > 0 else upper * fraction
+                return min(max(value, self.min), self.max)
+            seen += bucket_count
+        return self.max
+
+    def cumulative(self, bounds: List[float]) -> List[int]:
+        """
+        Count the durations at or below each of the given bounds.
+
+        Args:
+            bounds: Ascending subset of BUCKET_BOUNDS
+
+        Returns:
+            Cumulative count per bound
+        """
+        counts = []
+        seen = 0
+        index = 0
+        for bound in bounds:
+            end = bisect.bisect_left(BUCKET_BOUNDS, bound) + 1
+            seen += sum(self.counts[index:end])
+            index = end
+            counts.append(seen)
+        return counts
+
+    def buckets(self, group: int = 2) -> Iterator[Tuple[float, int]]:
+        """
+        Iterate over non-empty ranges of buckets, merged group at a time.
+
+        Args:
+            group: Number of adjacent buckets merged per row (default: 2, a fifth of a decade)
+
+        Yields:
+            (upper bound in seconds, count) pairs from the first to the last
+            non-empty range; the upper bound of the overflow range is the maximum
+        """
+        rows = []
+        for start in range(0, len(self.counts), group):
+            end = min(start + group, len(self.counts))
+            upper = BUCKET_BOUNDS[end - 1] if end - 1 < len(BUCKET_BOUNDS) else self.max
+            rows.append((upper, sum(self.counts[start:end])))
+
+        filled = [index for index, (_, count) in enumerate(rows) if count]
+        if filled:
+            yield from rows[filled[0]:filled[-1] + 1]
+
+
+class PipelineMetrics:
+    """
+    Latency histograms per pipeline stage, one-off batch timings, and the
+    counters and gauges published by MetricsExporter.
+
+    Safe to use from worker threads.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, LatencyHistogram] = {}
+        self.batch: Dict[str, float] = {}
+        self.outcomes: Dict[Tuple[str, str, str], int] = {}
+        self.values: Dict[str, float] = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        """
+        Add one duration to a stage.
+
+        Args:
+            stage: Stage name
+            seconds: Duration in seconds
+        """
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def record_timings(self, timings: Dict[str, float]):
+        """
+        Add the stage durations of one driver.
+
+        Args:
+            timings: Dictionary mapping stage names to seconds
+        """
+        for stage, seconds in timings.items():
+            self.record(stage, seconds)
+
+    def record_batch(self, stage: str, seconds: float):
+        """
+        Add time spent in a once-per-batch stage (CSV reading, indexing, ...).
+
+        Args:
+            stage: Stage name
+            seconds: Duration in seconds
+        """
+        with self._lock:
+            self.batch[stage] = self.batch.get(stage, 0.0) + seconds
+
+    def record_outcome(self, result: Dict):
+        """
+        Count the final result of one driver.
+
+        Args:
+            result: Result dictionary of the driver
+        """
+        status = result.get('status', 'error')
+        status_code = result.get('status_code')
+        key = (OUTCOMES.get(status, 'failed'), status, str(status_code) if status_code is not None else '')
+        with self._lock:
+            self.outcomes[key] = self.outcomes.get(key, 0) + 1
+
+    def increment(self, name: str, amount: float = 1):
+        """
+        Add to a counter, or to a gauge (a negative amount lowers it).
+
+        Args:
+            name: Metric name (see METRIC_HELP)
+            amount: Amount added (default: 1)
+        """
+        with self._lock:
+            self.values[name] = self.values.get(name, 0) + amount
+
+    def set_gauge(self, name: str, value: float):
+        """
+        Set a gauge.
+
+        Args:
+            name: Metric name (see METRIC_HELP)
+            value: New value
+        """
+        with self._lock:
+            self.values[name] = value
+
+    def ordered_stages(self) -> List[Tuple[str, LatencyHistogram]]:
+        """
+        Get the recorded stages in pipeline order.
+
+        Returns:
+            List of (stage name, histogram) pairs
+        """
+        known = [(stage, self.stages[stage]) for stage in STAGE_ORDER if stage in self.stages]
+        others = sorted((stage, histogram) for stage, histogram in self.stages.items()
+                        if stage not in STAGE_ORDER)
+        return known + others
+
+    def summary(self) -> Dict:
+        """
+        Get the aggregate statistics (for JSON reports).
+
+        Returns:
+            Dictionary with per-stage count, mean, p50, p95, p99 and max in
+            milliseconds, and batch stage totals in seconds
+        """
+        stages = {}
+        for stage, histogram in self.ordered_stages():
+            stages[stage] = {
+                'count': histogram.count,
+                'mean_ms': round(histogram.total / histogram.count * 1000, 2),
+                'p50_ms': round(histogram.percentile(50) * 1000, 2),
+                'p95_ms': round(histogram.percentile(95) * 1000, 2),
+                'p99_ms': round(histogram.percentile(99) * 1000, 2),
+                'max_ms': round(histogram.max * 1000, 2)
+            }
+        return {'stages': stages, 'batch_seconds': {stage: round(seconds, 3)
+                                                    for stage, seconds in self.batch.items()}}
+
+    def format_report(self, histograms: bool = True, width: int = 40) -> List[str]:
+        """
+        Format the percentile table and histograms for the console summary.
+
+        Args:
+            histograms: Include a histogram per stage (default: True)
+            width: Width of the longest histogram bar
+
+        Returns:
+            Lines of text
+        """
+        lines = []
+        if self.batch:
+            lines.append("Batch stages:          " + ", ".join(
+                f"{stage} {seconds:.2f}s" for stage, seconds in self.batch.items()))
+
+        stages = self.ordered_stages()
+        if not stages:
+            return lines
+
+        lines.append(f"{'Stage latency (ms)':18} {'count':>8} {'mean':>9} {'p50':>9} "
+                     f"{'p95':>9} {'p99':>9} {'max':>9}")
+        for stage, histogram in stages:
+            lines.append(f"  {stage:16} {histogram.count:8} {histogram.total / histogram.count * 1000:9.2f} "
+                         f"{histogram.percentile(50) * 1000:9.2f} {histogram.percentile(95) * 1000:9.2f} "
+                         f"{histogram.percentile(99) * 1000:9.2f} {histogram.max * 1000:9.2f}")
+
+        if histograms:
+            for stage, histogram in stages:
+                rows = list(histogram.buckets())
+                peak = max(count for _, count in rows)
+                lines.append(f"{stage} histogram:")
+                for upper, count in rows:
+                    bar = '#' * (round(count / peak * width) if count else 0)
+                    lines.append(f"  <= {_format_duration(upper):>8} | {bar:{width}} {count}")
+        return lines
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format (0.0.4).
+
+        Returns:
+            Exposition text, ending with a newline
+        """
+        lines = []
+
+        def header(name, metric_type, help_text):
+            lines.append(f"# HELP {METRIC_PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}{name} {metric_type}")
+
+        with self._lock:
+            header('start_time_seconds', 'gauge', 'Unix time the batch started')
+            lines.append(f"{METRIC_PREFIX}start_time_seconds {self.started:.3f}")
+
+            header('drivers_total', 'counter', 'Drivers processed, by outcome, result status and HTTP status code')
+            for (outcome, status, code), count in sorted(self.outcomes.items()):
+                lines.append(f'{METRIC_PREFIX}drivers_total{{outcome="{outcome}",status="{status}",'
+                             f'code="{code}"}} {count}')
+
+            for name, (metric_type, help_text) in METRIC_HELP.items():
+                if name in self.values or metric_type == 'counter':
+                    header(name, metric_type, help_text)
+                    lines.append(f"{METRIC_PREFIX}{name} {_format_value(self.values.get(name, 0))}")
+
+            if self.batch:
+                header('batch_stage_seconds', 'gauge', 'Time spent in once-per-batch stages')
+                for stage, seconds in self.batch.items():
+                    lines.append(f'{METRIC_PREFIX}batch_stage_seconds{{stage="{stage}"}} {seconds:.6f}')
+
+            header('stage_seconds', 'histogram', 'Duration of each upload pipeline stage per attempt')
+            for stage, histogram in self.ordered_stages():
+                name = f"{METRIC_PREFIX}stage_seconds"
+                for bound, count in zip(EXPORTED_BOUNDS, histogram.cumulative(EXPORTED_BOUNDS)):
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound:.6g}"}} {count}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.total:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """
+    Publishes PipelineMetrics for Prometheus while a batch runs.
+
+    With a port, an HTTP server thread answers GET /metrics. With a textfile,
+    a thread rewrites the file every interval seconds (atomically, for the
+    node_exporter textfile collector) and once more on stop(), so the final
+    numbers of a scheduled run stay visible after it exits.
+    """
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, metrics: PipelineMetrics, port: Optional[int] = None, host: str = '127.0.0.1',
+                 textfile: Optional[str] = None, interval: float = 10.0):
+        """
+        Initialize the exporter (nothing is published until start()).
+
+        Args:
+            metrics: Metrics to publish
+            port: Optional HTTP port serving /metrics (0 picks a free port)
+            host: Address the HTTP server binds to (default: 127.0.0.1)
+            textfile: Optional path of a .prom file rewritten every interval
+            interval: Seconds between textfile updates (default: 10)
+        """
+        self.metrics = metrics
+        self.port = port
+        self.host = host
+        self.textfile = textfile
+        self.interval = max(0.1, interval)
+        self.server = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """
+        Start the HTTP server and/or the textfile writer.
+
+        Raises:
+            OSError: If the HTTP port cannot be bound
+        """
+        if self.port is not None:
+            exporter = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+                        self.send_error(404)
+                        return
+                    body = exporter.metrics.render().encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', exporter.CONTENT_TYPE)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self.server.daemon_threads = True
+            self.port = self.server.server_address[1]
+            self._spawn(self.server.serve_forever)
+            logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+        if self.textfile:
+            self.write_textfile()
+            self._spawn(self._write_periodically)
+
+    def _spawn(self, target):
+        thread = threading.Thread(target=target, name='metrics-exporter', daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _write_periodically(self):
+        while not self._stop.wait(self.interval):
+            self.write_textfile()
+
+    def write_textfile(self):
+        """Write the current metrics to the textfile (via a temporary file and rename)."""
+        temp_path = f"{self.textfile}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(self.metrics.render())
+            os.replace(temp_path, self.textfile)
+        except OSError as e:
+            logger.error(f"Error writing metrics textfile {self.textfile}: {e}")
+
+    def stop(self):
+        """Stop publishing, after a final textfile update."""
+        self._stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self.textfile:
+            self.write_textfile()
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value (integers without a decimal point)."""
+    return str(int(value)) if float(value).is_integer() else f"{value:.6g}"
+
+
+def _format_duration(seconds: float) -> str:
+    """Format a duration with a unit suited to its size."""
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.0f}us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.3g}ms"
+    return f"{seconds:.3g}s"
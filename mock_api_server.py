@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Mock api-condutores Server
+Local stand-in for the POST /biometric-data/<numero_carta> endpoint and the
+bulk POST /biometric-data/batch endpoint, with configurable latency and error
+rate, for benchmarks and offline testing.
+
+Usage:
+    python mock_api_server.py --port 5000 --latency 0.05 --error-rate 0.02
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Biometric fields accepted by the real endpoint
+API_FIELDS = ('fileFace', 'fileSign', 'filesFinger1', 'filesFinger2')
+
+UPLOAD_PATH = re.compile(r'^/biometric-data/([^/?]+)$')
+BATCH_PATH = '/biometric-data/batch'
+MULTIPART_FIELD = re.compile(rb'Content-Disposition: form-data; name="([^"]+)"')
+
+
+class MockAPIServer:
+    """
+    Threaded HTTP server imitating api-condutores.
+
+    Each upload sleeps for latency seconds (plus up to jitter seconds) and
+    then fails with error_status for a share error_rate of the requests, or
+    answers 201 Created listing the biometric fields it received. A bulk
+    request takes the same latency and error rate as one upload and answers
+    200 with one such response per driver. GET /stats returns the request
+    counters as JSON.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, error_status: int = 503,
+                 retry_after: Optional[int] = None, seed: Optional[int] = None):
+        """
+        Initialize the server (it is not listening until start()).
+
+        Args:
+            host: Address to bind (default: 127.0.0.1)
+            port: Port to bind (default: 0, a free port)
+            latency: Seconds each upload takes
+            jitter: Extra random latency of up to this many seconds
+            error_rate: Share of uploads answered with error_status (0.0 - 1.0)
+            error_status: HTTP status of failed uploads (default: 503)
+            retry_after: Optional Retry-After seconds sent with failed uploads
+            seed: Optional random seed, for reproducible failures
+        """
+        self.host = host
+        self.port = port
+        self.latency = max(0.0, latency)
+        self.jitter = max(0.0, jitter)
+        self.error_rate = min(1.0, max(0.0, error_rate))
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.stats = {'requests': 0, 'drivers': 0, 'bytes_received': 0, 'in_flight': 0,
+                      'max_in_flight': 0, 'status_codes': {}}
+        self.server = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """Base URL of the running server."""
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> 'MockAPIServer':
+        """
+        Start serving in a background thread.
+
+        Returns:
+            The server itself
+        """
+        self.server = ThreadingHTTPServer((self.host, self.port), self._handler_class())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, name='mock-api', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self._thread.join()
+            self.server = None
+
+    def __enter__(self) -> 'MockAPIServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def get_stats(self) -> Dict:
+        """
+        Get the request counters.
+
+        Returns:
+            Dictionary with requests, drivers received, bytes_received,
+            in_flight, max_in_flight and a count per status code
+        """
+        with self._lock:
+            return {**self.stats, 'status_codes': dict(self.stats['status_codes'])}
+
+    def handle_upload(self, numero_carta: str, content_type: str, body: bytes) -> Tuple[int, Dict]:
+        """
+        Produce the response to one upload.
+
+        Args:
+            numero_carta: License number from the URL
+            content_type: Request Content-Type
+            body: Request body
+
+        Returns:
+            Tuple (status code, response dictionary)
+        """
+        if self._simulate_request():
+            return self.error_status, {'message': 'Mock server error'}
+
+        self._count_drivers(1)
+        return driver_response(numero_carta, received_fields(content_type, body))
+
+    def handle_batch(self, body: bytes) -> Tuple[int, Dict]:
+        """
+        Produce the response to one bulk upload.
+
+        Args:
+            body: Request body {"drivers": [{"numero_carta": ..., "fileFace": ..., ...}, ...]}
+
+        Returns:
+            Tuple (status code, response dictionary); on success the response
+            holds 'results', one entry per driver in request order with its
+            numero_carta, status_code and single-upload response
+        """
+        if self._simulate_request():
+            return self.error_status, {'message': 'Mock server error'}
+
+        try:
+            drivers = json.loads(body or b'{}').get('drivers')
+        except (ValueError, AttributeError):
+            drivers = None
+        if not isinstance(drivers, list):
+            return 400, {'message': 'Expected a JSON object with a drivers list'}
+
+        results = []
+        for driver in drivers:
+            if not isinstance(driver, dict):
+                driver = {}
+            status_code, response = driver_response(
+                str(driver.get('numero_carta', '')), [field for field in API_FIELDS if driver.get(field)])
+            results.append({**response, 'numero_carta': driver.get('numero_carta'), 'status_code': status_code})
+        self._count_drivers(len(drivers))
+        return 200, {'results': results}
+
+    def _simulate_request(self) -> bool:
+        """Sleep for the configured latency and decide whether the request fails."""
+        with self._lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            failed = self.random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        return failed
+
+    def _count_drivers(self, count: int):
+        with self._lock:
+            self.stats['drivers'] += count
+
+    def _count(self, status_code: int, size: int):
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['bytes_received'] += size
+            codes = self.stats['status_codes']
+            codes[str(status_code)] = codes.get(str(status_code), 0) + 1
+
+    def _track_in_flight(self, delta: int):
+        with self._lock:
+            self.stats['in_flight'] += delta
+            self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, like the real API behind its reverse proxy
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately; without TCP_NODELAY the
+            # body waits for the client's delayed ACK (~40 ms per request)
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                match = UPLOAD_PATH.match(self.path)
+                if not match:
+                    status_code, response = 404, {'message': 'Not found'}
+                else:
+                    mock._track_in_flight(1)
+                    try:
+                        if self.path == BATCH_PATH:
+                            status_code, response = mock.handle_batch(body)
+                        else:
+                            status_code, response = mock.handle_upload(
+                                match.group(1), self.headers.get('Content-Type', ''), body)
+                    finally:
+                        mock._track_in_flight(-1)
+                mock._count(status_code, len(body))
+                self._reply(status_code, response)
+
+            def do_GET(self):
+                if self.path == '/stats':
+                    self._reply(200, mock.get_stats())
+                else:
+                    self._reply(404, {'message': 'Not found'})
+
+            def _reply(self, status_code, response):
+                out = json.dumps(response).encode('utf-8')
+                self.send_response(status_code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(out)))
+                if status_code == mock.error_status and mock.retry_after is not None:
+                    self.send_header('Retry-After', str(mock.retry_after))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def driver_response(numero_carta: str, fields: List[str]) -> Tuple[int, Dict]:
+    """
+    Build the single-upload response for the biometric fields received for a driver.
+
+    Args:
+        numero_carta: Driver's license number
+        fields: API field names received
+
+    Returns:
+        Tuple (status code, response dictionary): 201 listing the created
+        files, or 400 if no field was received
+    """
+    if not fields:
+        return 400, {'status': {'message': 'No new biometric data provided'}}
+    return 201, {'numero_carta': numero_carta,
+                 'status': {'files_created': fields, 'files_updated': []}}
+
+
+def received_fields(content_type: str, body: bytes) -> List[str]:
+    """
+    List the non-empty biometric fields of an upload body.
+
+    Args:
+        content_type: Request Content-Type (JSON or multipart/form-data)
+        body: Request body
+
+    Returns:
+        API field names present in the body
+    """
+    if content_type.startswith('multipart/form-data'):
+        names = [name.decode('ascii', 'replace') for name in MULTIPART_FIELD.findall(body)]
+        return [name for name in names if name in API_FIELDS]
+
+    try:
+        payload = json.loads(body or b'{}')
+    except ValueError:
+        return []
+    if not isinstance(payload, dict):
+        return []
+    return [field for field in API_FIELDS if payload.get(field)]
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description='Run a local mock of the api-condutores biometric upload endpoint',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # 50 ms per upload, 2%% of uploads fail with 503
+  python mock_api_server.py --port 5000 --latency 0.05 --error-rate 0.02
+
+  # Then upload to it
+  python csv_api_sender.py data.csv http://127.0.0.1:5000
+
+  # Or through the bulk endpoint, 100 drivers per request
+  python csv_api_sender.py data.csv http://127.0.0.1:5000 --transport batch --batch-size 100
+        """
+    )
+    parser.add_argument('--host', default='127.0.0.1', help='Address to bind (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=5000, help='Port to bind (default: 5000)')
+    parser.add_argument('--latency', type=float, default=0.0, metavar='SECONDS',
+                        help='Seconds each upload takes (default: 0)')
+    parser.add_argument('--jitter', type=float, default=0.0, metavar='SECONDS',
+                        help='Extra random latency of up to SECONDS per upload (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0, metavar='RATE',
+                        help='Share of uploads that fail, between 0 and 1 (default: 0)')
+    parser.add_argument('--error-status', type=int, default=503, metavar='CODE',
+                        help='HTTP status of failed uploads (default: 503)')
+    parser.add_argument('--retry-after', type=int, metavar='SECONDS',
+                        help='Send Retry-After with failed uploads')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible failures')
+
+    args = parser.parse_args()
+
+    if not 0.0 <= args.error_rate <= 1.0:
+        parser.error('--error-rate must be between 0 and 1')
+
+    server = MockAPIServer(args.host, args.port, args.latency, args.jitter, args.error_rate,
+                           args.error_status, args.retry_after, args.seed)
+    try:
+        server.start()
+    except OSError as e:
+        logger.error(f"Cannot listen on {args.host}:{args.port}: {e}")
+        sys.exit(1)
+
+    logger.info(f"Mock api-condutores listening on {server.url} "
+                f"(latency {args.latency}s, error rate {args.error_rate:.0%})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        logger.info(f"Stopped after {server.get_stats()['requests']} request(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Prefetching Reader Stage
+Builds payloads for the next drivers in background reader threads while the
+sender stage uploads the current ones, so disk (or network share) reads and
+API requests overlap instead of taking turns.
+"""
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+
+class PrefetchQueue:
+    """
+    Bounded read-ahead over an iterable of drivers.
+
+    Up to depth drivers beyond the one being consumed are handed to the
+    reader pool. Iterating yields (item, future) pairs in input order; the
+    future resolves to prepare(*item), or None for items that were not
+    prefetched. Occupancy (how many read-ahead payloads are ready when the
+    sender takes the next driver) is sampled on every step for get_stats().
+    """
+
+    def __init__(self, items: Iterable[Tuple], prepare: Callable[..., Optional[Dict]],
+                 depth: int = 4, workers: int = 2):
+        """
+        Initialize the queue (reading starts when iteration starts).
+
+        Args:
+            items: Iterable of argument tuples, e.g. (numero_carta, rows)
+            prepare: Reader function called with each item's arguments in a reader thread
+            depth: Number of drivers read ahead (queue capacity)
+            workers: Number of reader threads
+        """
+        self.items = iter(items)
+        self.prepare = prepare
+        self.depth = max(1, depth)
+        self.workers = max(1, workers)
+        self.samples = 0
+        self.ready_total = 0
+        self.full = 0
+        self.stalls = 0
+        self.ready = 0
+
+    def __iter__(self) -> Iterator[Tuple[Tuple, Future]]:
+        queue = deque()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='prefetch') as executor:
+            def fill():
+                # The driver being sent plus depth drivers read ahead
+                while len(queue) <= self.depth:
+                    try:
+                        item = next(self.items)
+                    except StopIteration:
+                        return
+                    queue.append((item, executor.submit(self.prepare, *item)))
+
+            try:
+                fill()
+                while queue:
+                    item, future = queue.popleft()
+                    ready = self.ready = sum(1 for _, queued in queue if queued.done())
+                    self.samples += 1
+                    self.ready_total += ready
+                    if ready >= self.depth:
+                        self.full += 1
+                    if not future.done():
+                        self.stalls += 1
+                    fill()
+                    yield item, future
+            finally:
+                for _, future in queue:
+                    future.cancel()
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Get queue occupancy statistics.
+
+        Returns:
+            Dictionary with the queue depth, average number of payloads ready
+            ahead of the sender, share of steps with the queue full (the sender
+            is the bottleneck) and number of stalls where the sender had to
+            wait for the reader (the disk is the bottleneck)
+        """
+        return {
+            'depth': self.depth,
+            'readers': self.workers,
+            'avg_ready': self.ready_total / self.samples if self.samples else 0.0,
+            'full_ratio': self.full / self.samples if self.samples else 0.0,
+            'stalls': self.stalls
+        }
@@ -90,6 +90,7 @@ def get_html_template():
     .success .number { color: #28a745; }
     .failed .number { color: #c82333; }
     .skipped .number { color: #ffc107; }
+    .not_attempted .number { color: #6c757d; }
     
     .details {
         padding: 30px;
@@ -141,6 +142,7 @@ def get_html_template():
     .record.success { border-left-color: #28a745; }
     .record.failed { border-left-color: #c82333; }
     .record.skipped { border-left-color: #ffc107; }
+    .record.not_attempted { border-left-color: #6c757d; }
     
     .record-header {
         display: flex;
@@ -166,6 +168,7 @@ def get_html_template():
     .badge.success { background: #d4edda; color: #155724; }
     .badge.failed { background: #f8d7da; color: #721c24; }
     .badge.skipped { background: #fff3cd; color: #856404; }
+    .badge.not_attempted { background: #e2e3e5; color: #383d41; }
     
     .record-details {
         color: #444;
@@ -257,6 +260,10 @@ def get_html_template():
                 <div class="number">{{{{skipped}}}}</div>
                 <div class="label">Skipped</div>
             </div>
+            <div class="summary-card not_attempted">
+                <div class="number">{{{{not_attempted}}}}</div>
+                <div class="label">Not Attempted</div>
+            </div>
         </div>
 
         <div class="details">
@@ -267,6 +274,7 @@ def get_html_template():
                 <button class="filter-btn" onclick="filterRecords('success')">✓ Success</button>
                 <button class="filter-btn" onclick="filterRecords('failed')">✗ Failed</button>
                 <button class="filter-btn" onclick="filterRecords('skipped')">⊘ Skipped</button>
+                <button class="filter-btn" onclick="filterRecords('not_attempted')">◌ Not Attempted</button>
             </div>
 
             <div id="records">
@@ -376,6 +384,7 @@ def generate_html_report(json_data):
     html = html.replace('{{success}}', str(json_data.get('success', 0)))
     html = html.replace('{{failed}}', str(json_data.get('failed', 0)))
     html = html.replace('{{skipped}}', str(json_data.get('skipped', 0)))
+    html = html.replace('{{not_attempted}}', str(json_data.get('not_attempted', 0)))
     html = html.replace('{{records_html}}', records_html)
     html = html.replace('{{processing_info}}', "See details above")
 
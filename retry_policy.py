@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Retry Policy
+Decides which failed uploads are retried and how long to wait before each
+attempt: exponential backoff with full jitter, per-status retryability and
+the server's Retry-After header.
+"""
+
+import time
+import random
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, Optional
+
+# HTTP statuses that usually clear up on their own
+DEFAULT_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header.
+
+    Args:
+        value: Header value, either delay-seconds or an HTTP date
+
+    Returns:
+        Seconds to wait (never negative), or None if absent or unparseable
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """
+    Retry policy for driver uploads.
+
+    A result is retried when its HTTP status is in retry_statuses, or when no
+    response was received at all (timeout or connection error) and
+    retry_on_connection_error is set. Client errors such as 400 and 404 are
+    never retried.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 30.0,
+                 retry_statuses: Iterable[int] = DEFAULT_RETRY_STATUSES,
+                 retry_on_connection_error: bool = True):
+        """
+        Initialize the policy.
+
+        Args:
+            max_attempts: Total attempts per driver, including the first (1 disables retries)
+            base_delay: Backoff ceiling in seconds before the second attempt; doubles every attempt
+            max_delay: Upper bound of the backoff ceiling in seconds
+            retry_statuses: HTTP status codes that are retried
+            retry_on_connection_error: Retry timeouts and connection errors (default: True)
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = max(0.0, base_delay)
+        self.max_delay = max(self.base_delay, max_delay)
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_on_connection_error = retry_on_connection_error
+
+    def should_retry(self, result: Dict, attempt: int) -> bool:
+        """
+        Check whether a result is worth another attempt.
+
+        Args:
+            result: Result dictionary of the attempt
+            attempt: Number of the attempt that produced result (1-based)
+
+        Returns:
+            True if the driver should be sent again
+        """
+        if attempt >= self.max_attempts or result.get('status') == 'success':
+            return False
+
+        status_code = result.get('status_code')
+        if status_code is not None:
+            return status_code in self.retry_statuses
+        return self.retry_on_connection_error and result.get('transient', False)
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Seconds to wait before the next attempt.
+
+        Uses "full jitter": a random delay between 0 and base_delay * 2^(attempt - 1)
+        (capped at max_delay), so drivers that failed together do not all come
+        back at the same moment. A Retry-After sent by the server is honoured as
+        a minimum.
+
+        Args:
+            attempt: Number of the attempt that just failed (1-based)
+            retry_after: Seconds from the server's Retry-After header, if any
+
+        Returns:
+            Delay in seconds
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
@@ -0,0 +1,112 @@
+"""Tests for the batch transport: upload_batch against a running MockAPIServer."""
+
+import pytest
+
+from csv_api_sender import BiometricAPIProcessor
+from mock_api_server import MockAPIServer
+
+LICENSES = ['101', '102', '103']
+
+
+@pytest.fixture
+def server():
+    with MockAPIServer() as server:
+        yield server
+
+
+@pytest.fixture
+def biometric_dir(tmp_path):
+    for numero_carta in LICENSES:
+        (tmp_path / f'{numero_carta}.face.jpg').write_bytes(b'face ' + numero_carta.encode('ascii'))
+        (tmp_path / f'{numero_carta}.assinatura.png').write_bytes(b'sign ' + numero_carta.encode('ascii'))
+    return tmp_path
+
+
+def upload(server, biometric_dir):
+    processor = BiometricAPIProcessor(api_base_url=server.url, biometric_dir=str(biometric_dir), transport='batch')
+    try:
+        return processor.upload_batch([(numero_carta, [{'Numero_Carta': numero_carta}], None)
+                                       for numero_carta in LICENSES])
+    finally:
+        processor.close()
+
+
+def rewrite_results(server, rewrite):
+    """Pass the results list of every successful bulk response through rewrite."""
+    handle_batch = server.handle_batch
+
+    def rewritten(body):
+        status_code, response = handle_batch(body)
+        if status_code == 200:
+            response['results'] = rewrite(response['results'])
+        return status_code, response
+
+    server.handle_batch = rewritten
+
+
+def test_all_drivers_succeed(server, biometric_dir):
+    results = upload(server, biometric_dir)
+
+    assert [result['status'] for result in results] == ['success'] * 3
+    assert [result['status_code'] for result in results] == [201] * 3
+    assert [result['response']['numero_carta'] for result in results] == LICENSES
+    for result in results:
+        assert sorted(result['response']['status']['files_created']) == ['fileFace', 'fileSign']
+    # One request for the three drivers, shared by their results
+    stats = server.get_stats()
+    assert (stats['requests'], stats['drivers']) == (1, 3)
+    assert results[0]['batch_request'] is results[2]['batch_request']
+    assert results[0]['batch_request']['status_code'] == 200
+
+
+def test_one_driver_fails(server, biometric_dir):
+    def fail_second(entries):
+        entries[1] = {'numero_carta': entries[1]['numero_carta'], 'status_code': 500, 'message': 'Boom'}
+        return entries
+
+    rewrite_results(server, fail_second)
+    results = upload(server, biometric_dir)
+
+    assert [result['status'] for result in results] == ['success', 'server_error', 'success']
+    assert results[1]['status_code'] == 500
+    # The request itself went through
+    assert results[1]['batch_request']['status'] == 'success'
+
+
+def test_driver_missing_from_response(server, biometric_dir):
+    rewrite_results(server, lambda entries: [entry for entry in entries if entry['numero_carta'] != '103'])
+
+    results = upload(server, biometric_dir)
+
+    assert [result['status'] for result in results] == ['success', 'success', 'error']
+    assert results[2]['error'] == 'Driver missing from batch response'
+
+
+def test_response_entries_out_of_order(server, biometric_dir):
+    rewrite_results(server, lambda entries: entries[::-1])
+
+    results = upload(server, biometric_dir)
+
+    assert [result['response']['numero_carta'] for result in results] == LICENSES
+
+
+def test_failed_request_fails_every_driver(server, biometric_dir):
+    server.error_rate = 1.0
+    server.error_status = 500
+
+    results = upload(server, biometric_dir)
+
+    assert [result['status'] for result in results] == ['server_error'] * 3
+    assert [result['status_code'] for result in results] == [500] * 3
+    assert server.get_stats()['requests'] == 1
+    # The failure counts once for the circuit breaker
+    assert len(BiometricAPIProcessor.request_results(results)) == 1
+
+
+def test_unreachable_api_fails_every_driver(server, biometric_dir):
+    server.stop()
+
+    results = upload(server, biometric_dir)
+
+    assert [result['status'] for result in results] == ['error'] * 3
+    assert all(result.get('transient') for result in results)
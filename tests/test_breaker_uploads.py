@@ -0,0 +1,106 @@
+"""Tests for the circuit breaker in process_drivers: drivers count once, after their retries."""
+
+import asyncio
+import threading
+
+import pytest
+
+from async_processor import AIOHTTP_AVAILABLE, AsyncBiometricAPIProcessor
+from csv_api_sender import BiometricAPIProcessor
+from flow_control import CircuitBreaker
+from retry_policy import RetryPolicy
+
+SUCCESS = {'status': 'success', 'status_code': 201, 'response': {'status': {}}}
+NOT_FOUND = {'status': 'config_error', 'status_code': 404, 'error': 'Not found'}
+TIMEOUT = {'status': 'error', 'status_code': None, 'transient': True, 'error': 'Timeout'}
+
+PROCESSORS = [
+    BiometricAPIProcessor,
+    pytest.param(AsyncBiometricAPIProcessor,
+                 marks=pytest.mark.skipif(not AIOHTTP_AVAILABLE, reason='aiohttp not installed')),
+]
+
+
+def empty_results():
+    return {'total_csv_rows': 0, 'total_drivers': 0, 'success': 0, 'failed': 0,
+            'skipped': 0, 'not_attempted': 0, 'details': []}
+
+
+def run(processor_class, answers, threshold=2, concurrency=1):
+    """
+    Upload drivers '1'..'n' whose attempts get the given answers.
+
+    Args:
+        processor_class: BiometricAPIProcessor or AsyncBiometricAPIProcessor
+        answers: Dictionary mapping license numbers to their results per attempt
+                 (the last one repeats; missing licenses succeed)
+
+    Returns:
+        Tuple (results summary, attempts per license number, breaker)
+    """
+    breaker = CircuitBreaker(threshold=threshold)
+    processor = processor_class(api_base_url='http://127.0.0.1:1', biometric_dir=None,
+                                retry_policy=RetryPolicy(max_attempts=3, base_delay=0.0),
+                                circuit_breaker=breaker)
+    attempts = {}
+    lock = threading.Lock()
+
+    def answer(numero_carta):
+        with lock:
+            attempt = attempts[numero_carta] = attempts.get(numero_carta, 0) + 1
+        results = answers.get(numero_carta, [SUCCESS])
+        return dict(results[min(attempt, len(results)) - 1])
+
+    async def upload_driver_async(numero_carta, rows, prefetched=None):
+        await asyncio.sleep(0)
+        return answer(numero_carta)
+
+    processor.upload_driver = lambda numero_carta, rows, prefetched=None: answer(numero_carta)
+    processor.upload_driver_async = upload_driver_async
+    drivers = [(str(n), [{'Numero_Carta': str(n)}]) for n in range(1, 11)]
+    results = empty_results()
+    try:
+        processor.process_drivers(iter(drivers), len(drivers), results, concurrency)
+    finally:
+        processor.close()
+    return results, attempts, breaker
+
+
+@pytest.mark.parametrize('processor_class', PROCESSORS)
+def test_retries_of_one_driver_do_not_open_the_breaker(processor_class):
+    # Driver 3 times out twice before going through, driver 4 gets a 404: a
+    # blip, not two consecutive failed drivers
+    results, attempts, breaker = run(processor_class, {'3': [TIMEOUT, TIMEOUT, SUCCESS], '4': [NOT_FOUND]})
+
+    assert breaker.state == 'closed'
+    assert breaker.trips == 0
+    assert results['not_attempted'] == 0
+    assert (results['success'], results['failed']) == (9, 1)
+    assert attempts['3'] == 3
+
+
+@pytest.mark.parametrize('processor_class', PROCESSORS)
+def test_driver_failing_every_retry_counts_once(processor_class):
+    # Three failed attempts of one driver used to open a breaker with threshold 2
+    results, attempts, breaker = run(processor_class, {'3': [TIMEOUT]})
+
+    assert breaker.trips == 0
+    assert attempts['3'] == 3
+    assert (results['success'], results['failed'], results['not_attempted']) == (9, 1, 0)
+
+
+@pytest.mark.parametrize('processor_class', PROCESSORS)
+def test_consecutive_failed_drivers_open_the_breaker(processor_class):
+    answers = {str(n): [TIMEOUT] for n in range(1, 11)}
+
+    results, attempts, breaker = run(processor_class, answers, threshold=2)
+
+    assert breaker.trips == 1
+    assert breaker.gave_up
+    # Only the two drivers that opened it used all their retries: drivers
+    # already in flight stop retrying and the rest are not attempted
+    assert attempts['1'] == attempts['2'] == 3
+    assert all(count < 3 for numero_carta, count in attempts.items() if numero_carta not in ('1', '2'))
+    assert results['failed'] == len(attempts)
+    assert results['failed'] + results['not_attempted'] == 10
+    assert results['not_attempted'] >= 5
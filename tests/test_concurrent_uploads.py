@@ -0,0 +1,97 @@
+"""Tests for concurrent uploads: process_drivers reports like a sequential run."""
+
+import random
+import threading
+import time
+
+import pytest
+
+from csv_api_sender import BiometricAPIProcessor
+from retry_policy import RetryPolicy
+
+LICENSES = [str(100 + n) for n in range(40)]
+
+
+def empty_results():
+    return {'total_csv_rows': 0, 'total_drivers': 0, 'success': 0, 'failed': 0,
+            'skipped': 0, 'not_attempted': 0, 'details': []}
+
+
+@pytest.fixture
+def biometric_dir(tmp_path):
+    # Licenses ending in 9 have no files
+    for numero_carta in LICENSES:
+        if not numero_carta.endswith('9'):
+            (tmp_path / f'{numero_carta}.face.jpg').write_bytes(numero_carta.encode('ascii'))
+    return tmp_path
+
+
+def stub_send_to_api(processor, seed):
+    """send_to_api replacement answering after a random delay, by license number."""
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    attempts = {}
+    calls = []
+
+    def send_to_api(numero_carta, payload, timings=None):
+        with lock:
+            delay = rng.uniform(0, 0.01)
+            attempts[numero_carta] = attempts.get(numero_carta, 0) + 1
+            calls.append(numero_carta)
+        time.sleep(delay)
+        if numero_carta.endswith('3'):
+            return {'status': 'skipped', 'status_code': 400, 'error': 'No new biometric data'}
+        if numero_carta.endswith('7'):
+            return {'status': 'server_error', 'status_code': 500, 'error': 'Boom'}
+        # Licenses ending in 5 fail once with 503, then go through on retry
+        if numero_carta.endswith('5') and attempts[numero_carta] == 1:
+            return {'status': 'error', 'status_code': 503, 'error': 'Unavailable', 'transient': True}
+        return {'status': 'success', 'status_code': 201,
+                'response': {'status': {'files_created': list(payload)}}}
+
+    processor.send_to_api = send_to_api
+    return calls
+
+
+def run(biometric_dir, concurrency, seed):
+    processor = BiometricAPIProcessor(api_base_url='http://127.0.0.1:1', biometric_dir=str(biometric_dir),
+                                      retry_policy=RetryPolicy(max_attempts=2, base_delay=0.0))
+    calls = stub_send_to_api(processor, seed)
+    drivers = [(numero_carta, [{'Numero_Carta': numero_carta}] * (int(numero_carta) % 3 + 1))
+               for numero_carta in LICENSES]
+    drivers.insert(10, (None, [{'Numero_Carta': ''}]))
+    results = empty_results()
+    try:
+        processed = processor.process_drivers(iter(drivers), len(drivers), results, concurrency)
+    finally:
+        processor.close()
+    for detail in results['details']:
+        detail.pop('timings_ms', None)
+    return processed, results, calls
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_concurrent_results_match_sequential_run(biometric_dir, seed):
+    sequential = run(biometric_dir, 1, seed)
+    concurrent = run(biometric_dir, 8, seed)
+
+    assert concurrent[0] == sequential[0] == 41
+    assert concurrent[1] == sequential[1]
+    results = concurrent[1]
+    assert [detail['driver'] for detail in results['details']] == list(range(1, 42))
+    assert (results['success'], results['failed'], results['skipped']) == (28, 4, 9)
+    # Every driver with files was sent once, plus one retry per 503 and 500
+    assert sorted(concurrent[2]) == sorted(sequential[2])
+    assert len(concurrent[2]) == 36 + 4 + 4
+
+
+def test_concurrent_uploads_overlap(biometric_dir):
+    # Sanity check that the concurrent run is not sequential in disguise
+    started = time.perf_counter()
+    run(biometric_dir, 1, seed=0)
+    sequential = time.perf_counter() - started
+    started = time.perf_counter()
+    run(biometric_dir, 8, seed=0)
+    concurrent = time.perf_counter() - started
+
+    assert concurrent < sequential
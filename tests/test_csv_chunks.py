@@ -0,0 +1,178 @@
+"""Tests for csv_chunks: license column parsing and chunked parsing against the serial baseline."""
+
+import bz2
+import csv
+import gzip
+import io
+import lzma
+from collections import Counter
+
+import pytest
+
+import csv_chunks
+from csv_api_sender import BiometricAPIProcessor
+from csv_chunks import (ChunkBoundaryError, detect_compression, find_chunk_boundaries, iter_chunk_counts,
+                        iter_license_column, open_csv, plan_chunks)
+
+
+def dictreader_licenses(text):
+    """License numbers as BiometricAPIProcessor.iter_csv rows would give them."""
+    licenses = []
+    for row in csv.DictReader(io.StringIO(text, newline='')):
+        if not any(row.values()):
+            continue
+        licenses.append((row.get('Numero_Carta') or '').strip())
+    return licenses
+
+
+def license_column(text):
+    return list(iter_license_column(io.StringIO(text, newline=None)))
+
+
+def test_matches_dictreader_with_quotes_and_short_rows():
+    text = ('id,Numero_Carta,nome\n'
+            '1,111,a\n'
+            '2," 222 ","multi\nline"\n'
+            '3\n'
+            ',,\n'
+            '4,,b\n'
+            '5,555,c,extra\n')
+    assert license_column(text) == dictreader_licenses(text) == ['111', '222', '', '', '555']
+
+
+def test_missing_license_column_never_reads_extra_fields():
+    text = 'Nome,Apelido\nJoao,Silva,123\nMaria,Santos\n,\n'
+    assert license_column(text) == dictreader_licenses(text) == ['', '']
+
+
+def test_missing_license_column_with_quoted_extra_field():
+    text = 'Nome,Apelido\n"Joao",Silva,"123"\n'
+    assert license_column(text) == dictreader_licenses(text) == ['']
+
+
+def write_csv(path, rows=300):
+    """CSV with quoted, multi-line and doubled-quote fields between plain rows."""
+    lines = ['id,Numero_Carta,nome\n']
+    for i in range(rows):
+        if i % 7 == 0:
+            lines.append(f'{i},"{1000 + i % 40}","linha\ncom ""aspas"" {i}"\n')
+        elif i % 11 == 0:
+            lines.append(f'{i},,sem carta\n')
+        else:
+            lines.append(f'{i},{1000 + i % 40},nome {i}\n')
+    path.write_text(''.join(lines), encoding='utf-8', newline='')
+    return path
+
+
+def serial_counts(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return Counter(iter_license_column(f))
+
+
+def merged(parts):
+    counts = Counter()
+    for part in parts:
+        counts.update(part)
+    return counts
+
+
+def test_chunk_boundaries_fall_between_records(tmp_path):
+    path = write_csv(tmp_path / 'data.csv')
+    data = path.read_bytes()
+    boundaries = find_chunk_boundaries(str(path), 200)
+
+    assert boundaries[0] == data.index(b'\n') + 1
+    assert boundaries[-1] == len(data)
+    assert len(boundaries) > 10
+    assert all(data[boundary - 1:boundary] == b'\n' for boundary in boundaries)
+
+    # Parsing the chunks one by one gives the records of the whole file
+    chunked = []
+    for start, end in zip(boundaries, boundaries[1:]):
+        chunked.extend(csv.reader(io.StringIO(data[start:end].decode('utf-8'), newline='')))
+    assert chunked == list(csv.reader(io.StringIO(data.decode('utf-8'), newline='')))[1:]
+
+
+def test_chunk_counts_match_serial_counts(tmp_path):
+    path = write_csv(tmp_path / 'data.csv')
+    header, chunks = plan_chunks(str(path), workers=2, chunk_size=500)
+
+    assert header == ['id', 'Numero_Carta', 'nome']
+    assert len(chunks) > 2
+    parallel = merged(iter_chunk_counts(str(path), header, chunks, workers=2))
+    serial = serial_counts(path)
+    assert list(parallel.items()) == list(serial.items())
+    assert sum(serial.values()) == 300
+
+
+def test_plan_chunks_skips_small_and_compressed_files(tmp_path):
+    small = tmp_path / 'small.csv'
+    small.write_text('id,Numero_Carta\n1,111\n', encoding='utf-8')
+    assert plan_chunks(str(small), workers=2, chunk_size=1) is None
+
+    compressed = tmp_path / 'data.csv.gz'
+    compressed.write_bytes(gzip.compress(write_csv(tmp_path / 'data.csv').read_bytes()))
+    assert plan_chunks(str(compressed), workers=2, chunk_size=100) is None
+
+
+@pytest.mark.parametrize('compression, compress', [
+    ('gzip', gzip.compress),
+    ('bz2', bz2.compress),
+    ('xz', lzma.compress),
+])
+def test_compressed_csv_reads_like_the_plain_file(tmp_path, compression, compress):
+    plain = write_csv(tmp_path / 'data.csv')
+    # The suffix does not matter, the content is sniffed
+    compressed = tmp_path / 'export.csv'
+    compressed.write_bytes(compress(plain.read_bytes()))
+    processor = BiometricAPIProcessor(api_base_url='http://127.0.0.1:1', biometric_dir=None)
+
+    assert detect_compression(str(compressed)) == compression
+    assert detect_compression(str(plain)) is None
+    with open_csv(str(compressed)) as f:
+        assert f.read() == plain.read_text(encoding='utf-8')
+    assert list(processor.iter_csv(str(compressed))) == list(processor.iter_csv(str(plain)))
+    assert list(processor.iter_csv_licenses(str(compressed))) == list(processor.iter_csv_licenses(str(plain)))
+
+
+def misleading_csv(path):
+    # The quote inside an unquoted field flips the quote parity, so the
+    # newline inside the following quoted field is taken for a boundary
+    path.write_text('id,Numero_Carta,nome\n'
+                    '1,111,O"Brien\n'
+                    '2,222,"multi\nline"\n'
+                    '3,111,c\n', encoding='utf-8', newline='')
+    return path
+
+
+def test_misplaced_boundary_raises(tmp_path):
+    path = misleading_csv(tmp_path / 'data.csv')
+    header, chunks = plan_chunks(str(path), workers=2, chunk_size=1)
+
+    with pytest.raises(ChunkBoundaryError):
+        list(iter_chunk_counts(str(path), header, chunks, workers=2))
+
+
+def test_read_license_groups_falls_back_to_serial_parsing(tmp_path, monkeypatch, caplog):
+    path = misleading_csv(tmp_path / 'data.csv')
+    monkeypatch.setattr('csv_api_sender.PARALLEL_MIN_SIZE', 0)
+    monkeypatch.setattr(csv_chunks, 'MIN_CHUNK_SIZE', 1)
+    processor = BiometricAPIProcessor(api_base_url='http://127.0.0.1:1', biometric_dir=None,
+                                      parse_workers=2)
+
+    groups, row_count = processor.read_license_groups(str(path))
+
+    assert 'serially' in caplog.text
+    assert row_count == 3
+    assert [(numero_carta, len(rows)) for numero_carta, rows in groups.items()] == [('111', 2), ('222', 1)]
+
+
+def test_serial_slices_merge_to_the_whole_file(tmp_path):
+    path = write_csv(tmp_path / 'data.csv')
+    processor = BiometricAPIProcessor(api_base_url='http://127.0.0.1:1', biometric_dir=None)
+    processor.COUNT_SLICE_ROWS = 25
+
+    parts = list(processor.iter_license_counts(str(path)))
+
+    assert len(parts) == 12
+    assert list(merged(parts).items()) == list(serial_counts(path).items())
@@ -0,0 +1,188 @@
+"""Tests for external_grouping: spilled groups against in-memory grouping."""
+
+from collections import Counter
+
+import pytest
+
+import external_grouping
+from csv_api_sender import BiometricAPIProcessor
+from external_grouping import CompactRow, LicenseGrouper, LicenseRows, SpilledGroups
+
+
+def sample_rows(count=200):
+    return [{'id': str(i), 'Numero_Carta': str(5000 + (i * 7) % 30)} for i in range(count)]
+
+
+def group_rows(rows, **kwargs):
+    grouper = LicenseGrouper(max_memory=None, **kwargs)
+    for row in rows:
+        grouper.add(row['Numero_Carta'], row)
+    return grouper, grouper.finish()
+
+
+def test_spilled_rows_match_in_memory_groups(tmp_path):
+    rows = sample_rows()
+    _, in_memory = group_rows(rows, max_rows=None)
+    grouper, spilled = group_rows(rows, max_rows=10, partitions=4, spill_dir=str(tmp_path))
+
+    assert isinstance(in_memory, dict)
+    assert isinstance(spilled, SpilledGroups)
+    assert grouper.rows == 200
+    with spilled:
+        assert len(spilled) == len(in_memory) == 30
+        assert bool(spilled)
+        assert list(spilled) == list(in_memory)
+        assert list(spilled.items()) == list(in_memory.items())
+        # The view can be read more than once
+        assert list(spilled.keys()) == list(in_memory)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spilled_counts_match_in_memory_groups(tmp_path):
+    rows = sample_rows()
+    parts = [Counter(row['Numero_Carta'] for row in rows[start:start + 25]) for start in range(0, 200, 25)]
+
+    in_memory = LicenseGrouper(BiometricAPIProcessor.projected_rows, max_rows=None, max_memory=None)
+    spilling = LicenseGrouper(BiometricAPIProcessor.projected_rows, max_rows=60, max_memory=None,
+                              partitions=3, spill_dir=str(tmp_path))
+    for counts in parts:
+        in_memory.add_counts(Counter(counts))
+        spilling.add_counts(Counter(counts))
+    assert not in_memory.spilled
+    assert spilling.spilled
+    expected = in_memory.finish()
+    spilled = spilling.finish()
+
+    try:
+        assert list(spilled.items()) == list(expected.items())
+        assert sum(len(group) for _, group in spilled.items()) == 200
+        # Projected rows compare equal to the rows DictReader grouping would hold
+        for numero_carta, group in spilled.items():
+            assert group == [{'Numero_Carta': numero_carta}] * len(group)
+    finally:
+        spilled.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_closed_spilled_groups_cannot_be_read(tmp_path):
+    _, spilled = group_rows(sample_rows(20), max_rows=5, spill_dir=str(tmp_path))
+    spilled.close()
+
+    with pytest.raises(ValueError):
+        list(spilled.items())
+
+
+def test_close_deletes_unfinished_spill(tmp_path):
+    grouper = LicenseGrouper(max_rows=5, max_memory=None, spill_dir=str(tmp_path))
+    for row in sample_rows(20):
+        grouper.add(row['Numero_Carta'], row)
+    assert grouper.spilled
+    assert list(tmp_path.iterdir())
+
+    grouper.close()
+
+    assert not grouper.spilled
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_memory_limit_spills_past_measured_rss(tmp_path, monkeypatch):
+    monkeypatch.setattr(external_grouping, 'MEMORY_CHECK_INTERVAL', 10)
+    monkeypatch.setattr(external_grouping, 'current_rss', lambda: 2048)
+    grouper = LicenseGrouper(max_rows=None, max_memory=1024, spill_dir=str(tmp_path))
+    for row in sample_rows(20):
+        grouper.add(row['Numero_Carta'], row)
+
+    assert grouper.spilled
+    grouper.close()
+
+
+def test_memory_limit_is_ignored_without_rss(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(external_grouping, 'MEMORY_CHECK_INTERVAL', 10)
+    monkeypatch.setattr(external_grouping, 'current_rss', lambda: None)
+    grouper = LicenseGrouper(max_rows=None, max_memory=1024, spill_dir=str(tmp_path))
+    with caplog.at_level('WARNING', logger='external_grouping'):
+        for row in sample_rows(50):
+            grouper.add(row['Numero_Carta'], row)
+    groups = grouper.finish()
+
+    assert not grouper.spilled
+    assert isinstance(groups, dict)
+    assert grouper.max_memory is None
+    # Warned once, not at every check
+    warnings = [record.getMessage() for record in caplog.records]
+    assert len(warnings) == 1
+    assert 'psutil' in warnings[0]
+
+
+def test_read_license_groups_spills_to_the_same_groups(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text('id,Numero_Carta\n'
+                    + ''.join(f'{row["id"]},{row["Numero_Carta"]}\n' for row in sample_rows()),
+                    encoding='utf-8')
+    spill_dir = tmp_path / 'spill'
+    spill_dir.mkdir()
+    in_memory = BiometricAPIProcessor(api_base_url='http://127.0.0.1:1', biometric_dir=None)
+    spilling = BiometricAPIProcessor(api_base_url='http://127.0.0.1:1', biometric_dir=None,
+                                     group_max_rows=50, spill_dir=str(spill_dir))
+    spilling.COUNT_SLICE_ROWS = 40
+
+    expected, expected_rows = in_memory.read_license_groups(str(path))
+    groups, row_count = spilling.read_license_groups(str(path))
+
+    assert isinstance(groups, SpilledGroups)
+    with groups:
+        assert row_count == expected_rows == 200
+        assert list(groups.items()) == list(expected.items())
+    assert list(spill_dir.iterdir()) == []
+
+
+def test_license_rows_behave_like_a_list_of_rows():
+    rows = LicenseRows('5001', 3)
+    expected = [{'Numero_Carta': '5001'}] * 3
+
+    assert len(rows) == 3
+    assert list(rows) == expected
+    assert rows == expected and expected == rows
+    assert rows == tuple(expected)
+    assert rows == LicenseRows('5001', 3)
+    assert rows != LicenseRows('5001', 2)
+    assert rows != LicenseRows('5002', 3)
+    assert rows != [{'Numero_Carta': '5002'}] * 3
+    assert rows != expected[:2]
+    assert rows[0] == rows[-1] == {'Numero_Carta': '5001'}
+    assert rows[1:] == expected[1:]
+    assert rows[::-1] == expected
+    assert {'Numero_Carta': '5001'} in rows
+    assert rows.count({'Numero_Carta': '5001'}) == 3
+    with pytest.raises(IndexError):
+        rows[3]
+    with pytest.raises(IndexError):
+        rows[-4]
+    # Each row is a fresh dictionary: changing one does not change the group
+    rows[0]['Numero_Carta'] = 'edited'
+    assert rows[0] == {'Numero_Carta': '5001'}
+    assert LicenseRows('5001', 0) == []
+
+
+def test_compact_row_behaves_like_a_dict_row():
+    columns = ('id', 'Numero_Carta', 'nome')
+    row = CompactRow(columns, ('7', '5001', 'Ana'))
+    expected = {'id': '7', 'Numero_Carta': '5001', 'nome': 'Ana'}
+
+    assert row == expected and expected == row
+    assert row != {**expected, 'nome': 'Rui'}
+    assert row != {'id': '7', 'Numero_Carta': '5001'}
+    assert row == CompactRow(columns, ('7', '5001', 'Ana'))
+    assert dict(row) == expected
+    assert list(row) == list(columns)
+    assert list(row.items()) == list(expected.items())
+    assert list(row.values()) == ['7', '5001', 'Ana']
+    assert len(row) == 3
+    assert row['Numero_Carta'] == '5001'
+    assert row.get('Numero_Carta') == '5001'
+    assert row.get('missing', '') == ''
+    assert 'nome' in row and 'missing' not in row
+    with pytest.raises(KeyError):
+        row['missing']
+    # Rows of a group compare equal to the DictReader rows they replace
+    assert [row, CompactRow(columns, ('8', '5001', 'Rui'))] == [expected, {**expected, 'id': '8', 'nome': 'Rui'}]
@@ -0,0 +1,64 @@
+"""Tests for biometric file finding against sample_biometric_data and a flat layout."""
+
+import base64
+import os
+
+import pytest
+
+from csv_api_sender import BiometricAPIProcessor
+
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sample_biometric_data')
+NUMERO_CARTA = '10028588'
+
+EXPECTED_FILES = {
+    'fileFace': f'FOTO_{NUMERO_CARTA}_1694521263.jpg',
+    'fileSign': f'ASSINATURA_{NUMERO_CARTA}_1694521263.png',
+    'filesFinger1': f'IMPRESSAO_DIGITAL_1_{NUMERO_CARTA}_1694521263.bmp',
+    'filesFinger2': f'IMPRESSAO_DIGITAL_2_{NUMERO_CARTA}_1694521263.bmp',
+}
+
+
+def processor_for(biometric_dir, indexed):
+    processor = BiometricAPIProcessor(api_base_url='http://127.0.0.1:1', biometric_dir=str(biometric_dir))
+    if indexed:
+        assert processor.build_file_index() is not None
+    return processor
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_finds_hierarchical_files(indexed):
+    processor = processor_for(SAMPLE_DIR, indexed)
+
+    file_mapping = processor.find_biometric_files(NUMERO_CARTA)
+
+    assert file_mapping == {api_field: os.path.join(SAMPLE_DIR, NUMERO_CARTA, name)
+                            for api_field, name in EXPECTED_FILES.items()}
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_finds_flat_files(tmp_path, indexed):
+    names = {
+        'fileFace': '777.face.jpg',
+        'fileSign': 'ASSINATURA_777_1.png',
+        'filesFinger1': '777.right_index.bmp',
+    }
+    for name in names.values():
+        (tmp_path / name).write_bytes(b'data')
+    (tmp_path / '7770.face.jpg').write_bytes(b'other driver')
+    processor = processor_for(tmp_path, indexed)
+
+    assert processor.find_biometric_files('777') == {api_field: os.path.join(str(tmp_path), name)
+                                                     for api_field, name in names.items()}
+    assert processor.find_biometric_files('888') == {}
+
+
+def test_builds_payload_from_license_number():
+    processor = processor_for(SAMPLE_DIR, indexed=False)
+
+    payload = processor.build_payload_from_license_number(NUMERO_CARTA)
+
+    assert set(payload) == set(EXPECTED_FILES)
+    for api_field, name in EXPECTED_FILES.items():
+        with open(os.path.join(SAMPLE_DIR, NUMERO_CARTA, name), 'rb') as f:
+            assert base64.b64decode(payload[api_field]) == f.read()
+    assert processor.build_payload_from_license_number('') == {}
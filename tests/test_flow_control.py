@@ -0,0 +1,240 @@
+"""Tests for flow_control: the rate limiter, AIMD controller and circuit breaker."""
+
+import time
+
+import pytest
+
+import flow_control
+from flow_control import AIMDController, CircuitBreaker, RateLimiter, TokenBucket, parse_size
+
+SUCCESS = {'status': 'success', 'status_code': 200}
+SERVER_ERROR = {'status': 'error', 'status_code': 500}
+THROTTLED = {'status': 'error', 'status_code': 429}
+NOT_FOUND = {'status': 'config_error', 'status_code': 404}
+TIMEOUT = {'status': 'error', 'status_code': None, 'transient': True}
+NO_DATA = {'status': 'no_data'}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Frozen time.monotonic for flow_control; advance by adding to clock.now."""
+    class Clock:
+        now = 1000.0
+    monkeypatch.setattr(flow_control.time, 'monotonic', lambda: Clock.now)
+    return Clock
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('512', 512),
+    ('512K', 512 * 1024),
+    ('1.5m', 1536 * 1024),
+    ('2GB', 2 * 1024 ** 3),
+])
+def test_parse_size(value, expected):
+    assert parse_size(value) == expected
+
+
+def test_parse_size_rejects_garbage():
+    with pytest.raises(ValueError):
+        parse_size('lots')
+
+
+def test_token_bucket_spends_burst_then_waits(clock):
+    bucket = TokenBucket(rate=10, burst=5)
+
+    assert [bucket.reserve() for _ in range(5)] == [0.0] * 5
+    assert bucket.reserve() == pytest.approx(0.1)
+    # Reservations queue up behind each other
+    assert bucket.reserve() == pytest.approx(0.2)
+
+    clock.now += 1.0
+    assert bucket.reserve() == 0.0
+
+
+def test_rate_limiter_waits_for_the_tighter_bucket(clock):
+    limiter = RateLimiter(requests_per_second=100, bytes_per_second=1000)
+
+    assert limiter.reserve(1000) == 0.0
+    assert limiter.reserve(500) == pytest.approx(0.5)
+    assert RateLimiter().reserve(10 ** 9) == 0.0
+
+
+def test_aimd_starts_at_a_quarter_of_maximum_within_bounds():
+    assert AIMDController(maximum=16).limit == 4
+    assert AIMDController(maximum=2).limit == 1
+    assert AIMDController(maximum=8, initial=100).limit == 8
+    assert AIMDController(maximum=8, minimum=3, initial=1).limit == 3
+
+
+def test_aimd_increases_about_one_per_round():
+    controller = AIMDController(maximum=10, initial=2)
+
+    for _ in range(2):
+        controller.record(SUCCESS, time.monotonic(), 0.1)
+    assert controller.limit == 2
+    controller.record(SUCCESS, time.monotonic(), 0.1)
+    assert controller.limit == 3
+
+    for _ in range(100):
+        controller.record(SUCCESS, time.monotonic(), 0.1)
+    assert controller.limit == 10
+
+
+def test_aimd_stops_increasing_when_latency_grows():
+    controller = AIMDController(maximum=10, initial=4, latency_tolerance=2.0)
+    controller.record(SUCCESS, time.monotonic(), 0.1)
+    limit = controller._limit
+
+    for _ in range(10):
+        controller.record(SUCCESS, time.monotonic(), 0.5)
+
+    assert controller._limit == limit
+    assert controller.best_latency == 0.1
+
+
+def test_aimd_decreases_once_per_burst_of_failures():
+    controller = AIMDController(maximum=32, initial=16, decrease_factor=0.5)
+    started = time.monotonic()
+
+    controller.record(SERVER_ERROR, started, 1.0)
+    # Requests sent before the decrease do not count again
+    controller.record(TIMEOUT, started, 1.0)
+    assert controller.limit == 8
+    assert controller.decreases == 1
+
+    controller.record(SERVER_ERROR, time.monotonic(), 1.0)
+    assert controller.limit == 4
+    assert controller.decreases == 2
+
+
+def test_aimd_never_drops_below_minimum():
+    controller = AIMDController(maximum=8, minimum=2, initial=8, decrease_factor=0.1)
+
+    for _ in range(5):
+        controller.record(TIMEOUT, time.monotonic(), 1.0)
+
+    assert controller.limit == 2
+
+
+def test_aimd_ignores_client_errors():
+    controller = AIMDController(maximum=8, initial=4)
+
+    controller.record(THROTTLED, time.monotonic(), 0.1)
+
+    assert not AIMDController.is_overload(THROTTLED)
+    assert controller.decreases == 0
+    assert controller.limit == 4
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(threshold=3)
+
+    assert not breaker.record(TIMEOUT)
+    assert not breaker.record(NOT_FOUND)
+    # Any other result resets the count
+    assert not breaker.record(SERVER_ERROR)
+    assert not breaker.record(TIMEOUT)
+    assert not breaker.record(TIMEOUT)
+    assert breaker.state == 'closed'
+    assert breaker.allow_request()
+    assert breaker.wait_time() == 0.0
+
+    assert breaker.record(TIMEOUT)
+    assert breaker.state == 'open'
+    assert breaker.trips == 1
+
+
+def test_fail_fast_breaker_gives_up_when_open():
+    breaker = CircuitBreaker(threshold=1, mode='fail-fast', probe_interval=0)
+
+    assert breaker.record(NOT_FOUND)
+    assert breaker.gave_up
+    assert not breaker.allow_request()
+    assert breaker.wait_time() is None
+
+
+def test_pause_breaker_waits_for_probe_interval():
+    breaker = CircuitBreaker(threshold=1, mode='pause', probe_interval=60)
+    breaker.record(TIMEOUT)
+
+    assert not breaker.gave_up
+    assert not breaker.allow_request()
+    assert 0 < breaker.wait_time() <= 60
+
+
+def test_pause_breaker_probes_until_the_api_is_back():
+    breaker = CircuitBreaker(threshold=1, mode='pause', probe_interval=0)
+    breaker.record(TIMEOUT)
+
+    # One probe at a time
+    assert breaker.allow_request()
+    assert breaker.state == 'half_open'
+    assert not breaker.allow_request()
+    assert breaker.wait_time() is None
+
+    # A failed probe reopens the breaker without counting another trip
+    assert not breaker.record(TIMEOUT)
+    assert breaker.state == 'open'
+    assert breaker.failed_probes == 1
+    assert breaker.trips == 1
+
+    # A driver skipped without a request frees the probe slot
+    assert breaker.allow_request()
+    assert not breaker.record(NO_DATA)
+    assert breaker.allow_request()
+
+    breaker.record(SUCCESS)
+    assert breaker.state == 'closed'
+    assert breaker.failures == breaker.failed_probes == 0
+    assert breaker.allow_request()
+
+
+def test_pause_breaker_gives_up_after_max_probes():
+    breaker = CircuitBreaker(threshold=1, mode='pause', probe_interval=0, max_probes=2)
+    breaker.record(TIMEOUT)
+
+    for _ in range(2):
+        assert breaker.allow_request()
+        breaker.record(TIMEOUT)
+
+    assert breaker.gave_up
+    assert not breaker.allow_request()
+    assert breaker.wait_time() is None
+
+
+def test_half_open_breaker_counts_only_the_probe(clock):
+    breaker = CircuitBreaker(threshold=1, mode='pause', probe_interval=10)
+    sent_before_trip = clock.now
+    breaker.record(TIMEOUT, sent_before_trip)
+    assert breaker.state == 'open'
+
+    # Late results of requests sent before the trip change nothing while open
+    assert not breaker.record(SUCCESS, sent_before_trip)
+    assert breaker.state == 'open'
+
+    clock.now += 10
+    assert breaker.allow_request()
+    probe_sent = clock.now
+    clock.now += 1
+
+    # ... nor while the probe is in flight: they are not the probe
+    assert not breaker.record(TIMEOUT, sent_before_trip)
+    assert not breaker.record(NO_DATA, sent_before_trip)
+    assert not breaker.record(SUCCESS, sent_before_trip)
+    assert breaker.state == 'half_open'
+    assert breaker.failed_probes == 0
+    assert not breaker.allow_request()
+
+    breaker.record(TIMEOUT, probe_sent)
+    assert breaker.state == 'open'
+    assert breaker.failed_probes == 1
+
+    clock.now += 10
+    assert breaker.allow_request()
+    breaker.record(SUCCESS, clock.now)
+    assert breaker.state == 'closed'
+
+
+def test_breaker_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        CircuitBreaker(mode='retry')
@@ -0,0 +1,182 @@
+"""Tests for metrics: histogram percentiles and the Prometheus exporter."""
+
+import random
+import re
+import urllib.error
+import urllib.request
+
+import pytest
+
+from metrics import BUCKET_BOUNDS, EXPORTED_BOUNDS, LatencyHistogram, MetricsExporter, PipelineMetrics
+
+# Neighbouring bucket bounds are this far apart, the worst case of interpolating inside one
+BUCKET_RATIO = BUCKET_BOUNDS[1] / BUCKET_BOUNDS[0]
+
+
+def histogram_of(values):
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    return histogram
+
+
+def exact_percentile(values, q):
+    ordered = sorted(values)
+    return ordered[max(0, -(-len(ordered) * q // 100) - 1)]
+
+
+def test_empty_histogram_has_no_percentiles():
+    histogram = LatencyHistogram()
+
+    assert histogram.count == 0
+    assert histogram.percentile(50) is None
+    assert histogram.percentile(99) is None
+    assert list(histogram.buckets()) == []
+
+
+def test_constant_durations():
+    histogram = histogram_of([0.005] * 100)
+
+    for q in (0, 50, 95, 99, 100):
+        assert histogram.percentile(q) == pytest.approx(0.005)
+
+
+def test_single_duration():
+    histogram = histogram_of([0.042])
+
+    assert histogram.percentile(50) == histogram.percentile(99) == pytest.approx(0.042)
+
+
+@pytest.mark.parametrize('values', [
+    # Uniform 1 ms .. 1 s
+    [n / 1000 for n in range(1, 1001)],
+    # Log-normal around 20 ms, with a long tail
+    [random.Random(7).lognormvariate(-4, 1) for _ in range(5000)],
+    # 90% fast, 10% slow: the p95 and p99 sit in the slow mode
+    [0.002] * 900 + [0.8] * 100,
+], ids=['uniform', 'lognormal', 'bimodal'])
+def test_percentiles_within_one_bucket(values):
+    histogram = histogram_of(values)
+
+    for q in (50, 95, 99):
+        exact = exact_percentile(values, q)
+        assert exact / BUCKET_RATIO <= histogram.percentile(q) <= exact * BUCKET_RATIO, q
+    assert histogram.percentile(0) == min(values)
+    assert histogram.percentile(100) == max(values)
+
+
+def test_uniform_percentiles():
+    histogram = histogram_of([n / 1000 for n in range(1, 1001)])
+
+    assert histogram.percentile(50) == pytest.approx(0.5, rel=0.05)
+    assert histogram.percentile(95) == pytest.approx(0.95, rel=0.05)
+    assert histogram.percentile(99) == pytest.approx(0.99, rel=0.05)
+    assert histogram.count == 1000
+    assert histogram.total == pytest.approx(500.5)
+
+
+def test_durations_outside_the_buckets():
+    # Below the first and above the last bound: clamped to the recorded min and max
+    histogram = histogram_of([1e-7, 2e-7, 5000.0])
+
+    assert 1e-7 <= histogram.percentile(1) <= 2e-7
+    assert histogram.percentile(99) <= 5000.0
+    assert histogram.percentile(100) == 5000.0
+    assert histogram.cumulative(BUCKET_BOUNDS[-1:]) == [2]
+
+
+@pytest.fixture
+def metrics():
+    """Metrics of a small batch: two stages, three outcomes, a few counters and gauges."""
+    metrics = PipelineMetrics()
+    for seconds in (0.001, 0.004, 0.02, 0.3):
+        metrics.record('send', seconds)
+    metrics.record('encode', 0.0005)
+    metrics.record_outcome({'status': 'success', 'status_code': 201})
+    metrics.record_outcome({'status': 'success', 'status_code': 201})
+    metrics.record_outcome({'status': 'server_error', 'status_code': 500})
+    metrics.record_outcome({'status': 'no_data'})
+    metrics.increment('retries_total', 2)
+    metrics.increment('request_bytes_total', 1536)
+    metrics.set_gauge('requests_in_flight', 3)
+    return metrics
+
+
+def samples(text):
+    """Parse exposition text into {'name{labels}': value}, checking every metric has HELP and TYPE."""
+    parsed = {}
+    typed = set()
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            typed.add(line.split()[2])
+        elif line and not line.startswith('#'):
+            series, value = line.rsplit(' ', 1)
+            name = re.sub(r'_(bucket|sum|count)$', '', series.split('{', 1)[0])
+            assert name in typed, series
+            parsed[series] = float(value)
+    return parsed
+
+
+def check_exposition(text):
+    assert text.endswith('\n')
+    parsed = samples(text)
+
+    buckets = [parsed[f'biometric_upload_stage_seconds_bucket{{stage="send",le="{bound:.6g}"}}']
+               for bound in EXPORTED_BOUNDS]
+    assert buckets == sorted(buckets)
+    assert parsed['biometric_upload_stage_seconds_bucket{stage="send",le="0.001"}'] == 1
+    assert parsed['biometric_upload_stage_seconds_bucket{stage="send",le="0.00316228"}'] == 1
+    assert parsed['biometric_upload_stage_seconds_bucket{stage="send",le="0.01"}'] == 2
+    assert parsed['biometric_upload_stage_seconds_bucket{stage="send",le="0.1"}'] == 3
+    assert parsed['biometric_upload_stage_seconds_bucket{stage="send",le="+Inf"}'] == 4
+    assert parsed['biometric_upload_stage_seconds_sum{stage="send"}'] == pytest.approx(0.325)
+    assert parsed['biometric_upload_stage_seconds_count{stage="send"}'] == 4
+    assert parsed['biometric_upload_stage_seconds_count{stage="encode"}'] == 1
+
+    assert parsed['biometric_upload_drivers_total{outcome="success",status="success",code="201"}'] == 2
+    assert parsed['biometric_upload_drivers_total{outcome="failed",status="server_error",code="500"}'] == 1
+    assert parsed['biometric_upload_drivers_total{outcome="skipped",status="no_data",code=""}'] == 1
+    assert parsed['biometric_upload_retries_total'] == 2
+    assert parsed['biometric_upload_request_bytes_total'] == 1536
+    assert parsed['biometric_upload_requests_in_flight'] == 3
+    # Gauges never set are left out
+    assert 'biometric_upload_concurrency_limit' not in parsed
+
+
+def test_exporter_serves_metrics_over_http(metrics):
+    exporter = MetricsExporter(metrics, port=0)
+    exporter.start()
+    try:
+        assert exporter.port != 0
+        with urllib.request.urlopen(f'http://127.0.0.1:{exporter.port}/metrics', timeout=5) as response:
+            assert response.headers['Content-Type'] == MetricsExporter.CONTENT_TYPE
+            check_exposition(response.read().decode('utf-8'))
+
+        # Scrapes see the metrics as they are now
+        metrics.record('send', 2.0)
+        with urllib.request.urlopen(f'http://127.0.0.1:{exporter.port}/metrics', timeout=5) as response:
+            parsed = samples(response.read().decode('utf-8'))
+        assert parsed['biometric_upload_stage_seconds_count{stage="send"}'] == 5
+
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f'http://127.0.0.1:{exporter.port}/other', timeout=5)
+        assert error.value.code == 404
+    finally:
+        exporter.stop()
+    assert exporter.server is None
+
+
+def test_exporter_writes_textfile(metrics, tmp_path):
+    textfile = tmp_path / 'biometric_upload.prom'
+    exporter = MetricsExporter(metrics, textfile=str(textfile), interval=60)
+    exporter.start()
+    try:
+        check_exposition(textfile.read_text(encoding='utf-8'))
+        metrics.record_outcome({'status': 'success', 'status_code': 201})
+    finally:
+        exporter.stop()
+
+    # stop() writes the final numbers, and no temporary file is left behind
+    parsed = samples(textfile.read_text(encoding='utf-8'))
+    assert parsed['biometric_upload_drivers_total{outcome="success",status="success",code="201"}'] == 3
+    assert [path.name for path in tmp_path.iterdir()] == [textfile.name]
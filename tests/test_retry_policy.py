@@ -0,0 +1,78 @@
+"""Tests for retry_policy: which results are retried and the backoff delays."""
+
+import time
+from email.utils import formatdate
+
+import pytest
+
+import retry_policy
+from retry_policy import RetryPolicy, parse_retry_after
+
+SUCCESS = {'status': 'success', 'status_code': 200}
+UNAVAILABLE = {'status': 'error', 'status_code': 503}
+NOT_FOUND = {'status': 'config_error', 'status_code': 404}
+BAD_REQUEST = {'status': 'error', 'status_code': 400}
+TIMEOUT = {'status': 'error', 'status_code': None, 'transient': True}
+LOCAL_ERROR = {'status': 'error', 'status_code': None}
+
+
+def test_should_retry_transient_failures_only():
+    policy = RetryPolicy(max_attempts=3)
+
+    assert policy.should_retry(UNAVAILABLE, 1)
+    assert policy.should_retry(TIMEOUT, 2)
+    assert not policy.should_retry(SUCCESS, 1)
+    assert not policy.should_retry(NOT_FOUND, 1)
+    assert not policy.should_retry(BAD_REQUEST, 1)
+    assert not policy.should_retry(LOCAL_ERROR, 1)
+
+
+def test_should_retry_stops_after_max_attempts():
+    policy = RetryPolicy(max_attempts=3)
+
+    assert policy.should_retry(UNAVAILABLE, 2)
+    assert not policy.should_retry(UNAVAILABLE, 3)
+    assert not RetryPolicy(max_attempts=1).should_retry(UNAVAILABLE, 1)
+    assert not RetryPolicy(max_attempts=0).should_retry(UNAVAILABLE, 1)
+
+
+def test_should_retry_honours_configuration():
+    policy = RetryPolicy(retry_statuses=[429], retry_on_connection_error=False)
+
+    assert policy.should_retry({'status': 'error', 'status_code': 429}, 1)
+    assert not policy.should_retry(UNAVAILABLE, 1)
+    assert not policy.should_retry(TIMEOUT, 1)
+
+
+def test_delay_doubles_up_to_max_delay(monkeypatch):
+    monkeypatch.setattr(retry_policy.random, 'uniform', lambda low, high: high)
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+
+    assert [policy.delay(attempt) for attempt in range(1, 6)] == [1.0, 2.0, 4.0, 5.0, 5.0]
+
+
+def test_delay_is_jittered_and_honours_retry_after():
+    policy = RetryPolicy(base_delay=2.0, max_delay=30.0)
+
+    delays = [policy.delay(3) for _ in range(200)]
+    assert all(0 <= delay <= 8.0 for delay in delays)
+    assert len(set(delays)) > 1
+    assert policy.delay(1, retry_after=60.0) == 60.0
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, None),
+    ('', None),
+    ('120', 120.0),
+    (' 7 ', 7.0),
+    ('soon', None),
+    ('Wed, 21 Oct 2015 07:28:00 GMT', 0.0),
+])
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    delay = parse_retry_after(formatdate(time.time() + 60, usegmt=True))
+
+    assert 55 <= delay <= 60
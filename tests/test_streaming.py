@@ -0,0 +1,105 @@
+"""Tests for streaming mode: drivers grouped by runs of rows and uploaded as each run completes."""
+
+import threading
+
+import pytest
+
+from csv_api_sender import BiometricAPIProcessor
+
+
+def write_csv(path, licenses):
+    path.write_text('id,Numero_Carta,nome\n'
+                    + ''.join(f'{i},{numero_carta},nome {i}\n' for i, numero_carta in enumerate(licenses)),
+                    encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def processor(tmp_path):
+    """Processor with a face image for licenses 100-199 and a stub send_to_api."""
+    biometric_dir = tmp_path / 'bio'
+    biometric_dir.mkdir()
+    for numero_carta in range(100, 200):
+        (biometric_dir / f'{numero_carta}.face.jpg').write_bytes(b'face')
+
+    processor = BiometricAPIProcessor(api_base_url='http://127.0.0.1:1', biometric_dir=str(biometric_dir))
+    processor.read_position = 0
+    processor.sent = []
+    lock = threading.Lock()
+    iter_csv_licenses = processor.iter_csv_licenses
+
+    def counted_licenses(csv_file):
+        for numero_carta in iter_csv_licenses(csv_file):
+            processor.read_position += 1
+            yield numero_carta
+
+    def send_to_api(numero_carta, payload, timings=None):
+        with lock:
+            processor.sent.append((numero_carta, processor.read_position))
+        return {'status': 'success', 'status_code': 201, 'response': {'status': {'files_created': ['fileFace']}}}
+
+    processor.iter_csv_licenses = counted_licenses
+    processor.send_to_api = send_to_api
+    yield processor
+    processor.close()
+
+
+def test_license_runs_are_yielded_as_they_complete(processor):
+    read = []
+
+    def licenses():
+        for numero_carta in ['A', 'A', '', 'A', 'B', 'A', 'A', 'C']:
+            read.append(numero_carta)
+            yield numero_carta
+
+    runs = processor.iter_license_runs(licenses())
+
+    numero_carta, rows = next(runs)
+    # A's run ends at the first B: nothing past it has been read
+    assert read == ['A', 'A', '', 'A', 'B']
+    assert (numero_carta, len(rows)) == ('A', 3)
+    assert rows == [{'Numero_Carta': 'A'}] * 3
+    # A license split across the file comes back once per run
+    assert [(numero_carta, len(rows)) for numero_carta, rows in runs] == [('B', 1), ('A', 2), ('C', 1)]
+
+
+def test_streaming_uploads_before_the_file_is_read(processor, tmp_path):
+    licenses = [str(100 + i // 2) for i in range(200)]
+    csv_file = write_csv(tmp_path / 'sorted.csv', licenses)
+
+    results = processor.process_csv(str(csv_file), stream=True, index_files=False)
+
+    assert results['total_drivers'] == results['success'] == 100
+    assert [numero_carta for numero_carta, _ in processor.sent] == list(dict.fromkeys(licenses))
+    # The first driver is sent long before the last row is read
+    assert processor.sent[0][1] < 10
+
+
+def test_streaming_totals_match_grouped_mode_on_sorted_input(processor, tmp_path):
+    licenses = [str(100 + i // 3) for i in range(60)]
+    licenses[7] = ''
+    csv_file = write_csv(tmp_path / 'sorted.csv', licenses)
+
+    streamed = processor.process_csv(str(csv_file), stream=True, index_files=False)
+    grouped = processor.process_csv(str(csv_file), index_files=False)
+
+    for key in ('total_csv_rows', 'total_drivers', 'success', 'failed', 'skipped'):
+        assert streamed[key] == grouped[key], key
+    assert streamed['total_csv_rows'] == 60
+    assert ([(detail['numero_carta'], detail['csv_rows']) for detail in streamed['details']]
+            == [(detail['numero_carta'], detail['csv_rows']) for detail in grouped['details']])
+
+
+def test_streaming_split_license_keeps_every_row(processor, tmp_path):
+    licenses = ['100', '100', '101', '100', '102', '102']
+    csv_file = write_csv(tmp_path / 'split.csv', licenses)
+
+    streamed = processor.process_csv(str(csv_file), stream=True, index_files=False)
+    grouped = processor.process_csv(str(csv_file), index_files=False)
+
+    assert streamed['total_csv_rows'] == grouped['total_csv_rows'] == 6
+    assert sum(detail['csv_rows'] for detail in streamed['details']) == 6
+    assert [(detail['numero_carta'], detail['csv_rows']) for detail in streamed['details']] == [
+        ('100', 2), ('101', 1), ('100', 1), ('102', 2)]
+    assert [(detail['numero_carta'], detail['csv_rows']) for detail in grouped['details']] == [
+        ('100', 3), ('101', 1), ('102', 2)]
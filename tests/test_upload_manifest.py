@@ -0,0 +1,123 @@
+"""Tests for the upload manifest: unchanged biometrics are not read or sent again."""
+
+import os
+
+import pytest
+
+from csv_api_sender import BiometricAPIProcessor
+
+NUMERO_CARTA = '777'
+
+
+@pytest.fixture
+def biometric_dir(tmp_path):
+    directory = tmp_path / 'bio'
+    directory.mkdir()
+    (directory / f'{NUMERO_CARTA}.face.jpg').write_bytes(b'face v1')
+    (directory / f'{NUMERO_CARTA}.assinatura.png').write_bytes(b'sign v1')
+    return directory
+
+
+def upload(biometric_dir, manifest, api_base_url='http://127.0.0.1:1', status='success'):
+    """
+    Upload the driver once with a fresh processor.
+
+    Returns:
+        Tuple (result, payloads sent to the API, paths read from disk)
+    """
+    processor = BiometricAPIProcessor(api_base_url=api_base_url, biometric_dir=str(biometric_dir),
+                                      manifest=str(manifest))
+    sent = []
+    read = []
+    file_to_base64 = processor.file_to_base64
+
+    def counting_file_to_base64(file_path, digest=None):
+        read.append(os.path.basename(file_path))
+        return file_to_base64(file_path, digest)
+
+    def send_to_api(numero_carta, payload, timings=None):
+        sent.append(sorted(payload))
+        if status != 'success':
+            return {'status': status, 'status_code': 500, 'error': 'Boom'}
+        return {'status': 'success', 'status_code': 201, 'response': {'status': {'files_created': list(payload)}}}
+
+    processor.file_to_base64 = counting_file_to_base64
+    processor.send_to_api = send_to_api
+    try:
+        result = processor.upload_driver(NUMERO_CARTA, [])
+    finally:
+        processor.close()
+    return result, sent, sorted(read)
+
+
+def test_unchanged_driver_is_skipped_without_a_request(biometric_dir, tmp_path):
+    manifest = tmp_path / 'manifest.sqlite'
+
+    result, sent, read = upload(biometric_dir, manifest)
+    assert result['status'] == 'success'
+    assert sent == [['fileFace', 'fileSign']]
+
+    result, sent, read = upload(biometric_dir, manifest)
+    assert result['status'] == 'unchanged'
+    assert sorted(result['files_unchanged']) == ['fileFace', 'fileSign']
+    assert sent == []
+    # Size and mtime match: the files are not even read
+    assert read == []
+
+
+def test_changed_file_is_rehashed_and_sent_alone(biometric_dir, tmp_path):
+    manifest = tmp_path / 'manifest.sqlite'
+    upload(biometric_dir, manifest)
+
+    sign = biometric_dir / f'{NUMERO_CARTA}.assinatura.png'
+    sign.write_bytes(b'sign v2, longer')
+    result, sent, read = upload(biometric_dir, manifest)
+
+    assert result['status'] == 'success'
+    assert sent == [['fileSign']]
+    assert read == [sign.name]
+    assert result['files_unchanged'] == ['fileFace']
+
+    result, sent, _ = upload(biometric_dir, manifest)
+    assert result['status'] == 'unchanged'
+    assert sent == []
+
+
+def test_touched_file_with_same_content_is_hashed_once(biometric_dir, tmp_path):
+    manifest = tmp_path / 'manifest.sqlite'
+    upload(biometric_dir, manifest)
+
+    face = biometric_dir / f'{NUMERO_CARTA}.face.jpg'
+    st = face.stat()
+    os.utime(face, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    result, sent, read = upload(biometric_dir, manifest)
+
+    assert result['status'] == 'unchanged'
+    assert sent == []
+    assert read == [face.name]
+
+    # The new mtime was recorded, so the file is not hashed again
+    _, _, read = upload(biometric_dir, manifest)
+    assert read == []
+
+
+def test_failed_upload_is_not_recorded(biometric_dir, tmp_path):
+    manifest = tmp_path / 'manifest.sqlite'
+
+    result, sent, _ = upload(biometric_dir, manifest, status='server_error')
+    assert result['status'] == 'server_error'
+    assert len(sent) == 1
+
+    result, sent, _ = upload(biometric_dir, manifest)
+    assert result['status'] == 'success'
+    assert sent == [['fileFace', 'fileSign']]
+
+
+def test_manifest_is_kept_per_api(biometric_dir, tmp_path):
+    manifest = tmp_path / 'manifest.sqlite'
+    upload(biometric_dir, manifest)
+
+    result, sent, _ = upload(biometric_dir, manifest, api_base_url='http://127.0.0.2:1')
+
+    assert result['status'] == 'success'
+    assert sent == [['fileFace', 'fileSign']]
@@ -0,0 +1,107 @@
+"""Tests for upload_transport: streamed bodies against their declared length."""
+
+import base64
+import hashlib
+import json
+
+import pytest
+
+from upload_transport import (BASE64_CHUNK_SIZE, CHUNK_SIZE, ENCODE_CHUNK_SIZE, JsonFileBody,
+                              MultipartFileBody, base64_length, encode_file_base64, iter_file_chunks)
+
+# Sizes around base64 padding and the read chunk sizes
+SIZES = [0, 1, 2, 3, 4, BASE64_CHUNK_SIZE - 1, BASE64_CHUNK_SIZE + 1, CHUNK_SIZE - 1, CHUNK_SIZE + 1, 200_000]
+
+
+@pytest.fixture
+def files(tmp_path):
+    """API field -> (path, size) for files of every size in SIZES, and their content."""
+    mapping = {}
+    contents = {}
+    for index, size in enumerate(SIZES):
+        content = bytes((index + i) % 256 for i in range(size))
+        path = tmp_path / f'file_{index}.bmp'
+        path.write_bytes(content)
+        mapping[f'field{index}'] = (str(path), size)
+        contents[f'field{index}'] = content
+    return mapping, contents
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_base64_length(size):
+    assert base64_length(size) == len(base64.b64encode(bytes(size)))
+
+
+def test_encode_file_base64(files):
+    mapping, contents = files
+    for api_field, (path, _) in mapping.items():
+        assert encode_file_base64(path) == base64.b64encode(contents[api_field]).decode('ascii')
+
+
+@pytest.mark.parametrize('size', [ENCODE_CHUNK_SIZE - 1, ENCODE_CHUNK_SIZE, ENCODE_CHUNK_SIZE + 1])
+def test_encode_file_base64_across_encode_chunks(tmp_path, size):
+    content = bytes(range(256)) * (size // 256) + bytes(size % 256)
+    path = tmp_path / 'face.jpg'
+    path.write_bytes(content)
+
+    assert encode_file_base64(str(path)) == base64.b64encode(content).decode('ascii')
+
+
+def test_json_body_length_matches_streamed_bytes(files):
+    mapping, contents = files
+    digests = {}
+    body = JsonFileBody(mapping, digests)
+
+    data = b''.join(body)
+
+    assert len(body) == len(data)
+    assert json.loads(data) == {api_field: base64.b64encode(content).decode('ascii')
+                                for api_field, content in contents.items()}
+    assert digests == {api_field: hashlib.sha256(content).hexdigest()
+                       for api_field, content in contents.items()}
+
+
+@pytest.mark.parametrize('count', [0, 1])
+def test_json_body_length_with_few_files(files, count):
+    mapping, _ = files
+    body = JsonFileBody(dict(list(mapping.items())[-count:] if count else []))
+
+    data = b''.join(body)
+
+    assert len(body) == len(data)
+    assert json.loads(data) is not None
+
+
+def test_multipart_body_length_matches_streamed_bytes(files):
+    mapping, contents = files
+    digests = {}
+    body = MultipartFileBody(mapping, digests)
+
+    data = b''.join(body)
+
+    assert len(body) == len(data)
+    assert data.endswith(f'--{body.boundary}--\r\n'.encode('ascii'))
+    parts = data.split(f'--{body.boundary}'.encode('ascii'))[1:-1]
+    assert [part.split(b'\r\n\r\n', 1)[1][:-2] for part in parts] == list(contents.values())
+    assert digests == {api_field: hashlib.sha256(content).hexdigest()
+                       for api_field, content in contents.items()}
+
+
+def test_multipart_body_length_without_files():
+    body = MultipartFileBody({})
+
+    assert len(body) == len(b''.join(body))
+
+
+def test_file_changed_since_stat_fails_the_body(files):
+    mapping, _ = files
+    path, size = mapping[f'field{len(SIZES) - 1}']
+
+    with pytest.raises(OSError, match='grew'):
+        b''.join(MultipartFileBody({'fileFace': (path, size - 1)}))
+    with pytest.raises(OSError, match='shrank'):
+        b''.join(MultipartFileBody({'fileFace': (path, size + 1)}))
+    with pytest.raises(OSError, match='shrank'):
+        b''.join(JsonFileBody({'fileFace': (path, size + 1)}))
+    with pytest.raises(OSError, match='grew'):
+        list(iter_file_chunks(path, 0))
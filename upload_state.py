@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Upload State
+Durable checkpoint journal of per-driver upload outcomes, used to resume an
+interrupted batch without re-sending drivers that were already uploaded, and
+a manifest of uploaded file hashes used to skip unchanged biometrics.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Default location of the upload manifest (next to config.json)
+DEFAULT_MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'upload_manifest.sqlite')
+
+
+class CheckpointJournal:
+    """
+    Append-only JSON-lines journal of completed drivers.
+
+    Every record is flushed to the operating system immediately, so it survives
+    the process being killed. fsync (which also protects against an OS crash or
+    power loss) is batched every sync_every records or sync_interval seconds to
+    stay cheap at high throughput.
+
+    The journal is never truncated: each run appends a run_start marker and
+    its records, so a run started without resume keeps the checkpoints of an
+    interrupted one. Records carry the API they were uploaded to, and only
+    successes against the same API count as completed.
+    """
+
+    def __init__(self, path: str, resume: bool = False, sync_every: int = 100,
+                 sync_interval: float = 1.0, api_base_url: Optional[str] = None):
+        """
+        Open the journal.
+
+        Args:
+            path: Journal file path
+            resume: Skip drivers earlier runs uploaded (True) or upload them
+                    again (False); earlier records are kept either way
+            sync_every: fsync after this many records
+            sync_interval: fsync when this many seconds passed since the last sync
+            api_base_url: API the uploads go to
+        """
+        self.path = path
+        self.api_base_url = api_base_url
+        self.sync_every = max(1, sync_every)
+        self.sync_interval = sync_interval
+        self.completed: Set[str] = self.load_completed(path, api_base_url) if resume else set()
+
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._file = open(path, 'a', encoding='utf-8')
+        self._write({'event': 'run_start', 'resume': resume, 'api_base_url': api_base_url,
+                     'time': time.time()})
+        self.sync()
+
+    @staticmethod
+    def load_completed(path: str, api_base_url: Optional[str] = None) -> Set[str]:
+        """
+        Read the license numbers already uploaded successfully.
+
+        Args:
+            path: Journal file path
+            api_base_url: API the uploads went to; successes recorded against
+                          another API are ignored
+
+        Returns:
+            Set of numero_carta values with a 'success' record for api_base_url
+        """
+        completed = set()
+        if not os.path.exists(path):
+            return completed
+
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_num, line in enumerate(f, start=1):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line is expected after a crash mid-write
+                    logger.warning(f"Ignoring unreadable journal line {line_num} in {path}")
+                    continue
+                if (record.get('status') == 'success' and record.get('numero_carta')
+                        and record.get('api_base_url') == api_base_url):
+                    completed.add(record['numero_carta'])
+
+        logger.info(f"Journal {path}: {len(completed)} driver(s) already uploaded")
+        return completed
+
+    def is_completed(self, numero_carta: str) -> bool:
+        """
+        Check whether a driver was uploaded successfully in a previous run.
+
+        Args:
+            numero_carta: Driver's license number
+
+        Returns:
+            True if the journal has a success record for the driver
+        """
+        return numero_carta in self.completed
+
+    def record(self, numero_carta: str, status: str, error: Optional[str] = None):
+        """
+        Append the outcome of one driver.
+
+        Args:
+            numero_carta: Driver's license number
+            status: Outcome ('success', 'skipped', 'failed', ...)
+            error: Optional error message
+        """
+        entry = {'numero_carta': numero_carta, 'api_base_url': self.api_base_url, 'status': status,
+                 'time': time.time()}
+        if error:
+            entry['error'] = error
+
+        with self._lock:
+            self._write(entry)
+            self._unsynced += 1
+            if (self._unsynced >= self.sync_every
+                    or time.monotonic() - self._last_sync >= self.sync_interval):
+                self._sync_locked()
+
+        if status == 'success':
+            self.completed.add(numero_carta)
+
+    def _write(self, entry: dict):
+        """Write one JSON line and hand it to the OS."""
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def _sync_locked(self):
+        """fsync the journal (caller holds the lock)."""
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        """Force pending records to stable storage."""
+        with self._lock:
+            self._sync_locked()
+
+    def close(self):
+        """Sync and close the journal."""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._sync_locked()
+            self._file.close()
+
+
+class UploadManifest:
+    """
+    SQLite manifest of the biometric files last accepted by the API.
+
+    Stores the SHA-256, size and mtime of every file per (API, license, field)
+    after an HTTP 201, so files with the same content can be left out of the
+    next upload. Safe to use from worker threads.
+    """
+
+    def __init__(self, api_base_url: str, db_path: str = DEFAULT_MANIFEST_PATH):
+        """
+        Open (or create) the manifest database.
+
+        Args:
+            api_base_url: API the hashes apply to (uploads to another API are not deduplicated)
+            db_path: Path to the SQLite file (default: upload_manifest.sqlite next to config.json)
+        """
+        self.api_base_url = api_base_url
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS manifest (
+                api_url TEXT NOT NULL,
+                numero_carta TEXT NOT NULL,
+                field TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                uploaded_at REAL NOT NULL,
+                PRIMARY KEY (api_url, numero_carta, field)
+            )
+        ''')
+        self.conn.commit()
+
+    def get(self, numero_carta: str) -> Dict[str, Tuple[str, int, int]]:
+        """
+        Get the recorded files of one driver.
+
+        Args:
+            numero_carta: Driver's license number
+
+        Returns:
+            Dictionary mapping API field names to (sha256, size, mtime_ns)
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT field, sha256, size, mtime_ns FROM manifest '
+                'WHERE api_url = ? AND numero_carta = ?', (self.api_base_url, numero_carta)).fetchall()
+        return {field: (sha256, size, mtime_ns) for field, sha256, size, mtime_ns in rows}
+
+    def record(self, numero_carta: str, files: Dict[str, Tuple[str, int, int]]):
+        """
+        Record files accepted by the API for one driver.
+
+        Args:
+            numero_carta: Driver's license number
+            files: Dictionary mapping API field names to (sha256, size, mtime_ns)
+        """
+        if not files:
+            return
+        now = time.time()
+        with self._lock:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO manifest '
+                '(api_url, numero_carta, field, sha256, size, mtime_ns, uploaded_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(self.api_base_url, numero_carta, field, sha256, size, mtime_ns, now)
+                 for field, (sha256, size, mtime_ns) in files.items()])
+            self.conn.commit()
+
+    def close(self):
+        """Close the manifest database."""
+        with self._lock:
+            self.conn.close()
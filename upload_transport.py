@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Upload Transport
+Request bodies streamed from biometric files on disk, so uploads do not hold
+whole images (or their base64 copies) in memory.
+"""
+
+import os
+import json
+import mmap
+import uuid
+import base64
+import hashlib
+import logging
+import binascii
+import mimetypes
+from typing import Dict, Iterator, Optional, Tuple
+
+# Bytes read from disk per chunk
+CHUNK_SIZE = 64 * 1024
+
+# Bytes read per chunk when base64 encoding (multiple of 3, so every chunk
+# encodes to a whole number of base64 quanta without padding)
+BASE64_CHUNK_SIZE = 48 * 1024
+
+# Bytes encoded per step by encode_file_base64 (multiple of 3)
+ENCODE_CHUNK_SIZE = 768 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def iter_file_chunks(file_path: str, size: int, digest=None,
+                     chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Read exactly size bytes of a file in chunks.
+
+    Args:
+        file_path: Path to the file
+        size: Number of bytes announced in the request (from os.stat)
+        digest: Optional hashlib object updated with every chunk
+        chunk_size: Bytes per chunk
+
+    Yields:
+        File content chunks
+
+    Raises:
+        OSError: If the file cannot be read or changed size since it was stat'ed
+    """
+    remaining = size
+    with open(file_path, 'rb') as f:
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                raise OSError(f"File shrank while uploading: {file_path}")
+            remaining -= len(chunk)
+            # Checked before the last chunk is handed out, so the body is never complete
+            if not remaining and f.read(1):
+                raise OSError(f"File grew while uploading: {file_path}")
+            if digest is not None:
+                digest.update(chunk)
+            yield chunk
+        if not size and f.read(1):
+            raise OSError(f"File grew while uploading: {file_path}")
+
+
+def base64_length(size: int) -> int:
+    """
+    Length of the base64 encoding of size bytes (with padding).
+
+    Args:
+        size: Number of raw bytes
+
+    Returns:
+        Number of base64 characters
+    """
+    return 4 * ((size + 2) // 3)
+
+
+def iter_base64_chunks(file_path: str, size: int, digest=None) -> Iterator[bytes]:
+    """
+    Base64-encode a file incrementally while reading it.
+
+    Args:
+        file_path: Path to the file
+        size: Number of bytes to read (from os.stat)
+        digest: Optional hashlib object updated with the raw content
+
+    Yields:
+        Base64 encoded chunks that concatenate to base64(file content)
+    """
+    carry = b''
+    for chunk in iter_file_chunks(file_path, size, digest, BASE64_CHUNK_SIZE):
+        chunk = carry + chunk
+        cut = len(chunk) - len(chunk) % 3
+        carry = chunk[cut:]
+        if cut:
+            yield base64.b64encode(chunk[:cut])
+    if carry:
+        yield base64.b64encode(carry)
+
+
+def encode_file_base64(file_path: str, digest=None) -> str:
+    """
+    Base64-encode a whole file without reading it into one bytes object.
+
+    The file is memory-mapped and encoded from the mapping chunk by chunk
+    into a buffer allocated once at its final size. Where mmap is not
+    supported (some SMB and FUSE mounts) the file is read in chunks into a
+    reused buffer instead.
+
+    Args:
+        file_path: Path to the file
+        digest: Optional hashlib object updated with the raw content
+
+    Returns:
+        Base64 encoded string
+
+    Raises:
+        OSError: If the file cannot be opened or read
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # Empty files cannot be mapped
+            return ''
+
+        try:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            logger.debug(f"mmap not available for {file_path} ({e}), using buffered reads")
+            return _encode_buffered(f, digest)
+
+        with mapping, memoryview(mapping) as view:
+            size = len(view)
+            encoded = bytearray(base64_length(size))
+            position = 0
+            for start in range(0, size, ENCODE_CHUNK_SIZE):
+                chunk = view[start:start + ENCODE_CHUNK_SIZE]
+                if digest is not None:
+                    digest.update(chunk)
+                part = binascii.b2a_base64(chunk, newline=False)
+                encoded[position:position + len(part)] = part
+                position += len(part)
+                chunk.release()
+        return encoded.decode('ascii')
+
+
+def _encode_buffered(f, digest=None) -> str:
+    """
+    Base64-encode the rest of an open file using one reusable read buffer.
+
+    Args:
+        f: File opened in binary mode
+        digest: Optional hashlib object updated with the raw content
+
+    Returns:
+        Base64 encoded string
+    """
+    buffer = bytearray(ENCODE_CHUNK_SIZE)
+    encoded = bytearray()
+    with memoryview(buffer) as view:
+        while True:
+            # Fill the whole buffer (network filesystems may return short
+            # reads) so only the last chunk can need base64 padding
+            filled = 0
+            while filled < ENCODE_CHUNK_SIZE:
+                count = f.readinto(view[filled:])
+                if not count:
+                    break
+                filled += count
+            if not filled:
+                break
+            if digest is not None:
+                digest.update(view[:filled])
+            encoded += binascii.b2a_base64(view[:filled], newline=False)
+            if filled < ENCODE_CHUNK_SIZE:
+                break
+    return encoded.decode('ascii')
+
+
+class JsonFileBody:
+    """
+    JSON request body {"fileFace": "<base64>", ...} streamed from files on disk.
+
+    Produces the same document as requests' json=payload for the current
+    api-condutores contract, but encodes each file to base64 chunk by chunk
+    while the request is sent, so memory per request stays constant.
+    """
+
+    content_type = 'application/json'
+
+    def __init__(self, files: Dict[str, Tuple[str, int]], digests: Optional[Dict[str, str]] = None):
+        """
+        Prepare the body.
+
+        Args:
+            files: Dictionary mapping API field names to (file path, file size)
+            digests: Optional dictionary filled with the SHA-256 of each file
+                     as it is streamed
+        """
+        self.digests = digests
+        self.parts = []
+
+        for position, (api_field, (file_path, size)) in enumerate(files.items()):
+            prefix = ('{' if position == 0 else ', ') + json.dumps(api_field) + ': "'
+            self.parts.append((api_field, prefix.encode('utf-8'), file_path, size))
+
+        self.length = (sum(len(prefix) + base64_length(size) + 1 for _, prefix, _, size in self.parts)
+                       + 1 if self.parts else 2)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self) -> Iterator[bytes]:
+        if not self.parts:
+            yield b'{}'
+            return
+
+        for api_field, prefix, file_path, size in self.parts:
+            yield prefix
+            digest = hashlib.sha256() if self.digests is not None else None
+            yield from iter_base64_chunks(file_path, size, digest)
+            if digest is not None:
+                self.digests[api_field] = digest.hexdigest()
+            yield b'"'
+        yield b'}'
+
+
+class MultipartFileBody:
+    """
+    multipart/form-data request body streamed from files on disk.
+
+    Each API field becomes one file part with the raw file bytes (no base64).
+    The total length is known up front, so requests sends a Content-Length
+    header and writes the body chunk by chunk.
+    """
+
+    def __init__(self, files: Dict[str, Tuple[str, int]], digests: Optional[Dict[str, str]] = None):
+        """
+        Prepare the body.
+
+        Args:
+            files: Dictionary mapping API field names to (file path, file size)
+            digests: Optional dictionary filled with the SHA-256 of each file
+                     as it is streamed
+        """
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={self.boundary}'
+        self.digests = digests
+        self.parts = []
+
+        for api_field, (file_path, size) in files.items():
+            filename = os.path.basename(file_path).replace('"', '')
+            mime_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            header = (
+                f'--{self.boundary}\r\n'
+                f'Content-Disposition: form-data; name="{api_field}"; filename="{filename}"\r\n'
+                f'Content-Type: {mime_type}\r\n'
+                f'\r\n'
+            ).encode('utf-8')
+            self.parts.append((api_field, header, file_path, size))
+
+        self.closing = f'--{self.boundary}--\r\n'.encode('utf-8')
+        self.length = sum(len(header) + size + 2 for _, header, _, size in self.parts) + len(self.closing)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self) -> Iterator[bytes]:
+        for api_field, header, file_path, size in self.parts:
+            yield header
+            digest = hashlib.sha256() if self.digests is not None else None
+            yield from iter_file_chunks(file_path, size, digest)
+            if digest is not None:
+                self.digests[api_field] = digest.hexdigest()
+            yield b'\r\n'
+        yield self.closing